@@ -1,47 +1,40 @@
-import asyncio
 import tkinter as tk
-import subprocess
 from tkinter import filedialog
-from PIL import Image, ImageTk
-import json
 
-from libs.hand_pose import HandPose, json_to_hand_pose
+from libs.hand_pose import HandPose, json_to_hand_pose, json_to_pose_samples
+from libs.pose_store import POSE_FILE_SUFFIX, load_pose_data, save_pose_data
+from libs.tracking_service import TrackingServiceClient
 
-poses: dict[str, HandPose] = {}
+# A name maps to one pose or, for multi-sample libraries, to the list of its samples
+poses: dict[str, HandPose | list[HandPose]] = {}
 recorded_pose = None
+POSE_FILE_TYPES = [("JSON files", "*.json"), ("Binary pose libraries", f"*{POSE_FILE_SUFFIX}")]
+# One worker process owns the tracking connection for all calibrations and recordings
+tracking_service = TrackingServiceClient()
 
 def start_pose_calibration():
     try:
-        res = subprocess.run(["python3", "libs/pose_calibration.py", "--single"], check=True,
-            capture_output = True, # Python >= 3.7 only
-            text = True # Python >= 3.7 only)
-        )
-        pose_json = str(res.stdout)
-        if (pose_json != "CANCELLED"):
-            hand_pose = json_to_hand_pose(json.loads(pose_json))
+        pose_json = tracking_service.calibrate_pose()
+        if pose_json is not None:
+            hand_pose = json_to_hand_pose(pose_json)
             print("Pose loaded:", hand_pose.as_dict())
             return hand_pose
         else:
             print("Pose calibration cancelled.")
             return None
-    except subprocess.CalledProcessError as e:
-        print(f"Error running script1.py: {e}")
+    except RuntimeError as e:
+        print(f"Error calibrating pose: {e}")
 
 def start_pose_recorder():
     try:
-        poses_dict = filedialog.askopenfilename(title="Select Poses", filetypes=[("JSON files", "*.json")])
-        res = subprocess.run(["python3", "libs/finger_tracking.py", "--path", poses_dict])
-        # pose_json = str(res.stdout)
-        # if (pose_json != "CANCELLED"):
-        #     pose = json.loads(pose_json)
-        #     hand_angle = HandAngles(pose)
-        #     print("Pose loaded:", hand_angle.__dict__)
-        #     return hand_angle
-        # else:
-        #     print("Pose calibration cancelled.")
-        #     return None
-    except subprocess.CalledProcessError as e:
-        print(f"Error running script1.py: {e}")
+        poses_dict = filedialog.askopenfilename(title="Select Poses", filetypes=POSE_FILE_TYPES)
+        tracking_service.record(poses_dict or None)
+    except RuntimeError as e:
+        print(f"Error running recorder: {e}")
+
+def close_window():
+    tracking_service.close()
+    root.destroy()
 
 
 # Update the label whenever poses are loaded
@@ -53,7 +46,10 @@ def update_hand_angles_count():
         pose_item_frame = tk.Frame(hand_angles_frame)
         pose_item_frame.pack(fill="x", pady=2)
 
-        label_text = f"{key}:\n{data.pose_vector}"
+        if isinstance(data, list):
+            label_text = f"{key}: {len(data)} samples\n{data[0].pose_vector if data else ''}"
+        else:
+            label_text = f"{key}:\n{data.pose_vector}"
         label = tk.Label(pose_item_frame, text=label_text, anchor="w", justify="left", font=("Courier", 12))
         label.pack(side="left", fill="x", expand=True)
         
@@ -70,30 +66,29 @@ def save_poses_to_files():
             #     "pose": pose_value,
             #     "pose_vector": f'[{pose.handRot["x"]},{pose.handRot["y"]},{pose.thumb["base"]},{pose.thumb["tip"]},{pose.index["base"]},{pose.index["middle"]},{pose.index["tip"]},{pose.middle["base"]},{pose.middle["middle"]},{pose.middle["tip"]},{pose.ring["base"]},{pose.ring["middle"]},{pose.ring["tip"]},{pose.pinky["base"]},{pose.pinky["middle"]},{pose.pinky["tip"]}]'
             # }
-    save_path = filedialog.asksaveasfilename(defaultextension=".json", filetypes=[("JSON files", "*.json")])
+    save_path = filedialog.asksaveasfilename(defaultextension=".json", filetypes=POSE_FILE_TYPES)
     if save_path:
         try:
-            with open(save_path, 'w') as file:
-                poses_dict = {}
-                for pose_name, pose in poses.items():
-                    poses_dict[pose_name] = pose.as_dict()
-                json.dump(poses_dict, file, indent=4)  # Save poses as JSON
+            poses_dict = {}
+            for pose_name, pose in poses.items():
+                poses_dict[pose_name] = [sample.as_dict() for sample in pose] if isinstance(pose, list) else pose.as_dict()
+            save_pose_data(save_path, poses_dict)  # JSON, or the binary format for .agposes
             print(f"Poses saved to {save_path}")
         except Exception as e:
             print(f"Error saving poses: {e}")
 
 def load_poses_from_files():
-    pose_files = filedialog.askopenfilenames(title="Select Poses", filetypes=[("JSON files", "*.json")])
+    pose_files = filedialog.askopenfilenames(title="Select Poses", filetypes=POSE_FILE_TYPES)
     for pose_file in pose_files:
         try:
-            with open(pose_file, 'r') as file:
-                data = json.load(file)  # Parse JSON data       
-                #poses[pose_name] = { 
-                #     "pose": pose_value,
-                #     "pose_vector": f'[{pose.handRot["x"]},{pose.handRot["y"]},{pose.thumb["base"]},{pose.thumb["tip"]},{pose.index["base"]},{pose.index["middle"]},{pose.index["tip"]},{pose.middle["base"]},{pose.middle["middle"]},{pose.middle["tip"]},{pose.ring["base"]},{pose.ring["middle"]},{pose.ring["tip"]},{pose.pinky["base"]},{pose.pinky["middle"]},{pose.pinky["tip"]}]'
-                # }
-                for pose_name, pose_data in data.items():
-                    poses[pose_name] = json_to_hand_pose(pose_data)
+            data = load_pose_data(pose_file)  # JSON, or the binary format for .agposes
+            #poses[pose_name] = { 
+            #     "pose": pose_value,
+            #     "pose_vector": f'[{pose.handRot["x"]},{pose.handRot["y"]},{pose.thumb["base"]},{pose.thumb["tip"]},{pose.index["base"]},{pose.index["middle"]},{pose.index["tip"]},{pose.middle["base"]},{pose.middle["middle"]},{pose.middle["tip"]},{pose.ring["base"]},{pose.ring["middle"]},{pose.ring["tip"]},{pose.pinky["base"]},{pose.pinky["middle"]},{pose.pinky["tip"]}]'
+            # }
+            for pose_name, pose_data in data.items():
+                samples = json_to_pose_samples(pose_data)
+                poses[pose_name] = samples if isinstance(pose_data, list) else samples[0]
         except Exception as e:
             print(f"Error reading {pose_file}: {e}")
     print("Loaded HandAngles:", [ha for ha in poses.keys()])
@@ -150,69 +145,76 @@ def toggle_hand_angles_display():
         update_hand_angles_count()
 
 
-# Create the main window
-root = tk.Tk()
-root.title("AutoGesture")
-# Set the window size
-root.geometry("600x600")
-
-# Add a logo at the top left corner
-try:
-    image = Image.open("logo.png")
-    image = image.resize((64, 64))
-    logo = ImageTk.PhotoImage(image)
-    logo_label = tk.Label(root, image=logo)
-    logo_label.image = logo  # Keep a reference to avoid garbage collection
-    logo_label.pack(anchor="nw", padx=20, pady=10)
-except Exception as e:
-    print(f"Could not load logo: {e}")
-
-# Main container for better padding
-main_container = tk.Frame(root, padx=20, pady=10)
-main_container.pack(fill="both", expand=True)
-
-# --- Management Block ---
-management_frame = tk.LabelFrame(main_container, text="Pose Management", padx=10, pady=10, font=("Helvetica", 10, "bold"))
-management_frame.pack(fill="x", pady=5)
-
-hand_angles_count_label = tk.Label(management_frame, text=f"Loaded Poses: {len(poses)}") 
-hand_angles_count_label.grid(row=0, column=0, sticky="w", pady=5)
-
-toggle_button = tk.Button(management_frame, text="Show Poses", command=toggle_hand_angles_display)
-toggle_button.grid(row=0, column=1, padx=10, pady=5)
-
-button2 = tk.Button(management_frame, text="Load Poses From File", command=load_poses_from_files)
-button2.grid(row=1, column=0, padx=5, pady=5, sticky="ew")
-
-button3 = tk.Button(management_frame, text="Save Poses to File", command=save_poses_to_files)
-button3.grid(row=1, column=1, padx=5, pady=5, sticky="ew")
-
-# Hand angles list (collapsible)
-hand_angles_frame = tk.Frame(main_container)
-
-# --- Add Block ---
-add_frame = tk.LabelFrame(main_container, text="Add New Pose", padx=10, pady=10, font=("Helvetica", 10, "bold"))
-add_frame.pack(fill="x", pady=10)
-
-add_pose_button = tk.Button(add_frame, text="Add Pose", command=open_add_pose_dialog, bg="#e1e1e1")
-add_pose_button.pack(fill="x", pady=5)
-
-# --- Recording Block ---
-recording_frame = tk.Frame(root)
-recording_frame.pack(side="bottom", fill="x", padx=20, pady=20)
-
-start_recorder_button = tk.Button(
-    recording_frame, 
-    text="Start Recorder", 
-    command=start_pose_recorder,
-    bg="#4CAF50",
-    fg="red",
-    font=("Helvetica", 12, "bold"),
-    padx=20,
-    pady=10,
-    relief="raised"
-)
-start_recorder_button.pack(side="right")
-
-# Start the Tkinter event loop
-root.mainloop()
\ No newline at end of file
+if __name__ == "__main__":
+    # Create the main window
+    root = tk.Tk()
+    root.title("AutoGesture")
+    # Set the window size
+    root.geometry("600x600")
+    root.protocol("WM_DELETE_WINDOW", close_window)
+
+    # Add a logo at the top left corner
+    try:
+        # Pillow is only needed for the logo, loaded here to keep the import of this module light
+        from PIL import Image, ImageTk
+        image = Image.open("logo.png")
+        image = image.resize((64, 64))
+        logo = ImageTk.PhotoImage(image)
+        logo_label = tk.Label(root, image=logo)
+        logo_label.image = logo  # Keep a reference to avoid garbage collection
+        logo_label.pack(anchor="nw", padx=20, pady=10)
+    except Exception as e:
+        print(f"Could not load logo: {e}")
+
+    # Main container for better padding
+    main_container = tk.Frame(root, padx=20, pady=10)
+    main_container.pack(fill="both", expand=True)
+
+    # --- Management Block ---
+    management_frame = tk.LabelFrame(main_container, text="Pose Management", padx=10, pady=10, font=("Helvetica", 10, "bold"))
+    management_frame.pack(fill="x", pady=5)
+
+    hand_angles_count_label = tk.Label(management_frame, text=f"Loaded Poses: {len(poses)}") 
+    hand_angles_count_label.grid(row=0, column=0, sticky="w", pady=5)
+
+    toggle_button = tk.Button(management_frame, text="Show Poses", command=toggle_hand_angles_display)
+    toggle_button.grid(row=0, column=1, padx=10, pady=5)
+
+    button2 = tk.Button(management_frame, text="Load Poses From File", command=load_poses_from_files)
+    button2.grid(row=1, column=0, padx=5, pady=5, sticky="ew")
+
+    button3 = tk.Button(management_frame, text="Save Poses to File", command=save_poses_to_files)
+    button3.grid(row=1, column=1, padx=5, pady=5, sticky="ew")
+
+    # Hand angles list (collapsible)
+    hand_angles_frame = tk.Frame(main_container)
+
+    # --- Add Block ---
+    add_frame = tk.LabelFrame(main_container, text="Add New Pose", padx=10, pady=10, font=("Helvetica", 10, "bold"))
+    add_frame.pack(fill="x", pady=10)
+
+    add_pose_button = tk.Button(add_frame, text="Add Pose", command=open_add_pose_dialog, bg="#e1e1e1")
+    add_pose_button.pack(fill="x", pady=5)
+
+    # --- Recording Block ---
+    recording_frame = tk.Frame(root)
+    recording_frame.pack(side="bottom", fill="x", padx=20, pady=20)
+
+    start_recorder_button = tk.Button(
+        recording_frame, 
+        text="Start Recorder", 
+        command=start_pose_recorder,
+        bg="#4CAF50",
+        fg="red",
+        font=("Helvetica", 12, "bold"),
+        padx=20,
+        pady=10,
+        relief="raised"
+    )
+    start_recorder_button.pack(side="right")
+
+    # Import and connect in the background while the window starts
+    tracking_service.start()
+    # Start the Tkinter event loop
+    root.mainloop()
+    tracking_service.close()
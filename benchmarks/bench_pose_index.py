@@ -0,0 +1,73 @@
+"""Recall and latency of PoseIndex against the exact PoseLibrary scan.
+
+Builds multi-sample libraries from synthetic hands (several poses, many noisy samples each)
+and queries them with new noisy hands of the same poses.
+"""
+
+import argparse
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "libs"))
+
+from hand_pose import HandFeatureExtractor, PoseLibrary
+from pose_index import PoseIndex
+from synthetic_hand import make_hand
+
+
+def make_vectors(curls: np.ndarray, count: int, rng: np.random.Generator, extractor: HandFeatureExtractor):
+    """
+    :return: (pose ids, pose vectors) of ``count`` noisy hands with randomly chosen poses.
+    """
+    pose_ids = rng.integers(0, len(curls), count)
+    vectors = np.empty((count, 45))
+    for i, pose_id in enumerate(pose_ids):
+        jitter = curls[pose_id] + rng.normal(0, 0.05, 5)
+        hand = make_hand(yaw=rng.normal(0, 0.1), curl=np.clip(jitter, 0, 1), noise=1.5, rng=rng)
+        vectors[i] = extractor.extract(hand)
+    return pose_ids, vectors
+
+
+def time_queries(query, vectors: np.ndarray) -> tuple[np.ndarray, list]:
+    times = np.empty(len(vectors))
+    results = []
+    for i, vector in enumerate(vectors):
+        start = time.perf_counter()
+        results.append(query(vector))
+        times[i] = time.perf_counter() - start
+    return times * 1e6, results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Pose index benchmark")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 5000, 20000])
+    parser.add_argument("--poses", type=int, default=20, help="Distinct pose names in the library")
+    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("-k", type=int, default=5)
+    parser.add_argument("--probes", type=int, default=8)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    extractor = HandFeatureExtractor()
+    curls = rng.uniform(0, 1, (args.poses, 5))
+    names = [f"Pose{i}" for i in range(args.poses)]
+    _, queries = make_vectors(curls, args.queries, rng, extractor)
+    for size in args.sizes:
+        pose_ids, vectors = make_vectors(curls, size, rng, extractor)
+        library = PoseLibrary.from_vectors([names[i] for i in pose_ids], vectors)
+        start = time.perf_counter()
+        index = PoseIndex(library, probes=args.probes, k=args.k)
+        build = time.perf_counter() - start
+
+        exact_times, exact = time_queries(lambda v: library.knn(v, args.k), queries)
+        index_times, approximate = time_queries(lambda v: index.query(v, args.k), queries)
+        recall = np.mean([len(np.intersect1d(e[0], a[0])) / args.k for e, a in zip(exact, approximate)])
+        agreement = np.mean([library.vote(*e)[0] == library.vote(*a)[0] for e, a in zip(exact, approximate)])
+        print(f"{size} templates ({len(index.centroids)} clusters, {index.probes} probes, built in {build * 1e3:.0f} ms): "
+              f"exact median {np.median(exact_times):.0f} us, p95 {np.percentile(exact_times, 95):.0f} us | "
+              f"index median {np.median(index_times):.0f} us, p95 {np.percentile(index_times, 95):.0f} us | "
+              f"recall@{args.k} {recall:.3f}, vote agreement {agreement:.3f}, "
+              f"{index.candidates_scored / len(queries):.0f} candidates per query")
@@ -0,0 +1,67 @@
+"""Per-frame render time of Canvas.render_hands on synthetic hands.
+
+Compares the batched renderer against the original per-bone cv2 calls.
+"""
+
+import argparse
+import sys
+import time
+from pathlib import Path
+
+import cv2
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "libs"))
+
+from canvas import Canvas
+from synthetic_hand import make_session
+
+
+def legacy_render_hands(canvas: Canvas, event):
+    canvas.output_image[:, :] = 0
+    for hand in event.hands:
+        for index_digit in range(0, 5):
+            digit = hand.digits[index_digit]
+            for index_bone in range(0, 4):
+                bone = digit.bones[index_bone]
+                wrist = canvas.get_joint_position(hand.arm.next_joint)
+                elbow = canvas.get_joint_position(hand.arm.prev_joint)
+                cv2.circle(canvas.output_image, wrist, 3, canvas.hands_colour, -1)
+                cv2.circle(canvas.output_image, elbow, 3, canvas.hands_colour, -1)
+                cv2.line(canvas.output_image, wrist, elbow, canvas.hands_colour, 2)
+                bone_start = canvas.get_joint_position(bone.prev_joint)
+                bone_end = canvas.get_joint_position(bone.next_joint)
+                cv2.circle(canvas.output_image, bone_start, 3, canvas.hands_colour, -1)
+                cv2.circle(canvas.output_image, bone_end, 3, canvas.hands_colour, -1)
+                cv2.line(canvas.output_image, bone_start, bone_end, canvas.hands_colour, 2)
+                if ((index_digit == 0) and (index_bone == 0)) or (
+                        (index_digit > 0) and (index_digit < 4) and (index_bone < 2)):
+                    bone_next = hand.digits[index_digit + 1].bones[index_bone]
+                    bone_next_start = canvas.get_joint_position(bone_next.prev_joint)
+                    cv2.line(canvas.output_image, bone_start, bone_next_start, canvas.hands_colour, 2)
+                if index_bone == 0:
+                    cv2.line(canvas.output_image, bone_start, wrist, canvas.hands_colour, 2)
+
+
+def time_frames(render, canvas: Canvas, events) -> np.ndarray:
+    times = np.empty(len(events))
+    for i, event in enumerate(events):
+        start = time.perf_counter()
+        render(canvas, event)
+        times[i] = time.perf_counter() - start
+    return times * 1e6
+
+
+def report(name: str, times: np.ndarray):
+    print(f"{name}: median {np.median(times):.0f} us, p95 {np.percentile(times, 95):.0f} us per frame")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Canvas render benchmark")
+    parser.add_argument("--frames", type=int, default=2000)
+    parser.add_argument("--hands", type=int, default=1)
+    args = parser.parse_args()
+
+    events = make_session(args.frames, hand_count=args.hands)
+    report("Canvas.render_hands", time_frames(Canvas.render_hands, Canvas(), events))
+    report("Legacy render_hands", time_frames(legacy_render_hands, Canvas(), events))
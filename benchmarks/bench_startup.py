@@ -0,0 +1,92 @@
+"""Cold import time of the entry points, checked against a time budget.
+
+Every run imports the entry point in a fresh interpreter, so nothing is cached in sys.modules.
+The median over the runs is compared with the budget and the script exits with status 1 if an
+entry point is over budget. The heaviest direct imports from ``-X importtime`` are listed to show
+what to load lazily.
+"""
+
+import argparse
+import statistics
+import subprocess
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+
+# Entry point -> (directory it is run from, module name, budget in seconds)
+ENTRY_POINTS = {
+    "autogesture": (ROOT, "autogesture", 0.3),
+    "finger_tracking": (ROOT / "libs", "finger_tracking", 1.0),
+    "pose_calibration": (ROOT / "libs", "pose_calibration", 1.0),
+}
+
+_IMPORT_SNIPPET = """
+import sys, time
+sys.path.insert(0, {path!r})
+start = time.perf_counter()
+import {module}
+print(time.perf_counter() - start)
+"""
+
+
+def import_time(path: Path, module: str) -> tuple[float, list[tuple[str, int]]]:
+    """
+    :return: (seconds to import the module, [(name, cumulative us)] of the imports below it).
+    """
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c",
+                             _IMPORT_SNIPPET.format(path=str(path), module=module)],
+                            cwd=path, capture_output=True, text=True)
+    if result.returncode != 0:
+        raise RuntimeError(f"Importing {module} failed:\n{result.stderr.strip().splitlines()[-1]}")
+    imports = []
+    for line in result.stderr.splitlines():
+        # "import time: self [us] | cumulative | imported package", nesting is shown by indentation
+        if not line.startswith("import time:") or "imported package" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        depth = (len(name) - len(name.lstrip())) // 2
+        if depth == 1:
+            imports.append((name.strip(), int(cumulative)))
+    return float(result.stdout.strip().splitlines()[-1]), imports
+
+
+def parse_budget(text: str) -> tuple[str, float]:
+    name, _, seconds = text.partition("=")
+    if name not in ENTRY_POINTS or not seconds:
+        raise argparse.ArgumentTypeError(f"Expected <entry point>=<seconds> with one of {', '.join(ENTRY_POINTS)}")
+    return name, float(seconds)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Startup time benchmark")
+    parser.add_argument("entry_points", nargs="*", help=f"Entry points to measure ({', '.join(ENTRY_POINTS)}), all by default")
+    parser.add_argument("--runs", type=int, default=5, help="Fresh interpreters per entry point")
+    parser.add_argument("--budget", type=parse_budget, action="append", default=[],
+                        help="Override a budget, e.g. finger_tracking=0.8")
+    parser.add_argument("--top", type=int, default=5, help="Heaviest imports listed per entry point")
+    args = parser.parse_args()
+    for name in args.entry_points:
+        if name not in ENTRY_POINTS:
+            parser.error(f"Unknown entry point {name}")
+
+    budgets = {name: budget for name, (_, _, budget) in ENTRY_POINTS.items()}
+    budgets.update(args.budget)
+    over_budget = []
+    for name in args.entry_points or ENTRY_POINTS:
+        path, module, _ = ENTRY_POINTS[name]
+        times = []
+        for _ in range(args.runs):
+            seconds, imports = import_time(path, module)
+            times.append(seconds)
+        median = statistics.median(times)
+        within = median <= budgets[name]
+        if not within:
+            over_budget.append(name)
+        print(f"{name}: median {median * 1e3:.0f} ms, max {max(times) * 1e3:.0f} ms "
+              f"(budget {budgets[name] * 1e3:.0f} ms) {'OK' if within else 'OVER BUDGET'}")
+        for imported, cumulative in sorted(imports, key=lambda i: -i[1])[:args.top]:
+            print(f"    {imported}: {cumulative / 1e3:.0f} ms")
+    if over_budget:
+        print(f"Over budget: {', '.join(over_budget)}")
+        sys.exit(1)
@@ -0,0 +1,84 @@
+"""Synthetic-packet benchmark for the watch BLE parser.
+
+Compares WatchDataParser against the original string/dict parser and reports samples per
+second and stored bytes per sample.
+"""
+
+import argparse
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "libs"))
+
+from watch_data import WatchDataParser
+
+
+def make_packets(count: int, samples_per_packet: int, seed: int = 0) -> list[bytearray]:
+    rng = np.random.default_rng(seed)
+    packets = []
+    timestamp = 1700000000000
+    for i in range(count):
+        stream = b"ACC" if i % 3 == 0 else b"GYRO" if i % 3 == 1 else b"PPG"
+        values = rng.normal(0, 5, (samples_per_packet, 3))
+        samples = []
+        for row in values:
+            samples.append(b"%d,%.5f,%.5f,%.5f" % (timestamp, row[0], row[1], row[2]))
+            timestamp += 10
+        packets.append(bytearray(stream + b"_" + b";".join(samples)))
+    return packets
+
+
+def legacy_parse(data: bytearray, recorded: dict[str, dict]):
+    dataString = data.decode('utf-8')
+    messageParts = dataString.split("_")
+    if(len(messageParts) != 2):
+        return
+    for set in messageParts[1].split(";"):
+        time = set.split(",")[0]
+        values = set.split(",")[1:]
+        if(len(values) == 3):
+            recorded[messageParts[0][0]][time] = values
+
+
+def legacy_bytes_per_sample(recorded: dict[str, dict]) -> float:
+    total = 0
+    count = 0
+    for samples in recorded.values():
+        total += sys.getsizeof(samples)
+        for key, values in samples.items():
+            total += sys.getsizeof(key) + sys.getsizeof(values) + sum(sys.getsizeof(v) for v in values)
+            count += 1
+    return total / max(count, 1)
+
+
+def run(packet_count: int, samples_per_packet: int):
+    packets = make_packets(packet_count, samples_per_packet)
+    sample_count = packet_count * samples_per_packet
+
+    parser = WatchDataParser()
+    start = time.perf_counter()
+    for packet in packets:
+        parser.parse(packet)
+    elapsed = time.perf_counter() - start
+    stored = sum(len(buffer) for buffer in parser.buffers.values())
+    print(f"WatchDataParser: {sample_count / elapsed:,.0f} samples/s, "
+          f"{parser.acc.bytes_per_sample} bytes/sample ({stored} stored)")
+
+    recorded = {"A": {}, "G": {}, "P": {}}
+    start = time.perf_counter()
+    for packet in packets:
+        legacy_parse(packet, recorded)
+    elapsed = time.perf_counter() - start
+    print(f"Legacy parser:   {sample_count / elapsed:,.0f} samples/s, "
+          f"{legacy_bytes_per_sample(recorded):.0f} bytes/sample")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Watch data parser benchmark")
+    parser.add_argument("--packets", type=int, default=20000)
+    parser.add_argument("--samples", type=int, default=20, help="Samples per packet")
+    args = parser.parse_args()
+    run(args.packets, args.samples)
@@ -0,0 +1,252 @@
+"""Latency and throughput of every pipeline stage on synthetic hands, written as JSON.
+
+Runs without a device or the Leap bindings: tracking frames come from synthetic_hand, watch packets are generated like
+in bench_watch_data and the recording is saved to a temporary folder. The frame stages are measured
+for every combination of library size, hand count and frame rate:
+
+- set_pose_from_hand: HandPose.set_pose_from_hand for every hand of the frame
+- extract_batch: HandFeatureExtractor.extract_batch of the frame
+- get_most_similar_pose: get_most_similar_pose for every hand of the frame
+- match_batch: PoseLibrary.match_batch of the frame
+- on_tracking_event: the whole GestureListener with smoothing and hysteresis
+- render_hands: Canvas.render_hands
+
+process_watch_data and save_recorded_data are measured once through FingerTracking. Every result
+has p50/p95/p99/max latency in microseconds per call and a throughput; frame stages also give the
+share of frames that exceeded the frame period. ``--baseline`` compares the p50 latencies with an
+earlier result file and exits with status 1 if a stage got slower than ``--tolerance``.
+"""
+
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+
+import numpy as np
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT / "libs"))
+
+from bench_watch_data import make_packets
+from canvas import Canvas
+from finger_tracking import FingerTracking
+from gesture_listener import GestureListener
+from hand_pose import HandFeatureExtractor, HandIdentity, HandPose, PoseLibrary, get_most_similar_pose
+from pose_filter import LabelHysteresis, OneEuroFilter
+from synthetic_hand import make_hand, make_session
+
+RESULT_FORMAT = "autogesture-benchmarks"
+RESULT_VERSION = 1
+
+
+def percentiles(times: np.ndarray) -> dict:
+    p50, p95, p99 = np.percentile(times, [50, 95, 99])
+    return {"p50_us": round(float(p50), 2), "p95_us": round(float(p95), 2), "p99_us": round(float(p99), 2),
+            "max_us": round(float(times.max()), 2), "mean_us": round(float(times.mean()), 2)}
+
+
+def time_calls(call, items: list, warmup: int = 0) -> np.ndarray:
+    """
+    :return: Microseconds of every call, after ``warmup`` untimed calls on the first items.
+    """
+    for item in items[:warmup]:
+        call(item)
+    times = np.empty(len(items))
+    for i, item in enumerate(items):
+        start = time.perf_counter_ns()
+        call(item)
+        times[i] = time.perf_counter_ns() - start
+    return times / 1e3
+
+
+def make_library(size: int, pose_count: int, rng: np.random.Generator) -> PoseLibrary:
+    """
+    A multi-sample library of ``size`` templates: noisy copies of ``pose_count`` synthetic poses.
+    """
+    extractor = HandFeatureExtractor()
+    curls = rng.uniform(0, 1, (pose_count, 5))
+    poses = np.array([extractor.extract(make_hand(curl=curl)) for curl in curls])
+    pose_ids = np.arange(size) % pose_count
+    vectors = poses[pose_ids] + rng.normal(0, 0.02, (size, poses.shape[1]))
+    return PoseLibrary.from_vectors([f"Pose{i}" for i in pose_ids], vectors)
+
+
+def frame_stages(library: PoseLibrary) -> dict:
+    """
+    :return: Stage name -> call on one tracking event.
+    """
+    extractor = HandFeatureExtractor()
+    listener = GestureListener(None, customposes=library, pose_filter=OneEuroFilter(), hysteresis=LabelHysteresis())
+    canvas = Canvas()
+
+    def set_pose_from_hand(event):
+        for hand in event.hands:
+            HandPose().set_pose_from_hand(hand, extractor)
+
+    def most_similar_pose(event):
+        for hand in event.hands:
+            pose = HandPose()
+            pose.set_pose_from_hand(hand, extractor)
+            get_most_similar_pose(pose, library)
+
+    vectors = {}
+
+    def extract_batch(event):
+        vectors[event] = extractor.extract_batch(event.hands).copy()
+
+    return {
+        "set_pose_from_hand": set_pose_from_hand,
+        "extract_batch": extract_batch,
+        "get_most_similar_pose": most_similar_pose,
+        # Matches the vectors extract_batch produced for the same event, so only matching is timed
+        "match_batch": lambda event: library.match_batch(vectors[event]),
+        "on_tracking_event": listener.on_tracking_event,
+        "render_hands": canvas.render_hands,
+    }
+
+
+def run_frame_benchmarks(sizes: list[int], hand_counts: list[int], rates: list[float], frames: int,
+                         pose_count: int, warmup: int) -> list[dict]:
+    results = []
+    rng = np.random.default_rng(0)
+    libraries = {size: make_library(size, pose_count, rng) for size in sizes}
+    for hands in hand_counts:
+        for rate in rates:
+            events = make_session(frames, hand_count=hands, rate=rate)
+            frame_period = 1e6 / rate
+            for size in sizes:
+                for stage, call in frame_stages(libraries[size]).items():
+                    times = time_calls(call, events, warmup)
+                    result = {"stage": stage, "library_size": size, "hands": hands, "rate": rate,
+                              "calls": len(times), **percentiles(times),
+                              "throughput": round(len(times) / (times.sum() / 1e6), 1), "unit": "frames/s",
+                              "over_frame_period": round(float(np.mean(times > frame_period)), 4)}
+                    results.append(result)
+                    print(f"{stage} (library {size}, {hands} hands, {rate:g} Hz): p50 {result['p50_us']:.0f} us, "
+                          f"p99 {result['p99_us']:.0f} us, {result['throughput']:,.0f} frames/s")
+    return results
+
+
+def run_watch_benchmark(packet_count: int, samples_per_packet: int) -> dict:
+    tracker = FingerTracking()
+    packets = make_packets(packet_count, samples_per_packet)
+    times = time_calls(lambda packet: tracker.process_watch_data(None, packet), packets)
+    samples = packet_count * samples_per_packet
+    result = {"stage": "process_watch_data", "samples_per_call": samples_per_packet, "calls": len(times),
+              **percentiles(times), "throughput": round(samples / (times.sum() / 1e6), 1), "unit": "samples/s"}
+    print(f"process_watch_data: p50 {result['p50_us']:.0f} us per packet, {result['throughput']:,.0f} samples/s")
+    return result
+
+
+def run_save_benchmark(seconds: float, rate: float, hands: int, runs: int) -> dict:
+    """
+    Record ``seconds`` of poses and watch data through FingerTracking and time save_recorded_data.
+    """
+    frames = int(seconds * rate)
+    events = make_session(min(frames, 500), hand_count=hands, rate=rate)
+    identities = [HandIdentity(i + 1, "left" if i % 2 == 0 else "right") for i in range(hands)]
+    # Three watch streams at 100 Hz
+    packets = make_packets(max(1, int(seconds * 100 * 3 / 20)), 20)
+    times = []
+    samples = 0
+    with tempfile.TemporaryDirectory() as folder:
+        cwd = os.getcwd()
+        os.chdir(folder)
+        try:
+            for run in range(runs):
+                tracker = FingerTracking()
+                tracker.start_timestamp = str(run)
+                tracker.start_session_log()
+                tracker.recording = True
+                for frame in range(frames):
+                    event = events[frame % len(events)]
+                    for identity in identities:
+                        tracker.on_pose_detected(event, "Pose0", 0.9, identity)
+                for packet in packets:
+                    tracker.process_watch_data(None, packet)
+                tracker.recording = False
+                start = time.perf_counter_ns()
+                tracker.save_recorded_data()
+                times.append((time.perf_counter_ns() - start) / 1e3)
+                samples = frames * (hands + 1) + len(packets) * 20
+        finally:
+            os.chdir(cwd)
+    times = np.array(times)
+    result = {"stage": "save_recorded_data", "seconds": seconds, "rate": rate, "hands": hands,
+              "samples_per_call": samples, "calls": len(times), **percentiles(times),
+              "throughput": round(samples / (times.mean() / 1e6), 1), "unit": "samples/s"}
+    print(f"save_recorded_data ({seconds:g} s, {samples} samples): p50 {result['p50_us'] / 1e3:.1f} ms")
+    return result
+
+
+def result_key(result: dict) -> tuple:
+    return tuple(result.get(key) for key in ("stage", "library_size", "hands", "rate", "samples_per_call"))
+
+
+def compare(results: list[dict], baseline: list[dict], tolerance: float) -> list[str]:
+    """
+    :return: Description of every result whose p50 is more than ``tolerance`` slower than in the baseline.
+    """
+    previous = {result_key(result): result for result in baseline}
+    regressions = []
+    for result in results:
+        old = previous.get(result_key(result))
+        if old is None or old["p50_us"] <= 0:
+            continue
+        change = result["p50_us"] / old["p50_us"] - 1
+        if change > tolerance:
+            regressions.append(f"{result['stage']} {dict(zip(('library_size', 'hands', 'rate'), result_key(result)[1:4]))}: "
+                               f"p50 {old['p50_us']:.0f} -> {result['p50_us']:.0f} us (+{change:.0%})")
+    return regressions
+
+
+def environment() -> dict:
+    try:
+        commit = subprocess.run(["git", "rev-parse", "HEAD"], cwd=ROOT, capture_output=True,
+                                text=True).stdout.strip() or None
+    except OSError:
+        commit = None
+    return {"python": platform.python_version(), "numpy": np.__version__, "platform": platform.platform(),
+            "processor": platform.processor() or platform.machine(), "cpu_count": os.cpu_count(),
+            "commit": commit}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Pipeline benchmark suite")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10, 1000, 20000], help="Pose library sizes")
+    parser.add_argument("--hands", type=int, nargs="+", default=[1, 2], help="Hands per frame")
+    parser.add_argument("--rates", type=float, nargs="+", default=[60, 120], help="Frame rates in Hz")
+    parser.add_argument("--frames", type=int, default=1000, help="Frames timed per configuration")
+    parser.add_argument("--poses", type=int, default=20, help="Distinct pose names in the libraries")
+    parser.add_argument("--warmup", type=int, default=50, help="Untimed frames before every measurement")
+    parser.add_argument("--packets", type=int, default=5000, help="Watch packets parsed")
+    parser.add_argument("--save-seconds", type=float, default=600, help="Recording length saved")
+    parser.add_argument("--save-runs", type=int, default=3)
+    parser.add_argument("--output", type=str, default="benchmark_results.json", help="JSON result file")
+    parser.add_argument("--baseline", type=str, help="Earlier result file to compare with")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="Allowed p50 slowdown against the baseline")
+    args = parser.parse_args()
+
+    results = run_frame_benchmarks(args.sizes, args.hands, args.rates, args.frames, args.poses, args.warmup)
+    results.append(run_watch_benchmark(args.packets, 20))
+    results.append(run_save_benchmark(args.save_seconds, max(args.rates), max(args.hands), args.save_runs))
+    report = {"format": RESULT_FORMAT, "version": RESULT_VERSION,
+              "created": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+              "environment": environment(), "parameters": vars(args), "results": results}
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=4)
+    print(f"Results written to {args.output}")
+
+    if args.baseline:
+        with open(args.baseline, "r") as f:
+            regressions = compare(results, json.load(f)["results"], args.tolerance)
+        for regression in regressions:
+            print(f"Regression: {regression}")
+        if regressions:
+            sys.exit(1)
@@ -1,12 +1,28 @@
+from __future__ import annotations
+
+from typing import TYPE_CHECKING
+
 import numpy as np
 import cv2
 
 from handAngles import HandAngles
-from leapmotion import Pose
 
-from leap.events import Event
+from hand_pose import HandFeatureExtractor, HandPose
+from hud import HudLayer
 
-from hand_pose import HandPose
+if TYPE_CHECKING:
+    from leap.events import Event
+
+# Indices into the projected joints of one hand (see Canvas.project_hands)
+WRIST = 25
+ELBOW = 26
+DIGIT_CHAINS = np.arange(25).reshape(5, 5)
+LINKS = np.array([
+    # Knuckles: thumb to index base, index/middle/ring to the next digit for the first two joints
+    [0, 5], [5, 10], [6, 11], [10, 15], [11, 16], [15, 20], [16, 21],
+    # Every digit base to the wrist and the forearm
+    [0, WRIST], [5, WRIST], [10, WRIST], [15, WRIST], [20, WRIST], [WRIST, ELBOW],
+])
 
 
 class Canvas:
@@ -18,6 +34,12 @@ class Canvas:
         self.recording_font_colour = (0, 0, 255)
         self.hands_format = "Skeleton"
         self.output_image = np.zeros((self.screen_size[0], self.screen_size[1], 3), np.uint8)
+        self._screen_offset = np.array([self.screen_size[1] / 2, self.screen_size[0] / 2])
+        self._extractor = HandFeatureExtractor()
+        # Boxes (x0, y0, x1, y1) of everything drawn since the last clear
+        self._dirty = []
+        self.hud = HudLayer(self.screen_size)
+        self._hand_pose_rows = 0
 
     def get_joint_position(self, bone):
         if bone:
@@ -29,238 +51,117 @@ class Canvas:
         cv2.imwrite(filename, self.output_image)
 
     def render_timestamp(self, time):
-        cv2.putText(
-            self.output_image,
-            time,
-            (self.screen_size[1] - 140, self.screen_size[0] - 10),
-            cv2.FONT_HERSHEY_SIMPLEX,
-            0.5,
-            self.font_colour,
-            1,
-        )
+        self.hud.set_text((self.screen_size[1] - 140, self.screen_size[0] - 10), time, self.font_colour)
 
     def render_instructions(self, instructions, recording=False):
-        cv2.putText(
-            self.output_image,
-            instructions,
-            (10, 20),
-            cv2.FONT_HERSHEY_SIMPLEX,
-            0.5,
-            self.recording_font_colour if recording else self.font_colour,
-            1,
-        )
+        self.hud.set_text((10, 20), instructions, self.recording_font_colour if recording else self.font_colour)
 
     def render_hand_angles(self, hand: HandAngles):
-        cv2.putText(
-            self.output_image,
-            f"Thumb: {hand.thumb['base'], hand.thumb['tip']}",
-            (10, self.screen_size[0] - 10),
-            cv2.FONT_HERSHEY_SIMPLEX,
-            0.5,
-            self.font_colour,
-            1,
-        )
-        cv2.putText(
-            self.output_image,
-            f"Index: {hand.index['base'], hand.index['middle'], hand.index['tip']}",
-            (10, self.screen_size[0] - 30),
-            cv2.FONT_HERSHEY_SIMPLEX,
-            0.5,
-            self.font_colour,
-            1,
-        )
-        cv2.putText(
-            self.output_image,
-            f"Middle: {hand.middle['base'], hand.middle['middle'], hand.middle['tip']}",
-            (10, self.screen_size[0] - 50),
-            cv2.FONT_HERSHEY_SIMPLEX,
-            0.5,
-            self.font_colour,
-            1,
-        )
-        cv2.putText(
-            self.output_image,
-            f"Ring: {hand.ring['base'], hand.ring['middle'], hand.ring['tip']}",
-            (10, self.screen_size[0] - 70),
-            cv2.FONT_HERSHEY_SIMPLEX,
-            0.5,
-            self.font_colour,
-            1,
-        )
-        cv2.putText(
-            self.output_image,
-            f"Pinky: {hand.pinky['base'], hand.pinky['middle'], hand.pinky['tip']}",
-            (10, self.screen_size[0] - 90),
-            cv2.FONT_HERSHEY_SIMPLEX,
-            0.5,
-            self.font_colour,
-            1,
-        )
-        cv2.putText(
-            self.output_image,
-            f"Hand Rotation: {hand.handRot}",
-            (10, self.screen_size[0] - 110),
-            cv2.FONT_HERSHEY_SIMPLEX,
-            0.5,
-            self.font_colour,
-            1,
-        )
-        cv2.putText(
-            self.output_image,
-            f"Pinch Distance: {hand.pinchDistance}",
-            (10, self.screen_size[0] - 130),
-            cv2.FONT_HERSHEY_SIMPLEX,
-            0.5,
-            self.font_colour,
-            1,
-        )
-        cv2.putText(
-            self.output_image,
-            f"Pinch Strength: {hand.pinchStrength}",
-            (10, self.screen_size[0] - 150),
-            cv2.FONT_HERSHEY_SIMPLEX,
-            0.5,
-            self.font_colour,
-            1,
-        )
+        rows = (
+            ("Thumb", (hand.thumb['base'], hand.thumb['tip'])),
+            ("Index", (hand.index['base'], hand.index['middle'], hand.index['tip'])),
+            ("Middle", (hand.middle['base'], hand.middle['middle'], hand.middle['tip'])),
+            ("Ring", (hand.ring['base'], hand.ring['middle'], hand.ring['tip'])),
+            ("Pinky", (hand.pinky['base'], hand.pinky['middle'], hand.pinky['tip'])),
+            ("Hand Rotation", (hand.handRot['x'], hand.handRot['y'])),
+            ("Pinch Distance", hand.pinchDistance),
+            ("Pinch Strength", hand.pinchStrength),
+        )
+        for row, (label, values) in enumerate(rows):
+            self.hud.set_values((10, self.screen_size[0] - 10 - 20 * row), label, values, self.font_colour, decimals=0)
 
     def render_hand_canonical_pose(self, hand: HandPose):
-        cv2.putText(
-            self.output_image,
-            f"Thumb: {hand.pose_vector[0:9]}",
-            (10, self.screen_size[0] - 10),
-            cv2.FONT_HERSHEY_SIMPLEX,
-            0.5,
-            self.font_colour,
-            1,
-        )
-        cv2.putText(
-            self.output_image,
-            f"Index: {hand.pose_vector[9:18]}",
-            (10, self.screen_size[0] - 30),
-            cv2.FONT_HERSHEY_SIMPLEX,
-            0.5,
-            self.font_colour,
-            1,
-        )
-        cv2.putText(
-            self.output_image,
-            f"Middle: {hand.pose_vector[18:27]}",
-            (10, self.screen_size[0] - 50),
-            cv2.FONT_HERSHEY_SIMPLEX,
-            0.5,
-            self.font_colour,
-            1,
-        )
-        cv2.putText(
-            self.output_image,
-            f"Ring: {hand.pose_vector[27:36]}",
-            (10, self.screen_size[0] - 70),
-            cv2.FONT_HERSHEY_SIMPLEX,
-            0.5,
-            self.font_colour,
-            1,
-        )
-        cv2.putText(
-            self.output_image,
-            f"Pinky: {hand.pose_vector[36:45]}",
-            (10, self.screen_size[0] - 90),
-            cv2.FONT_HERSHEY_SIMPLEX,
-            0.5,
-            self.font_colour,
-            1,
-        )
-        cv2.putText(
-            self.output_image,
-            f"Hand Rotation: {hand.palm_orientation}",
-            (10, self.screen_size[0] - 110),
-            cv2.FONT_HERSHEY_SIMPLEX,
-            0.5,
-            self.font_colour,
-            1,
-        )
-        cv2.putText(
-            self.output_image,
-            f"Pinch Distance: {hand.pinch_distance}",
-            (10, self.screen_size[0] - 130),
-            cv2.FONT_HERSHEY_SIMPLEX,
-            0.5,
-            self.font_colour,
-            1,
-        )
-        cv2.putText(
-            self.output_image,
-            f"Pinch Strength: {hand.pinch_strength}",
-            (10, self.screen_size[0] - 150),
-            cv2.FONT_HERSHEY_SIMPLEX,
-            0.5,
-            self.font_colour,
-            1,
-        )
+        rows = (
+            ("Thumb", hand.pose_vector[0:9], 1),
+            ("Index", hand.pose_vector[9:18], 1),
+            ("Middle", hand.pose_vector[18:27], 1),
+            ("Ring", hand.pose_vector[27:36], 1),
+            ("Pinky", hand.pose_vector[36:45], 1),
+            ("Hand Rotation", hand.palm_orientation, 2),
+            ("Pinch Distance", hand.pinch_distance, 1),
+            ("Pinch Strength", hand.pinch_strength, 2),
+        )
+        for row, (label, values, decimals) in enumerate(rows):
+            self.hud.set_values((10, self.screen_size[0] - 10 - 20 * row), label, values, self.font_colour, decimals)
 
     def render_pose(self, motion: str, similarity: float = 0.0):
-        cv2.putText(
-            self.output_image,
-            f"Detected Motion: {motion} (Similarity: {similarity:.2f})",
-            (10, self.screen_size[0] - 10),
-            cv2.FONT_HERSHEY_SIMPLEX,
-            0.5,
-            self.font_colour,
-            1,
-        )
+        self.hud.set_text((10, self.screen_size[0] - 10), f"Detected Motion: {motion} (Similarity: {similarity:.2f})",
+                          self.font_colour)
+
+    def render_hand_poses(self, hand_labels: dict):
+        """
+        One "Detected Motion" line per hand, from the bottom up.
+
+        :param hand_labels: (pose, similarity) keyed by HandIdentity.
+        """
+        hands = sorted(hand_labels, key=repr)
+        for row, hand in enumerate(hands):
+            motion, similarity = hand_labels[hand]
+            self.hud.set_text((10, self.screen_size[0] - 10 - 20 * row),
+                              f"Detected Motion ({hand}): {motion} (Similarity: {similarity:.2f})", self.font_colour)
+        # Lines of hands that left the view
+        for row in range(len(hands), self._hand_pose_rows):
+            self.hud.remove((10, self.screen_size[0] - 10 - 20 * row))
+        self._hand_pose_rows = len(hands)
+
+    def render_gesture(self, gesture: str):
+        self.hud.set_text((10, 40), f"Last Gesture: {gesture}", self.font_colour)
+
+    def compose(self):
+        """
+        Blit the text overlay onto the rendered hands. Call once per frame after all render calls.
+        """
+        self.hud.composite(self.output_image)
+        for box in self.hud.boxes:
+            self._mark_dirty(*box)
 
     def render_hands(self, event: Event):
-        # Clear the previous image
-        self.output_image[:, :] = 0
+        # Clear what the previous frame drew
+        self.clear()
 
         if len(event.hands) == 0:
             return
 
-        for i in range(0, len(event.hands)):
-            hand = event.hands[i]
-            for index_digit in range(0, 5):
-                digit = hand.digits[index_digit]
-                for index_bone in range(0, 4):
-                    bone = digit.bones[index_bone]
-                    wrist = self.get_joint_position(hand.arm.next_joint)
-                    elbow = self.get_joint_position(hand.arm.prev_joint)
-                    if wrist:
-                        cv2.circle(self.output_image, wrist, 3, self.hands_colour, -1)
-
-                    if elbow:
-                        cv2.circle(self.output_image, elbow, 3, self.hands_colour, -1)
-
-                    if wrist and elbow:
-                        cv2.line(self.output_image, wrist, elbow, self.hands_colour, 2)
-
-                    bone_start = self.get_joint_position(bone.prev_joint)
-                    bone_end = self.get_joint_position(bone.next_joint)
-
-                    if bone_start:
-                        cv2.circle(self.output_image, bone_start, 3, self.hands_colour, -1)
-
-                    if bone_end:
-                        cv2.circle(self.output_image, bone_end, 3, self.hands_colour, -1)
-
-                    if bone_start and bone_end:
-                        cv2.line(self.output_image, bone_start, bone_end, self.hands_colour, 2)
-
-                    if ((index_digit == 0) and (index_bone == 0)) or (
-                            (index_digit > 0) and (index_digit < 4) and (index_bone < 2)
-                    ):
-                        index_digit_next = index_digit + 1
-                        digit_next = hand.digits[index_digit_next]
-                        bone_next = digit_next.bones[index_bone]
-                        bone_next_start = self.get_joint_position(bone_next.prev_joint)
-                        if bone_start and bone_next_start:
-                            cv2.line(
-                                self.output_image,
-                                bone_start,
-                                bone_next_start,
-                                self.hands_colour,
-                                2,
-                            )
-
-                    if index_bone == 0 and bone_start and wrist:
-                        cv2.line(self.output_image, bone_start, wrist, self.hands_colour, 2)
-
+        points = self.project_hands(event.hands)
+        chains = points[:, DIGIT_CHAINS].reshape(-1, 5, 2)
+        links = points[:, LINKS].reshape(-1, 2, 2)
+        # Round line caps of width 5 cover exactly the pixels of a filled circle with radius 3
+        joints = np.repeat(points.reshape(-1, 1, 2), 2, axis=1)
+        cv2.polylines(self.output_image, chains, False, self.hands_colour, 2)
+        cv2.polylines(self.output_image, links, False, self.hands_colour, 2)
+        cv2.polylines(self.output_image, joints, False, self.hands_colour, 5)
+        margin = 4
+        self._mark_dirty(points[..., 0].min() - margin, points[..., 1].min() - margin,
+                         points[..., 0].max() + margin, points[..., 1].max() + margin)
+
+    def project_hands(self, hands) -> np.ndarray:
+        """
+        Screen positions of the joints of all hands.
+
+        :return: int32 array of shape (hands, 27, 2): the 5 joints of every digit chain, then wrist and elbow.
+        """
+        points = np.empty((len(hands), 27, 3))
+        for i, hand in enumerate(hands):
+            joints = self._extractor.read_joints(hand)
+            points[i, :25].reshape(5, 5, 3)[:, 0] = joints[:, 0, 0]
+            points[i, :25].reshape(5, 5, 3)[:, 1:] = joints[:, :, 1]
+            wrist = hand.arm.next_joint
+            elbow = hand.arm.prev_joint
+            points[i, 25] = (wrist.x, wrist.y, wrist.z)
+            points[i, 26] = (elbow.x, elbow.y, elbow.z)
+        # Top view: x stays x, z becomes the image row
+        return (points[:, :, ::2] + self._screen_offset).astype(np.int32)
+
+    def _mark_dirty(self, x0, y0, x1, y1):
+        self._dirty.append((x0, y0, x1, y1))
+
+    def clear(self):
+        """
+        Zero only the regions that were drawn since the last clear.
+        """
+        for x0, y0, x1, y1 in self._dirty:
+            x0, y0 = max(int(x0), 0), max(int(y0), 0)
+            x1, y1 = min(int(x1) + 1, self.screen_size[1]), min(int(y1) + 1, self.screen_size[0])
+            if x0 < x1 and y0 < y1:
+                self.output_image[y0:y1, x0:x1] = 0
+        self._dirty = []
@@ -1,20 +1,40 @@
+from __future__ import annotations
+
 import asyncio
 import json
+import math
 import time
 from pathlib import Path
-import cv2
-from bleak import BleakGATTCharacteristic
-import csv
+from typing import TYPE_CHECKING
 
 import argparse
 
-import leap
-
-from  leapmotion import HandPose
 from  canvas import Canvas
-from bluetooth import disconnectFromWatch, searchAndConnectToWatch, startRecording, stopRecording, subscribeToData
+from frame_scheduler import FRAME_POLICIES, PROCESS_ALL, FrameScheduler
 from gesture_listener import GestureListener
-from hand_pose import json_to_hand_pose
+from hand_pose import COSINE, DIAGONAL, MAHALANOBIS, RIGHT, HandIdentity, HandPose, PoseLibrary, json_to_pose_samples
+from pose_events import PoseDispatcher, PoseSubscription
+from pose_filter import LabelHysteresis, OneEuroFilter
+from pose_index import PoseIndex
+from pose_store import is_pose_file
+from render_loop import FrameClock, SnapshotSlot
+from sample_buffer import LabelledSampleBuffer, SampleBuffer
+from session_log import SessionLog, finish_session
+from session_store import export_csv
+from stage_timing import StageTimers
+from temporal_gestures import DTWGestureEngine, GestureMatch, GestureTemplate, load_gesture_templates
+from tracking_capture import ReplayConnection
+from video_writer import DROP_NEWEST, DROP_OLDEST, BLOCK, AsyncVideoWriter
+from watch_data import WatchDataParser
+
+if TYPE_CHECKING:
+    from bleak import BleakGATTCharacteristic
+
+
+def _bluetooth():
+    # bleak is only loaded once a watch is used, it is slow to import and not needed offline
+    import bluetooth
+    return bluetooth
 
 
 class FingerTracking:
@@ -22,130 +42,246 @@ class FingerTracking:
         self.client = None       
         self.running = False 
         self.recording = False
-        self.recorded_hands = {}
-        self.recorded_poses = {}
-        self.manual_poses = {}
-        self.recorded_frames = {}
-        self.recorded_ppg = {}
-        self.recorded_gyro = {}
-        self.recorded_acc = {}
+        self.reset_recorded_data()
+        # Microseconds from the tracking clock to the epoch, estimated while recording
+        self.clock_offset = None
+        self.last_gesture = ""
+        self.hand_labels = {}
+        self._labelled_event = None
+        self.video_writer = None
+        self.video_queue_size = 60
+        self.video_drop_policy = DROP_NEWEST
         self.start_timestamp = "0"
+        # While recording, the streams are spilled to append-only logs within this many bytes of memory
+        self.session_log = None
+        self.memory_limit = 64 * 1024 * 1024
         self._manual_label = "Pose.Resting"
         self.canvas = Canvas()
         self.framerate = 30
+        self.display_rate = 60
         self.last_frame_time = time.time()
+        self.export_csv = False
+        # Smoothing between pose extraction and matching, and optional label hysteresis after it.
+        # Without hysteresis the best pose of every frame is reported, however low its similarity
+        self.pose_filter = OneEuroFilter()
+        self.hysteresis = None
+        self.pose_events = PoseDispatcher()
+        self.latest_pose = SnapshotSlot()
+        self._rendered_version = 0
+        # Stage latencies of the listener and the render loop, toggled with t
+        self.timers = StageTimers()
+        # Which tracking frames are processed when the listener falls behind
+        self.frame_scheduler = FrameScheduler()
+
+
+    def on_pose_detected(self, event,pose:str, similarity:float, hand: HandIdentity):
+        # Runs on the tracking thread: only record and publish, drawing happens in render_frame
+        timestamp = int(event.timestamp)
+        new_frame = event is not self._labelled_event
+        if new_frame:
+            self._labelled_event = event
+        self.hand_labels[hand] = (pose, similarity)
+        if(self.recording):
+            self.recorded_poses.append(timestamp, pose, (similarity, hand.id, hand.chirality == RIGHT))
+            if new_frame:
+                self.sync_clock(timestamp)
+                if(self._manual_label != ""):
+                    self.manual_poses.append(timestamp, self._manual_label)
 
+    def on_frame_done(self, event):
+        # Publish the labels of all hands of the frame at once, hands that were lost are not in them
+        self.latest_pose.publish((event, self.hand_labels, int(event.timestamp)))
+        self.hand_labels = {}
 
-    def on_pose_detected(self, event,pose:str, similarity:float):
-        self.canvas.render_hands(event)
-        timestamp = str(int(1000*(time.time())))
-        self.canvas.render_timestamp(timestamp)
+    def sync_clock(self, timestamp: int):
+        # Delivery latency only makes the offset larger, so the smallest one seen is the best estimate
+        offset = time.time_ns() // 1000 - timestamp
+        if self.clock_offset is None or offset < self.clock_offset:
+            self.clock_offset = offset
+
+    def on_gesture_detected(self, event, match: GestureMatch, hand: HandIdentity):
+        # Runs on the tracking thread like on_pose_detected, render_frame shows it on the HUD
+        self.last_gesture = f"{match.name} ({match.cost:.2f}, {hand})"
         if(self.recording):
+            self.recorded_gestures.append(int(event.timestamp), match.name, (match.cost, hand.id, hand.chirality == RIGHT))
+
+    async def log_pose_events(self, subscription: PoseSubscription):
+        async for pose_event in subscription:
+            print(f"Pose changed ({pose_event.hand}): {pose_event.previous or '-'} -> {pose_event.pose or '-'} "
+                  f"(Similarity: {pose_event.similarity:.2f})")
+
+    def render_frame(self) -> int | None:
+        """
+        :return: Device timestamp of the event if a new one was drawn.
+        """
+        rendered = None
+        version, snapshot = self.latest_pose.take()
+        if version != self._rendered_version:
+            self._rendered_version = version
+            event, hand_labels, timestamp = snapshot
+            rendered = timestamp
+            render_start = self.timers.start()
+            start = self.timers.start()
+            self.canvas.render_hands(event)
+            self.timers.stop("render_hands", start)
+            self.canvas.render_timestamp(str(timestamp))
+            self.canvas.render_hand_poses(hand_labels)
+            if self.last_gesture:
+                self.canvas.render_gesture(self.last_gesture)
+            self.canvas.render_instructions("x: Exit, r: Start Rec, s: Stop Rec, c: Connect watch, t: Timers",
+                                            self.recording)
+            self.canvas.compose()
+            self.timers.stop("render", render_start)
+        video_writer = self.video_writer
+        if(self.recording and video_writer is not None):
             if(self.last_frame_time + 1/self.framerate < time.time()):
                 self.last_frame_time = time.time()
-                self.recorded_frames[timestamp] = self.canvas.output_image.copy()
-        self.canvas.render_pose(pose, similarity)
-        self.canvas.render_instructions("x: Exit, r: Start Rec, s: Stop Rec, c: Connect watch", self.recording)
-        if(self.recording):
-            #self.recorded_hands[timestamp] = pose
-            self.recorded_poses[timestamp] = {"pose": pose, "similarity":similarity}
-            if(self._manual_label != ""):
-                self.manual_poses[timestamp] = self._manual_label
-        
+                video_writer.write(self.canvas.output_image.copy())
+        return rendered
+
+    def start_video(self):
+        Path(f"./recordings/{self.start_timestamp}").mkdir(parents=True, exist_ok=True)
+        self.video_writer = AsyncVideoWriter(f'recordings/{self.start_timestamp}/recording.mp4', self.framerate,
+                                             (self.canvas.screen_size[1], self.canvas.screen_size[0]),
+                                             max_queue=self.video_queue_size, drop_policy=self.video_drop_policy)
+
+    def stop_video(self):
+        video_writer = self.video_writer
+        self.video_writer = None
+        if video_writer is not None:
+            video_writer.close()
+            print(f"Video: {video_writer.written_frames} frames written, {video_writer.dropped_frames} dropped")
+
+    def reset_recorded_data(self):
+        """
+        In-memory buffers for the data that arrives while no session is recorded.
+        """
+        # Timestamped with the tracking event in device microseconds. One pose per hand and frame,
+        # two hands share a timestamp; one manual label per frame
+        self.recorded_poses = LabelledSampleBuffer(3)
+        self.manual_poses = LabelledSampleBuffer(0)
+        self.recorded_gestures = LabelledSampleBuffer(3)
+        self.recorded_ppg = SampleBuffer(3)
+        self.recorded_gyro = SampleBuffer(3)
+        self.recorded_acc = SampleBuffer(3)
+        self.watch_data = WatchDataParser(self.recorded_acc, self.recorded_gyro, self.recorded_ppg)
+
+    def start_session_log(self):
+        """
+        Record into buffers that spill to the stream logs of the session folder as the recording goes on.
+        """
+        log = SessionLog(f"./recordings/{self.start_timestamp}", max_memory=self.memory_limit)
+        self.recorded_acc = log.stream("acc", ["Acc X", "Acc Y", "Acc Z"])
+        self.recorded_gyro = log.stream("gyro", ["Gyro X", "Gyro Y", "Gyro Z"])
+        self.recorded_ppg = log.stream("ppg", ["PPG Green", "PPG IR", "PPG Red"])
+        self.watch_data = WatchDataParser(self.recorded_acc, self.recorded_gyro, self.recorded_ppg)
+        # Tracking streams stay on the device clock, the manifest maps them to the epoch milliseconds of the watch
+        clock = lambda: {"clock_offset": self.clock_offset if self.clock_offset is not None else 0}
+        self.recorded_poses = log.stream("poses", ["Similarity", "Hand Id", "Right Hand"], "Pose", "us", clock)
+        self.recorded_gestures = log.stream("gestures", ["Cost", "Hand Id", "Right Hand"], "Gesture", "us", clock)
+        self.manual_poses = log.stream("manual_poses", [], "Pose", "us", clock)
+        self.session_log = log
+
     def save_recorded_data(self):
-        Path(f"./recordings/{self.start_timestamp}").mkdir(exist_ok=True)
-        fps = self.framerate
-        out = cv2.VideoWriter(f'recordings/{self.start_timestamp}/recording.mp4', cv2.VideoWriter_fourcc(*'mp4v'), fps, (self.canvas.screen_size[1], self.canvas.screen_size[0]))
-        for frame in self.recorded_frames.keys():
-            data = self.recorded_frames[frame]
-            out.write(data)
-        out.release()
-        with open(f"./recordings/{self.start_timestamp}/acc.csv", 'w', newline='') as file:
-            writer = csv.writer(file)
-            writer.writerow(["Timestamp", "Acc X", "Acc Y", "Acc Z"])
-            for time in self.recorded_acc.keys():
-                writer.writerow([time,self.recorded_acc[time][0],self.recorded_acc[time][1],self.recorded_acc[time][2]])
-        with open(f"./recordings/{self.start_timestamp}/gyro.csv", 'w', newline='') as file:
-            writer = csv.writer(file)
-            writer.writerow(["Timestamp", "Gyro X", "Gyro Y", "Gyro Z"])
-            for time in self.recorded_gyro.keys():
-                writer.writerow([time,self.recorded_gyro[time][0],self.recorded_gyro[time][1],self.recorded_gyro[time][2]])
-        with open(f"./recordings/{self.start_timestamp}/ppg.csv", 'w', newline='') as file:
-            writer = csv.writer(file)
-            writer.writerow(["Timestamp", "PPG Green", "PPG IR", "PPG Red"])
-            for time in self.recorded_ppg.keys():
-                writer.writerow([time,self.recorded_ppg[time][0],self.recorded_ppg[time][1],self.recorded_ppg[time][2]])
-        with open(f"./recordings/{self.start_timestamp}/poses.csv", 'w', newline='') as file:
-            writer = csv.writer(file)
-            writer.writerow(["Timestamp", "Pose", "Similarity"])
-            for time in self.recorded_poses.keys():
-                writer.writerow([time,self.recorded_poses[time]["pose"],self.recorded_poses[time]["similarity"]])
-        with open(f"./recordings/{self.start_timestamp}/manual_poses.csv", 'w', newline='') as file:
-            writer = csv.writer(file)
-            writer.writerow(["Timestamp", "Pose"])
-            for time in self.manual_poses.keys():
-                writer.writerow([time,self.manual_poses[time]])
-        # with open(f"./recordings/{self.start_timestamp}/raw_hands.json", 'w') as f:
-        #     json.dump(self.recorded_hands,f,default=lambda o: o.__dict__)
+        log = self.session_log
+        self.session_log = None
+        if log is None:
+            return
+        self.reset_recorded_data()
+        log.close()
+        if log.dropped_samples:
+            print(f"Recording: {log.dropped_samples} samples dropped, the disk could not keep up")
+        finish_session(f"./recordings/{self.start_timestamp}")
+        if self.export_csv:
+            export_csv(f"./recordings/{self.start_timestamp}")
  
+    def print_frame_counts(self):
+        scheduler = self.frame_scheduler
+        print(f"Frames: {scheduler.processed_frames} processed, {scheduler.skipped_frames} skipped "
+              f"({scheduler.skip_ratio:.1%}, policy {scheduler.policy}, {scheduler.processing_time * 1e3:.2f} ms per frame)")
+
     def process_watch_data(self,sender: BleakGATTCharacteristic, data: bytearray):
-        dataString = data.decode('utf-8')
-        messageParts = dataString.split("_")
-        if(len(messageParts) != 2):
-            return
-        sensor_data = messageParts[1].split(";")
-        for set in sensor_data:
-            time = set.split(",")[0]
-            values = set.split(",")[1:]
-            if(len(values) == 3):
-                match messageParts[0][0]:
-                    case 'A':
-                        self.recorded_acc[time] = values
-                    case 'G':
-                        self.recorded_gyro[time] = values
-                    case 'P':
-                        self.recorded_ppg[time] = values
-        
-    async def mainloop(self, custom_poses: dict[str,HandPose] = None):
-        tracking_listener = GestureListener(self.on_pose_detected, customposes=custom_poses)
-        connection = leap.Connection()
+        self.watch_data.parse(data)
+
+    async def mainloop(self, custom_poses: dict[str,HandPose] | PoseLibrary | PoseIndex = None, connection=None,
+                       gesture_templates: list[GestureTemplate] = None):
+        gesture_engine = DTWGestureEngine(gesture_templates) if gesture_templates else None
+        tracking_listener = GestureListener(self.on_pose_detected, customposes=custom_poses,
+                                            gesture_engine=gesture_engine,
+                                            gestureDetectedCallback=self.on_gesture_detected,
+                                            pose_filter=self.pose_filter, hysteresis=self.hysteresis,
+                                            dispatcher=self.pose_events, timers=self.timers,
+                                            scheduler=self.frame_scheduler, frameDoneCallback=self.on_frame_done)
+        pose_log = self.pose_events.subscribe()
+        asyncio.create_task(self.log_pose_events(pose_log))
+        # Imported here so recording tools and benchmarks can use FingerTracking without the device bindings
+        import cv2
+
+        device = connection is None
+        if device or getattr(connection, "live", True):
+            import leap
+            # Event ages are only meaningful for live events, replays keep their recorded timestamps
+            self.timers.clock = leap.get_now
+        if device:
+            connection = leap.Connection()
         connection.add_listener(tracking_listener)
         with connection.open():
-            connection.set_tracking_mode(leap.TrackingMode.Desktop)
+            if device:
+                # Replays ignore the mode and a lent connection was set up by its owner
+                connection.set_tracking_mode(leap.TrackingMode.Desktop)
             self.running = True
+            clock = FrameClock(self.display_rate)
             while self.running:
+                rendered = self.render_frame()
+                start = self.timers.start()
                 cv2.imshow(self.canvas.name, self.canvas.output_image)
+                self.timers.stop("imshow", start)
+                if rendered is not None:
+                    self.timers.record_age("event_age_at_display", rendered)
                 key = cv2.waitKey(1)
+                await asyncio.sleep(clock.time_until_next_frame())
+                clock.tick()
                 if key == ord("x"):
                     print("Exiting")
                     self.running = False
+                    pose_log.close()
+                    self.stop_video()
+                    if self.timers.enabled:
+                        print(self.timers.report())
+                    self.print_frame_counts()
+                    if self.recording:
+                        self.recording = False
+                        self.save_recorded_data()
                     if(self.client is not None):
-                        await disconnectFromWatch(self.client)
+                        await _bluetooth().disconnectFromWatch(self.client)
                 elif key == ord("r"):
                     print("Recording")
                     self.start_timestamp = str(int(1000*time.time()))
+                    self.start_session_log()
                     if(self.client is not None):
-                        await startRecording(self.client, self.start_timestamp)
+                        await _bluetooth().startRecording(self.client, self.start_timestamp)
+                    self.start_video()
                     self.recording = True
                 elif key == ord("s"):
                     print("Stop Recording")
                     self.recording = False
                     if(self.client is not None):
-                        await stopRecording(self.client, str(int(1000*time.time())))
+                        await _bluetooth().stopRecording(self.client, str(int(1000*time.time())))
+                    self.stop_video()
                     self.save_recorded_data()
-                    self.recorded_hands = {}
-                    self.recorded_poses = {}
-                    self.manual_poses = {}
-                    self.recorded_frames = {}
-                    self.recorded_ppg = {}
-                    self.recorded_gyro = {}
-                    self.recorded_acc = {}
+                    self.clock_offset = None
                     self.start_timestamp = "0"
+                elif key == ord("t"):
+                    if self.timers.toggle():
+                        print("Stage timers on")
+                    else:
+                        print(f"Stage timers off\n{self.timers.report()}")
+                        self.print_frame_counts()
                 elif key == ord("c"):
-                    self.client = await searchAndConnectToWatch()
+                    self.client = await _bluetooth().searchAndConnectToWatch()
                     if(self.client is not None):
                         print("Connected to watch")
-                        await subscribeToData(self.client, self.process_watch_data)
+                        await _bluetooth().subscribeToData(self.client, self.process_watch_data)
                     else:
                         print("Could not connect to watch")
                 elif key == ord("j"):
@@ -161,26 +297,114 @@ class FingerTracking:
                     print(f"Manual label set to Resting")
                     self._manual_label = "Pose.Resting"
 
-async def start_window(custom_poses: dict[str,HandPose] = None):
+async def start_window(custom_poses: dict[str,HandPose] | PoseLibrary | PoseIndex = None, connection=None, csv_export: bool = False,
+                       video_queue_size: int = 60, video_drop_policy: str = DROP_NEWEST,
+                       gesture_templates: list[GestureTemplate] = None, smoothing: bool = True,
+                       hysteresis: bool = False, enter_threshold: float = 0.9, exit_threshold: float = 0.8, debounce: float = 0.0,
+                       memory_limit: int = 64 * 1024 * 1024, frame_scheduler: FrameScheduler = None):
     fingertracker = FingerTracking()
-    await fingertracker.mainloop(custom_poses)
+    fingertracker.pose_events.debounce = debounce
+    if not smoothing:
+        fingertracker.pose_filter = None
+    if hysteresis:
+        fingertracker.hysteresis = LabelHysteresis(enter_threshold, exit_threshold)
+    fingertracker.export_csv = csv_export
+    fingertracker.video_queue_size = video_queue_size
+    fingertracker.video_drop_policy = video_drop_policy
+    fingertracker.memory_limit = memory_limit
+    if frame_scheduler is not None:
+        fingertracker.frame_scheduler = frame_scheduler
+    await fingertracker.mainloop(custom_poses, connection, gesture_templates)
+
+def load_pose_matcher(path: str, metric: str = COSINE, knn: int = None) -> PoseLibrary | PoseIndex | None:
+    """
+    Load a JSON or binary (.agposes) poses file for matching.
+
+    :param knn: Match through a nearest-neighbour index with a vote of this many templates.
+    :return: The compiled templates, or None if the file does not exist.
+    """
+    try:
+        if is_pose_file(path):
+            poses = PoseLibrary.from_file(path, metric=metric)
+            print(f"Loaded {len(poses)} pose templates.")
+        else:
+            with open(path, 'r') as f:
+                poses_dict = json.load(f)
+            print(f"Loaded {len(poses_dict)} poses.")
+            samples = {pose_name: json_to_pose_samples(pose_data) for pose_name, pose_data in poses_dict.items()}
+            poses = PoseLibrary.from_samples(samples, metric=metric)
+    except FileNotFoundError:
+        print(f"File {path} not found.")
+        return None
+    if knn:
+        poses = PoseIndex(poses, k=knn)
+    return poses
+
+COSINE_ENTER_THRESHOLD = 0.9
+COSINE_EXIT_THRESHOLD = 0.8
+# The distance metrics report exp(-d^2 / (2 * POSE_VECTOR_SIZE)) (see PoseLibrary). A calibration frame
+# is at a squared distance of about POSE_VECTOR_SIZE from its template (similarity exp(-0.5), about 0.6),
+# a pose is entered within and left beyond these multiples of that distance.
+DISTANCE_ENTER_SCALE = 2.4
+DISTANCE_EXIT_SCALE = 3.2
+
+
+def distance_similarity(scale: float) -> float:
+    """
+    :return: Similarity of a frame at ``scale`` times the squared distance of a typical calibration frame.
+    """
+    return math.exp(-scale / 2)
+
+
+def default_thresholds(metric: str) -> tuple[float, float]:
+    """
+    :return: (enter, exit) hysteresis thresholds for the metric, about (0.3, 0.2) for the distance metrics.
+    """
+    if metric == COSINE:
+        return COSINE_ENTER_THRESHOLD, COSINE_EXIT_THRESHOLD
+    return distance_similarity(DISTANCE_ENTER_SCALE), distance_similarity(DISTANCE_EXIT_SCALE)
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="Pose Recording Tool")
-    parser.add_argument("--path", type=str , help="Path to poses.json file")
+    parser.add_argument("--path", type=str , help="Path to poses.json or poses.agposes file")
+    parser.add_argument("--replay", type=str, help="Replay a tracking capture instead of using the device")
+    parser.add_argument("--csv", action="store_true", help="Also export recordings as CSV files")
+    parser.add_argument("--gestures", type=str, help="Path to dynamic gesture templates")
+    parser.add_argument("--video-queue", type=int, default=60, help="Frames buffered for the video encoder")
+    parser.add_argument("--drop-policy", choices=[DROP_NEWEST, DROP_OLDEST, BLOCK], default=DROP_NEWEST,
+                        help="Which frame to drop when the video encoder falls behind")
+    parser.add_argument("--no-smoothing", action="store_true", help="Match the raw pose of every frame")
+    parser.add_argument("--hysteresis", action="store_true",
+                        help="Report a pose only above --enter-threshold and keep it until --exit-threshold")
+    parser.add_argument("--metric", choices=[COSINE, MAHALANOBIS, DIAGONAL], default=COSINE,
+                        help="Distance used to match calibrated poses")
+    parser.add_argument("--enter-threshold", type=float, help="Similarity needed to switch to a pose")
+    parser.add_argument("--exit-threshold", type=float, help="Similarity below which a pose is left")
+    parser.add_argument("--knn", type=int,
+                        help="Match through a nearest-neighbour index with a vote of this many templates (cosine only)")
+    parser.add_argument("--debounce", type=float, default=0.0, help="Seconds a new pose must persist before it is reported")
+    parser.add_argument("--memory-limit", type=float, default=64,
+                        help="Megabytes of recorded samples held in memory, samples beyond it are dropped")
+    parser.add_argument("--frame-policy", choices=FRAME_POLICIES, default=PROCESS_ALL,
+                        help="Which tracking frames are processed when the listener falls behind")
+    parser.add_argument("--inference-rate", type=float, default=60.0, help="Frames per second with fixed_rate")
+    parser.add_argument("--latency-budget", type=float, default=20.0,
+                        help="Milliseconds from arrival to pose with latency_budget")
     args = parser.parse_args()
+    if args.knn and args.metric != COSINE:
+        parser.error(f"--knn only supports --metric {COSINE}")
     print(args)
-    poses = {}
-    if args.path:
-        try:
-            with open(args.path, 'r') as f:
-                poses_dict = json.load(f)
-                print(f"Loaded {len(poses_dict)} poses.")
-                for pose_name, pose_data in poses_dict.items():
-                    poses[pose_name] = json_to_hand_pose(pose_data)
-        except FileNotFoundError:
-            print(f"File {args.path} not found.")
-            poses = None
-    else:
-        poses = None
-    asyncio.run(start_window(poses))
+    poses = load_pose_matcher(args.path, args.metric, args.knn) if args.path else None
+    connection = ReplayConnection(args.replay, loop=True) if args.replay else None
+    enter_threshold, exit_threshold = default_thresholds(args.metric)
+    if args.enter_threshold is not None:
+        enter_threshold = args.enter_threshold
+    if args.exit_threshold is not None:
+        exit_threshold = args.exit_threshold
+    gesture_templates = load_gesture_templates(args.gestures) if args.gestures else None
+    asyncio.run(start_window(poses, connection, args.csv, args.video_queue, args.drop_policy, gesture_templates,
+                             smoothing=not args.no_smoothing, hysteresis=args.hysteresis,
+                             enter_threshold=enter_threshold, exit_threshold=exit_threshold, debounce=args.debounce,
+                             memory_limit=int(args.memory_limit * 1024 * 1024),
+                             frame_scheduler=FrameScheduler(args.frame_policy, args.inference_rate,
+                                                            args.latency_budget / 1e3)))
@@ -0,0 +1,128 @@
+"""Decides which tracking frames GestureListener processes when it cannot keep up.
+
+The device delivers every frame, 90-120 per second in Desktop mode, and the listener handles them
+one after the other. When processing is slower than that, frames queue up and every pose arrives
+later than the one before. FrameScheduler skips frames instead, by one of three policies:
+
+- "all" processes every frame.
+- "fixed_rate" processes frames at ``rate`` per second of device time and skips the ones in between.
+- "latency_budget" skips frames that could not be done within ``latency_budget`` seconds of when they
+  should have arrived. The lateness of a frame is its arrival time minus its device timestamp,
+  compared with the smallest such difference seen recently (the transport delay without a backlog).
+  Frames that arrive on time are always processed, so skipping drains the backlog and the newest
+  frame is handled. When the device timestamps go back, the transport delay is measured anew.
+
+Processing time is tracked as an exponential moving average of what ``done`` reports.
+"""
+
+import time
+
+PROCESS_ALL = "all"
+FIXED_RATE = "fixed_rate"
+LATENCY_BUDGET = "latency_budget"
+FRAME_POLICIES = (PROCESS_ALL, FIXED_RATE, LATENCY_BUDGET)
+
+
+class FrameScheduler:
+    """
+    :param rate: Frames per second processed with the fixed_rate policy.
+    :param latency_budget: Seconds from arrival to processed pose with the latency_budget policy.
+    :param on_time: Lateness in seconds that is still treated as on time (delivery jitter).
+    :param smoothing: Weight of the newest processing time in its moving average.
+    :param window: Seconds over which the smallest transport delay is kept, so clock drift between
+        the device and the host does not build up.
+    """
+
+    def __init__(self, policy: str = PROCESS_ALL, rate: float = 60.0, latency_budget: float = 0.02,
+                 on_time: float = 0.002, smoothing: float = 0.1, window: float = 5.0):
+        if policy not in FRAME_POLICIES:
+            raise ValueError(f"Unknown frame policy {policy}")
+        self.policy = policy
+        self.rate = rate
+        self.latency_budget = latency_budget
+        self.on_time = on_time
+        self.smoothing = smoothing
+        self.window = window
+        self.reset()
+
+    def reset(self):
+        self.processed_frames = 0
+        self.skipped_frames = 0
+        # Seconds per processed frame, moving average
+        self.processing_time = 0.0
+        self._next_due = None
+        # Smallest (arrival - device timestamp) in microseconds of the current and the previous window
+        self._window_start = None
+        self._window_delay = None
+        self._previous_delay = None
+        self._last_timestamp = None
+
+    def lateness(self, timestamp: int, now: int = None) -> float:
+        """
+        :param timestamp: Device timestamp of the frame in microseconds.
+        :param now: Arrival time in microseconds on the host's monotonic clock.
+        :return: Seconds the frame arrived later than frames without a backlog.
+        """
+        now = time.monotonic_ns() // 1000 if now is None else now
+        timestamp = int(timestamp)
+        delay = now - timestamp
+        if self._last_timestamp is not None and timestamp < self._last_timestamp:
+            # The device clock went back (a replay started over, the service restarted), later frames
+            # are not late by that much
+            self._window_start = None
+            self._window_delay = None
+        self._last_timestamp = timestamp
+        if self._window_start is None or now - self._window_start > self.window * 1e6:
+            self._previous_delay = self._window_delay
+            self._window_delay = delay
+            self._window_start = now
+        elif delay < self._window_delay:
+            self._window_delay = delay
+        return (delay - self._smallest_delay()) / 1e6
+
+    def _smallest_delay(self) -> int:
+        if self._previous_delay is None:
+            return self._window_delay
+        return min(self._window_delay, self._previous_delay)
+
+    def should_process(self, timestamp: int, now: int = None) -> bool:
+        """
+        Call once per frame, counts the frame as processed or skipped.
+        """
+        if self.policy == FIXED_RATE:
+            process = self._due(int(timestamp))
+        elif self.policy == LATENCY_BUDGET:
+            allowed = max(self.latency_budget - self.processing_time, self.on_time)
+            process = self.lateness(timestamp, now) <= allowed
+        else:
+            process = True
+        if process:
+            self.processed_frames += 1
+        else:
+            self.skipped_frames += 1
+        return process
+
+    def _due(self, timestamp: int) -> bool:
+        period = 1e6 / self.rate
+        if self._next_due is None or timestamp - self._next_due > period or timestamp < self._next_due - period:
+            # First frame, a pause in tracking or a jump of the device clock
+            self._next_due = timestamp + period
+            return True
+        if timestamp < self._next_due:
+            return False
+        self._next_due += period
+        return True
+
+    def done(self, seconds: float):
+        """
+        Report how long a processed frame took.
+        """
+        if self.processed_frames <= 1:
+            self.processing_time = seconds
+        else:
+            self.processing_time += self.smoothing * (seconds - self.processing_time)
+
+    @property
+    def skip_ratio(self) -> float:
+        total = self.processed_frames + self.skipped_frames
+        return self.skipped_frames / total if total else 0.0
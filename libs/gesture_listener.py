@@ -1,31 +1,150 @@
+from __future__ import annotations
 
-import json
 import time
-from typing import Callable
-import leap
-from leap.events import Event
+from typing import TYPE_CHECKING, Callable
 
-from hand_pose import HandPose, get_most_similar_pose
+from frame_scheduler import FrameScheduler
+from hand_pose import HandFeatureExtractor, HandIdentity, HandPose, PoseLibrary
+from pose_events import PoseDispatcher
+from pose_filter import LabelHysteresis, OneEuroFilter
+from pose_index import PoseIndex
+from stage_timing import StageTimers
+from temporal_gestures import DTWGestureEngine, GestureMatch, gesture_features
+from tracking_capture import _ListenerBase
 
+if TYPE_CHECKING:
+    from leap.events import Event
 
-class GestureListener(leap.Listener):
-    def __init__(self, poseDetectedCallback: Callable[[Event,str, float], None], customposes: dict[str, HandPose] = None):
+
+class HandState:
+    """
+    Per-hand copies of the stateful pipeline stages, created when a hand appears and dropped when it is lost.
+    """
+
+    def __init__(self, hand: HandIdentity, pose_filter: OneEuroFilter = None, hysteresis: LabelHysteresis = None,
+                 gesture_engine: DTWGestureEngine = None):
+        self.hand = hand
+        self.pose_filter = pose_filter
+        self.hysteresis = hysteresis
+        self.gesture_engine = gesture_engine
+
+
+class GestureListener(_ListenerBase):
+    """
+    Classifies every tracked hand of a frame.
+
+    All hands go through feature extraction and template matching as one batch. Smoothing, hysteresis
+    and gesture matching keep separate state per hand, keyed by hand id and chirality; the given
+    ``pose_filter``, ``hysteresis`` and ``gesture_engine`` are the prototypes copied for every hand.
+    Callbacks receive the HandIdentity as last argument, ``frameDoneCallback`` is called once after the
+    callbacks of all hands of a frame.
+
+    ``scheduler`` decides which frames are processed when the listener cannot keep up with the device,
+    skipped frames only update which hands are tracked.
+
+    ``timers`` records the time spent in every stage of a frame and, with a device clock, the age of
+    the event when it arrives and when the pose callback fires.
+    """
+
+    def __init__(self, poseDetectedCallback: Callable[[Event, str, float, HandIdentity], None],
+                 customposes: dict[str, HandPose] | PoseLibrary | PoseIndex = None,
+                 gesture_engine: DTWGestureEngine = None,
+                 gestureDetectedCallback: Callable[[Event, GestureMatch, HandIdentity], None] = None,
+                 pose_filter: OneEuroFilter = None, hysteresis: LabelHysteresis = None,
+                 dispatcher: PoseDispatcher = None, timers: StageTimers = None,
+                 scheduler: FrameScheduler = None, frameDoneCallback: Callable[[Event], None] = None):
         self.restingRotation = 0
         self.restingRotations = [0]
         self.poseDetectedCallback = poseDetectedCallback
-        if customposes is not None:
-            self.poses = customposes
+        self.poses = customposes if customposes is not None else {}
+        # Compile the templates once instead of walking the dict on every frame
+        if isinstance(self.poses, PoseIndex):
+            self.pose_library = self.poses.library
+        elif isinstance(self.poses, PoseLibrary):
+            self.pose_library = self.poses
+        else:
+            self.pose_library = PoseLibrary(self.poses)
+        # Large multi-sample libraries are matched through a nearest-neighbour index instead of a full scan
+        self.pose_matcher = self.poses if isinstance(self.poses, PoseIndex) else self.pose_library
+        self.feature_extractor = HandFeatureExtractor()
+        # Dynamic gestures are matched over time alongside the per-frame poses
+        self.gesture_engine = gesture_engine
+        self.gestureDetectedCallback = gestureDetectedCallback
+        self.frameDoneCallback = frameDoneCallback
+        # Optional smoothing of the pose vector and stable labels, both run between extraction and callback
+        self.pose_filter = pose_filter
+        self.hysteresis = hysteresis
+        # Change-only events for asynchronous consumers, fed after the per-frame callback
+        self.dispatcher = dispatcher
+        self.hand_states: dict[HandIdentity, HandState] = {}
+        self.timers = timers if timers is not None else StageTimers()
+        self.scheduler = scheduler if scheduler is not None else FrameScheduler()
+
+    def _hand_state(self, hand: HandIdentity) -> HandState:
+        state = self.hand_states.get(hand)
+        if state is None:
+            state = HandState(hand,
+                              self.pose_filter.copy() if self.pose_filter is not None else None,
+                              self.hysteresis.copy() if self.hysteresis is not None else None,
+                              self.gesture_engine.copy() if self.gesture_engine is not None else None)
+        return state
 
     def on_tracking_event(self, event):
-        if len(event.hands) != 0:
-            hand = event.hands[0]
-            pose = HandPose()
-            pose.set_pose_from_hand(hand)
-            similar_pose,similarity = get_most_similar_pose(pose, self.poses)
-            # if(pose.decodedPose == Pose.Resting or pose.decodedPose == Pose.WristFlickOut):
-            #     self.restingRotations.append(pose.handRot[1])
-            #     if(len(self.restingRotations) > 40):
-            #         self.restingRotations.pop(0)
-            #         self.restingRotation = np.average(self.restingRotations)
-
-            self.poseDetectedCallback(event,similar_pose, similarity)
+        timers = self.timers
+        frame_start = timers.start()
+        timers.record_age("event_age", event.timestamp)
+        hands = event.hands
+        hand_states = [self._hand_state(HandIdentity.from_hand(hand)) for hand in hands]
+        states = {state.hand: state for state in hand_states}
+        # Hands that were lost start over with fresh smoothing and labels when they come back
+        for lost in self.hand_states.keys() - states.keys():
+            if self.dispatcher is not None:
+                self.dispatcher.on_hand_lost(event, lost)
+        self.hand_states = states
+        if len(hands) == 0:
+            timers.stop("listener", frame_start)
+            return
+        if not self.scheduler.should_process(event.timestamp):
+            timers.stop("listener", frame_start)
+            return
+
+        process_start = time.perf_counter()
+        start = timers.start()
+        vectors = self.feature_extractor.extract_batch(hands)
+        timers.stop("extract", start)
+        if self.pose_filter is not None:
+            start = timers.start()
+            for i, state in enumerate(hand_states):
+                vectors[i] = state.pose_filter.filter(vectors[i], event.timestamp / 1e6)
+            timers.stop("filter", start)
+        start = timers.start()
+        if self.hysteresis is not None:
+            name_scores = self.pose_matcher.name_scores_batch(vectors)
+            matches = [state.hysteresis.update(name_scores[i]) for i, state in enumerate(hand_states)]
+        else:
+            matches = self.pose_matcher.match_batch(vectors)
+        timers.stop("match", start)
+        # if(pose.decodedPose == Pose.Resting or pose.decodedPose == Pose.WristFlickOut):
+        #     self.restingRotations.append(pose.handRot[1])
+        #     if(len(self.restingRotations) > 40):
+        #         self.restingRotations.pop(0)
+        #         self.restingRotation = np.average(self.restingRotations)
+
+        start = timers.start()
+        timers.record_age("event_age_at_callback", event.timestamp)
+        for i, (state, (similar_pose, similarity)) in enumerate(zip(hand_states, matches)):
+            if self.poseDetectedCallback is not None:
+                self.poseDetectedCallback(event, similar_pose, similarity, state.hand)
+            if self.dispatcher is not None:
+                self.dispatcher.on_pose_detected(event, similar_pose, similarity, state.hand)
+            if state.gesture_engine is not None:
+                pose = HandPose()
+                pose.set_pose_from_hand(hands[i], pose_vector=vectors[i])
+                for match in state.gesture_engine.update(gesture_features(pose)):
+                    if self.gestureDetectedCallback is not None:
+                        self.gestureDetectedCallback(event, match, state.hand)
+        if self.frameDoneCallback is not None:
+            self.frameDoneCallback(event)
+        timers.stop("callbacks", start)
+        timers.stop("listener", frame_start)
+        self.scheduler.done(time.perf_counter() - process_start)
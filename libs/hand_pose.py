@@ -1,12 +1,23 @@
 from __future__ import annotations
 
 import json
-from typing import Any
+from typing import TYPE_CHECKING, Any
 
 import numpy as np
-from leap import datatypes as ldt
 import math
 
+if TYPE_CHECKING:
+    # Only used in annotations, importing the bindings would load the native library
+    from leap import datatypes as ldt
+
+POSE_VECTOR_SIZE = 45
+
+COSINE = "cosine"
+MAHALANOBIS = "mahalanobis"
+DIAGONAL = "diagonal"
+# Per-component variance assumed for templates that were captured from a single frame
+DEFAULT_POSE_VARIANCE = 0.01
+
 
 def euler_from_quaternion(quat: ldt.Quaternion):
     """
@@ -111,6 +122,153 @@ def get_hand_coordinate_system(hand: ldt.Hand):
     return R
 
 
+def _normalized(x: float, y: float, z: float):
+    length = math.sqrt(x * x + y * y + z * z)
+    return x / length, y / length, z / length
+
+
+class HandFeatureExtractor:
+    """
+    Reads every joint of a hand into one preallocated buffer and derives all features from it.
+
+    ``joints`` has the shape (5 digits, 4 bones, 2 joints (prev, next), 3), so the canonical
+    bone directions and the legacy joint angles are computed for the whole hand in one pass.
+    An extractor keeps state between calls and must not be shared between threads.
+    """
+
+    def __init__(self, max_hands: int = 2):
+        self.joints = np.zeros((5, 4, 2, 3))
+        self._joints_flat = self.joints.reshape(-1)
+        self.directions = np.zeros((5, 4, 3))
+        self.canonical_directions = np.zeros((5, 4, 3))
+        self.hand_coordinates = np.eye(3)
+        self._hand_coordinates_flat = self.hand_coordinates.reshape(-1)
+        self._allocate_batch(max_hands)
+
+    def _allocate_batch(self, max_hands: int):
+        self.batch_joints = np.zeros((max_hands, 5, 4, 2, 3))
+        self.batch_coordinates = np.zeros((max_hands, 3, 3))
+        self._batch_directions = np.zeros((max_hands, 20, 3))
+        self._batch_canonical = np.zeros((max_hands, 20, 3))
+
+    @staticmethod
+    def _read_joints_into(hand: ldt.Hand, flat: np.ndarray):
+        i = 0
+        for digit in hand.digits:
+            for bone in digit.bones:
+                prev_joint = bone.prev_joint
+                next_joint = bone.next_joint
+                flat[i:i + 6] = (prev_joint.x, prev_joint.y, prev_joint.z, next_joint.x, next_joint.y, next_joint.z)
+                i += 6
+
+    @staticmethod
+    def _read_coordinates_into(hand: ldt.Hand, flat: np.ndarray):
+        direction = hand.palm.direction
+        normal = hand.palm.normal
+        zx, zy, zz = _normalized(direction.x, direction.y, direction.z)
+        yx, yy, yz = _normalized(normal.x, normal.y, normal.z)
+        xx, xy, xz = _normalized(yy * zz - yz * zy, yz * zx - yx * zz, yx * zy - yy * zx)
+        yx, yy, yz = _normalized(zy * xz - zz * xy, zz * xx - zx * xz, zx * xy - zy * xx)
+        # Columns are axes
+        flat[:] = (xx, yx, zx, xy, yy, zy, xz, yz, zz)
+
+    def read_joints(self, hand: ldt.Hand) -> np.ndarray:
+        self._read_joints_into(hand, self._joints_flat)
+        np.subtract(self.joints[:, :, 1], self.joints[:, :, 0], out=self.directions)
+        return self.joints
+
+    def read_hand_coordinates(self, hand: ldt.Hand) -> np.ndarray:
+        """
+        Same basis as get_hand_coordinate_system, computed on scalars to avoid the small array allocations.
+        """
+        self._read_coordinates_into(hand, self._hand_coordinates_flat)
+        return self.hand_coordinates
+
+    def extract(self, hand: ldt.Hand) -> np.ndarray:
+        """
+        Read the hand and project all bone directions into the hand coordinate system.
+
+        :return: Canonical pose vector (proximal, intermediate and distal bone of every digit).
+        """
+        self.read_joints(hand)
+        self.read_hand_coordinates(hand)
+        # Row vectors times R is R.T @ v for every bone at once
+        np.matmul(self.directions, self.hand_coordinates, out=self.canonical_directions)
+        return self.canonical_directions[:, 1:].flatten()
+
+    def extract_batch(self, hands: list[ldt.Hand]) -> np.ndarray:
+        """
+        Pose vectors of all hands of a frame. Only reading the joints is done per hand, the
+        projection into the hand coordinate systems runs once for the whole batch.
+
+        :return: Array of shape (len(hands), 45). The array is reused by the next call.
+        """
+        count = len(hands)
+        if count > len(self.batch_joints):
+            self._allocate_batch(count)
+        joints = self.batch_joints[:count]
+        coordinates = self.batch_coordinates[:count]
+        for i, hand in enumerate(hands):
+            self._read_joints_into(hand, joints[i].reshape(-1))
+            self._read_coordinates_into(hand, coordinates[i].reshape(-1))
+        directions = self._batch_directions[:count]
+        np.subtract(joints[:, :, :, 1], joints[:, :, :, 0], out=directions.reshape(count, 5, 4, 3))
+        canonical = self._batch_canonical[:count]
+        np.matmul(directions, coordinates, out=canonical)
+        return canonical.reshape(count, 5, 4, 3)[:, :, 1:].reshape(count, POSE_VECTOR_SIZE)
+
+    def joint_angles(self) -> np.ndarray:
+        """
+        Angles in degrees between consecutive bones of every digit, from the last read hand.
+
+        :return: Array of shape (5, 3), e.g. [1, 0] is the index metacarpal / proximal angle.
+        """
+        first = self.directions[:, :-1]
+        second = self.directions[:, 1:]
+        with np.errstate(divide="ignore", invalid="ignore"):
+            cos_theta = np.einsum("ijk,ijk->ij", first, second) / (
+                    np.linalg.norm(first, axis=2) * np.linalg.norm(second, axis=2))
+        return np.degrees(np.arccos(np.clip(cos_theta, -1, 1)))
+
+    def legacy_angle_vector(self) -> np.ndarray:
+        """
+        The 14 angles used by the angle based decode_pose (thumb base/tip, then base/middle/tip per finger).
+        """
+        angles = self.joint_angles()
+        return np.concatenate([angles[0, 1:], angles[1:].ravel()])
+
+
+_default_extractor = HandFeatureExtractor()
+
+
+LEFT = "left"
+RIGHT = "right"
+
+
+class HandIdentity:
+    """
+    Identifies a tracked hand across frames by its tracking id and chirality.
+    """
+
+    def __init__(self, hand_id: int, chirality: str):
+        self.id = hand_id
+        self.chirality = chirality
+
+    @classmethod
+    def from_hand(cls, hand: ldt.Hand) -> HandIdentity:
+        # HandType.Left / Right of the device, the plain int 0 / 1 in replayed captures
+        return cls(int(hand.id), LEFT if getattr(hand.type, "value", hand.type) == 0 else RIGHT)
+
+    def __eq__(self, other):
+        return isinstance(other, HandIdentity) and self.id == other.id and self.chirality == other.chirality
+
+    def __hash__(self):
+        return hash((self.id, self.chirality))
+
+    def __repr__(self):
+        return f"{self.chirality} {self.id}"
+
+
 def json_to_hand_pose(json_data: Any):
     pose = HandPose()
     pose.pinch_distance = json_data["pinch_distance"]
@@ -118,9 +276,23 @@ def json_to_hand_pose(json_data: Any):
     pose.palm_orientation = np.array(json_data["palm_orientation"])
     pose.palm_position = np.array(json_data["palm_position"])
     pose.pose_vector = np.array(json_data["pose_vector"])
+    pose.sample_count = json_data.get("sample_count", 1)
+    if "precision" in json_data:
+        pose.precision = np.array(json_data["precision"])
+    if "variance" in json_data:
+        pose.variance = np.array(json_data["variance"])
     return pose
 
 
+def json_to_pose_samples(json_data: Any) -> list[HandPose]:
+    """
+    Pose files store one pose or a list of calibrated samples per name.
+    """
+    if isinstance(json_data, list):
+        return [json_to_hand_pose(sample) for sample in json_data]
+    return [json_to_hand_pose(json_data)]
+
+
 class HandPose:
     def __init__(self):
         # Each fingers pose is represented by a vector from its base
@@ -138,49 +310,360 @@ class HandPose:
         self.pinch_strength = 0
         self.palm_orientation = np.array([0, 0, 0, 0])
         self.palm_position = np.array([0, 0, 0])
+        # Set by set_statistics when the pose was calibrated over several frames
+        self.sample_count = 1
+        self.precision = None
+        self.variance = None
 
     def as_dict(self):
-        return {
+        data = {
             "pinch_distance": self.pinch_distance,
             "pinch_strength": self.pinch_strength,
             "palm_orientation": self.palm_orientation.tolist(),
             "palm_position": self.palm_position.tolist(),
             "pose_vector": self.pose_vector.tolist()
         }
-
-    def set_pose_from_hand(self, hand: ldt.Hand):
+        if self.precision is not None:
+            data["sample_count"] = self.sample_count
+            data["precision"] = self.precision.tolist()
+            data["variance"] = self.variance.tolist()
+        return data
+
+    def set_statistics(self, statistics: PoseStatistics, shrinkage: float = None):
+        """
+        Use the mean of a multi-frame calibration as pose vector and keep its spread for matching.
+        """
+        self.pose_vector = statistics.mean.copy()
+        self.sample_count = statistics.count
+        self.precision = statistics.precision(shrinkage)
+        self.variance = statistics.variance()
+
+    def set_pose_from_hand(self, hand: ldt.Hand, extractor: HandFeatureExtractor = None,
+                           pose_vector: np.ndarray = None):
+        """
+        :param pose_vector: Already extracted pose vector of the hand, e.g. from extract_batch.
+        """
         self.pinch_distance = hand.pinch_distance
         self.pinch_strength = hand.pinch_strength
         self.palm_orientation = np.array(
             [hand.palm.orientation.x, hand.palm.orientation.y, hand.palm.orientation.z, hand.palm.orientation.w])
         self.palm_position = np.array([hand.palm.position.x, hand.palm.position.y, hand.palm.position.z])
 
-        hand_coordinates = get_hand_coordinate_system(hand)
-        palm_pos = self.palm_position
-
-        self.pose_vector = np.array([
-            get_canonical_direction_from_bone(hand.thumb.proximal, hand_coordinates, palm_pos),
-            get_canonical_direction_from_bone(hand.thumb.intermediate, hand_coordinates, palm_pos),
-            get_canonical_direction_from_bone(hand.thumb.distal, hand_coordinates, palm_pos),
-            get_canonical_direction_from_bone(hand.index.proximal, hand_coordinates, palm_pos),
-            get_canonical_direction_from_bone(hand.index.intermediate, hand_coordinates, palm_pos),
-            get_canonical_direction_from_bone(hand.index.distal, hand_coordinates, palm_pos),
-            get_canonical_direction_from_bone(hand.middle.proximal, hand_coordinates, palm_pos),
-            get_canonical_direction_from_bone(hand.middle.intermediate, hand_coordinates, palm_pos),
-            get_canonical_direction_from_bone(hand.middle.distal, hand_coordinates, palm_pos),
-            get_canonical_direction_from_bone(hand.ring.proximal, hand_coordinates, palm_pos),
-            get_canonical_direction_from_bone(hand.ring.intermediate, hand_coordinates, palm_pos),
-            get_canonical_direction_from_bone(hand.ring.distal, hand_coordinates, palm_pos),
-            get_canonical_direction_from_bone(hand.pinky.proximal, hand_coordinates, palm_pos),
-            get_canonical_direction_from_bone(hand.pinky.intermediate, hand_coordinates, palm_pos),
-            get_canonical_direction_from_bone(hand.pinky.distal, hand_coordinates, palm_pos)
-        ]).flatten()
+        if pose_vector is not None:
+            self.pose_vector = np.array(pose_vector)
+            return
+        if extractor is None:
+            extractor = _default_extractor
+        self.pose_vector = extractor.extract(hand)
 
     def compare_to_pose(self, target_pose: HandPose):
         return calculate_similarity(self.pose_vector, target_pose.pose_vector)
 
 
-def get_most_similar_pose(hand_pose : HandPose, poses: dict[str,HandPose]):
+class PoseStatistics:
+    """
+    Running mean and covariance of pose vectors (Welford), constant memory for any number of frames.
+    """
+
+    def __init__(self, size: int = POSE_VECTOR_SIZE, min_variance: float = 1e-4):
+        """
+        :param min_variance: Variance floor per component, keeps components that never moved invertible.
+        """
+        self.min_variance = min_variance
+        self.count = 0
+        self.mean = np.zeros(size)
+        self._m2 = np.zeros((size, size))
+        self._delta = np.zeros(size)
+        self._outer = np.zeros((size, size))
+
+    def add(self, vector: np.ndarray):
+        count = self.count + 1
+        np.subtract(vector, self.mean, out=self._delta)
+        self.mean += self._delta / count
+        np.multiply.outer(self._delta, vector - self.mean, out=self._outer)
+        self._m2 += self._outer
+        # Counted last, so a reader on another thread that sees the count also sees the update
+        self.count = count
+
+    def covariance(self) -> np.ndarray:
+        if self.count < 2:
+            return np.zeros_like(self._m2)
+        return self._m2 / (self.count - 1)
+
+    def variance(self) -> np.ndarray:
+        return np.maximum(np.diag(self.covariance()), self.min_variance)
+
+    def precision(self, shrinkage: float = None) -> np.ndarray:
+        """
+        Inverse of the covariance shrunk towards its diagonal.
+
+        :param shrinkage: Weight of the diagonal target between 0 and 1. Defaults to size / (count + size),
+            so few frames lean on the per-component variances.
+        """
+        size = len(self.mean)
+        if shrinkage is None:
+            shrinkage = size / (self.count + size)
+        shrunk = (1 - shrinkage) * self.covariance()
+        np.fill_diagonal(shrunk, self.variance())
+        return np.linalg.inv(shrunk)
+
+
+class PoseLibrary:
+    """
+    Compiled set of pose templates.
+
+    All template vectors are stacked into one L2-normalized matrix, so a frame is scored
+    against every template with a single matrix-vector product instead of a Python loop.
+    The template norms are computed once and cached in ``norms``.
+
+    With the "mahalanobis" and "diagonal" metrics the squared distance to every template is
+    expanded into quadratic, linear and constant terms that are precomputed here, so a frame
+    again costs a few matrix-vector products. Distances are reported as similarity
+    ``exp(-d^2 / (2 * 45))``: 1 on the template mean and about 0.6 for a typical calibration frame.
+    """
+
+    def __init__(self, poses: dict[str, HandPose] = None, thresholds: dict[str, float] = None,
+                 metric: str = COSINE):
+        """
+        :param poses: Templates keyed by pose name.
+        :param thresholds: Optional per-pose minimum similarity. A pose is only reported when its
+            similarity exceeds its threshold (default 0, like get_most_similar_pose).
+        :param metric: "cosine", "mahalanobis" (full precision matrix) or "diagonal" (per-component variance).
+        """
+        poses = poses if poses is not None else {}
+        names = list(poses.keys())
+        self._compile(names, [poses[name].pose_vector for name in names], thresholds, metric,
+                      [poses[name].precision for name in names], [poses[name].variance for name in names])
+
+    @classmethod
+    def from_vectors(cls, names: list[str], vectors: np.ndarray, thresholds: dict[str, float] = None,
+                     metric: str = COSINE, precisions: list[np.ndarray] = None, variances: list[np.ndarray] = None):
+        library = cls.__new__(cls)
+        library._compile(list(names), vectors, thresholds, metric, precisions, variances)
+        return library
+
+    @classmethod
+    def from_samples(cls, samples: dict[str, list[HandPose]], thresholds: dict[str, float] = None,
+                     metric: str = COSINE):
+        """
+        Library with several templates per pose name, e.g. from json_to_pose_samples.
+        """
+        poses = [(name, pose) for name, name_poses in samples.items() for pose in name_poses]
+        return cls.from_vectors([name for name, _ in poses], [pose.pose_vector for _, pose in poses], thresholds,
+                                metric, [pose.precision for _, pose in poses], [pose.variance for _, pose in poses])
+
+    @classmethod
+    def from_file(cls, path: str, thresholds: dict[str, float] = None, metric: str = COSINE):
+        """
+        Library from a binary pose file (pose_store.write_pose_file). The file is memory-mapped and its
+        normalized template matrix and norms are used as stored instead of being recomputed.
+        """
+        from pose_store import PoseFile
+        pose_file = PoseFile(path)
+        library = cls.__new__(cls)
+        precisions = pose_file.precisions() if metric == MAHALANOBIS else None
+        variances = pose_file.variances() if metric == DIAGONAL else None
+        library._compile(pose_file.template_names(), pose_file.vectors, thresholds, metric, precisions, variances,
+                         pose_file.matrix, pose_file.norms)
+        return library
+
+    def _compile(self, names: list[str], vectors, thresholds: dict[str, float] = None, metric: str = COSINE,
+                 precisions: list[np.ndarray] = None, variances: list[np.ndarray] = None,
+                 matrix: np.ndarray = None, norms: np.ndarray = None):
+        """
+        :param matrix: Already normalized templates with their ``norms``, e.g. memory-mapped from a pose file.
+        """
+        if metric not in (COSINE, MAHALANOBIS, DIAGONAL):
+            raise ValueError(f"Unknown metric {metric}")
+        self.names = names
+        self.metric = metric
+        # Templates grouped by pose name, for the best similarity of every name
+        self.pose_names = list(dict.fromkeys(names))
+        codes = {name: code for code, name in enumerate(self.pose_names)}
+        name_codes = np.array([codes[name] for name in names], dtype=np.intp)
+        self._name_order = np.argsort(name_codes, kind="stable")
+        self._name_starts = np.searchsorted(name_codes[self._name_order], np.arange(len(self.pose_names)))
+        if len(names) == 0:
+            vectors = np.zeros((0, POSE_VECTOR_SIZE))
+        else:
+            vectors = np.asarray(vectors, dtype=np.float64).reshape(len(names), -1)
+        if matrix is not None:
+            self.norms = norms
+            self.matrix = matrix
+        else:
+            self.norms = np.linalg.norm(vectors, axis=1)
+            safe_norms = np.where(self.norms > 0, self.norms, 1.0)
+            # Zero templates stay zero and therefore never match
+            self.matrix = vectors / safe_norms[:, None]
+        self.thresholds = np.zeros(len(names))
+        if thresholds is not None:
+            self.set_thresholds(thresholds)
+        if metric == MAHALANOBIS:
+            self._compile_mahalanobis(vectors, precisions)
+        elif metric == DIAGONAL:
+            self._compile_diagonal(vectors, variances)
+
+    def _compile_mahalanobis(self, means: np.ndarray, precisions: list[np.ndarray] = None):
+        count, size = means.shape
+        given = [precisions[i] if precisions is not None else None for i in range(count)]
+        # Only calibrated templates get a precision matrix, the others use the isotropic default
+        self._full = np.array([i for i in range(count) if given[i] is not None], dtype=np.intp)
+        full_precision = np.array([given[i] for i in self._full], dtype=np.float64).reshape(-1, size, size)
+        self._isotropic = np.full(count, 1 / DEFAULT_POSE_VARIANCE)
+        self._isotropic[self._full] = 0
+        # (x - m)' P (x - m) = x' P x - 2 (P m)' x + m' P m, the quadratic term only needs the upper triangle
+        self._pairs = np.triu_indices(size)
+        weights = np.where(self._pairs[0] == self._pairs[1], 1.0, 2.0)
+        self._quadratic = full_precision[:, self._pairs[0], self._pairs[1]] * weights
+        projected = means * self._isotropic[:, None]
+        projected[self._full] = np.einsum("tij,tj->ti", full_precision, means[self._full])
+        self._linear = -2 * projected
+        self._constant = np.einsum("ti,ti->t", projected, means)
+
+    def _compile_diagonal(self, means: np.ndarray, variances: list[np.ndarray] = None):
+        count, size = means.shape
+        inverse = np.empty((count, size))
+        for i in range(count):
+            given = variances[i] if variances is not None else None
+            inverse[i] = 1 / given if given is not None else 1 / DEFAULT_POSE_VARIANCE
+        self._quadratic = inverse
+        self._linear = -2 * means * inverse
+        self._constant = np.einsum("ti,ti->t", means * means, inverse)
+
+    def distance_batch(self, vectors: np.ndarray) -> np.ndarray:
+        """
+        Squared Mahalanobis or variance-weighted distance of N pose vectors to every template.
+
+        :return: Array of shape (N, len(names)).
+        """
+        vectors = np.asarray(vectors, dtype=np.float64)
+        distances = vectors @ self._linear.T + self._constant
+        if self.metric == MAHALANOBIS:
+            distances += np.einsum("ni,ni->n", vectors, vectors)[:, None] * self._isotropic
+            if len(self._full) == len(self.names):
+                distances += (vectors[:, self._pairs[0]] * vectors[:, self._pairs[1]]) @ self._quadratic.T
+            elif len(self._full):
+                distances[:, self._full] += (vectors[:, self._pairs[0]] * vectors[:, self._pairs[1]]) @ self._quadratic.T
+        else:
+            distances += (vectors * vectors) @ self._quadratic.T
+        return np.maximum(distances, 0)
+
+    def __len__(self):
+        return len(self.names)
+
+    def set_thresholds(self, thresholds: dict[str, float]):
+        for i, name in enumerate(self.names):
+            if name in thresholds:
+                self.thresholds[i] = thresholds[name]
+
+    def score(self, pose: HandPose | np.ndarray) -> np.ndarray:
+        """
+        Similarity of one pose against every template, cosine unless another metric was compiled.
+
+        :param pose: HandPose or raw pose vector.
+        :return: Array of similarities in the order of ``names``.
+        """
+        vector = pose.pose_vector if isinstance(pose, HandPose) else pose
+        return self.score_batch(np.asarray(vector, dtype=np.float64)[None, :])[0]
+
+    def score_batch(self, vectors: np.ndarray) -> np.ndarray:
+        """
+        Similarity of N pose vectors against every template.
+
+        :param vectors: Array of shape (N, 45).
+        :return: Array of shape (N, len(names)).
+        """
+        vectors = np.asarray(vectors, dtype=np.float64)
+        if self.metric != COSINE:
+            return np.exp(self.distance_batch(vectors) / (-2 * vectors.shape[1]))
+        norms = np.linalg.norm(vectors, axis=1)
+        norms[norms == 0] = np.inf
+        # Multiply in the precision of the matrix, float32 libraries would otherwise be converted on every call
+        return (vectors.astype(self.matrix.dtype, copy=False) @ self.matrix.T) / norms[:, None]
+
+    def best(self, scores: np.ndarray) -> tuple[str, float]:
+        """
+        :return: (name, similarity) of the best template for one row of scores, or ("", 0).
+        """
+        if len(self.names) == 0:
+            return "", 0
+        accepted = np.where(scores > self.thresholds, scores, -np.inf)
+        best = int(np.argmax(accepted))
+        if not accepted[best] > 0:
+            return "", 0
+        return self.names[best], scores[best]
+
+    def match(self, pose: HandPose | np.ndarray):
+        """
+        :return: (name, similarity) of the best template, or ("", 0) if none passes its threshold.
+        """
+        return self.best(self.score(pose))
+
+    def match_batch(self, vectors: np.ndarray) -> list[tuple[str, float]]:
+        return [self.best(scores) for scores in self.score_batch(vectors)]
+
+    def name_scores_batch(self, vectors: np.ndarray) -> list[dict[str, float]]:
+        """
+        Best similarity of every pose name for N pose vectors, over all templates of the name.
+
+        :return: Per vector, name -> similarity of the names that pass their thresholds, best first.
+        """
+        if len(self.pose_names) == 0:
+            return [{} for _ in range(len(vectors))]
+        scores = self.score_batch(vectors)
+        accepted = np.where(scores > self.thresholds, scores, -np.inf)
+        best = np.maximum.reduceat(accepted[:, self._name_order], self._name_starts, axis=1)
+        order = np.argsort(-best, axis=1, kind="stable")
+        return [{self.pose_names[i]: float(row[i]) for i in row_order if row[i] > 0}
+                for row, row_order in zip(best, order)]
+
+    def top_k(self, pose: HandPose | np.ndarray, k: int = 3) -> list[tuple[str, float]]:
+        """
+        :return: Up to k (name, similarity) pairs that pass their thresholds, best first.
+        """
+        scores = self.score(pose)
+        order = np.argsort(-scores, kind="stable")[:k]
+        return [(self.names[i], scores[i]) for i in order if scores[i] > self.thresholds[i] and scores[i] > 0]
+
+    def knn(self, pose: HandPose | np.ndarray, k: int = 5) -> tuple[np.ndarray, np.ndarray]:
+        """
+        Exact k nearest templates by cosine similarity.
+
+        :return: (template indices, similarities), best first.
+        """
+        scores = self.score(pose)
+        k = min(k, len(scores))
+        nearest = np.argpartition(-scores, k - 1)[:k] if k > 0 else np.zeros(0, dtype=np.intp)
+        nearest = nearest[np.argsort(-scores[nearest], kind="stable")]
+        return nearest, scores[nearest]
+
+    def vote(self, indices: np.ndarray, similarities: np.ndarray) -> tuple[str, float]:
+        """
+        Majority vote of the neighbours that pass their thresholds. Ties go to the name with the
+        larger summed similarity.
+
+        :return: (name, best similarity of that name), or ("", 0) if no neighbour passes.
+        """
+        return next(iter(self.ranked_votes(indices, similarities).items()), ("", 0))
+
+    def ranked_votes(self, indices: np.ndarray, similarities: np.ndarray) -> dict[str, float]:
+        """
+        :return: Name -> best similarity of the names among the neighbours that pass their thresholds,
+            in the order of the vote (most votes first, ties by summed similarity).
+        """
+        votes = {}
+        for i, similarity in zip(indices, similarities):
+            if similarity > self.thresholds[i] and similarity > 0:
+                count, total, best = votes.get(self.names[i], (0, 0.0, 0.0))
+                votes[self.names[i]] = (count + 1, total + similarity, max(best, similarity))
+        ranked = sorted(votes, key=lambda n: votes[n][:2], reverse=True)
+        return {name: float(votes[name][2]) for name in ranked}
+
+    def match_knn(self, pose: HandPose | np.ndarray, k: int = 5) -> tuple[str, float]:
+        return self.vote(*self.knn(pose, k))
+
+
+def get_most_similar_pose(hand_pose : HandPose, poses: dict[str,HandPose] | PoseLibrary):
     # if self.handRot[0] < -30:
     #     self.decodedPose = Pose.WristFlickDown
     # elif self.handRot[0] > 50:
@@ -189,13 +672,9 @@ def get_most_similar_pose(hand_pose : HandPose, poses: dict[str,HandPose]):
     #     self.decodedPose = Pose.WristFlickOut
     # elif self.handRot[1] < -15: ##UNATURAL MOVEMENT
     #     self.decodedPose = Pose.WristFlickIn
-    highestSimilarity = 0
-    decodedPose = ""
-    for pose in poses.keys():
-        similarity = hand_pose.compare_to_pose(poses[pose])
-        if similarity > highestSimilarity:
-            decodedPose = pose
-            highestSimilarity = similarity
+    if not isinstance(poses, PoseLibrary):
+        poses = PoseLibrary(poses)
+    decodedPose, highestSimilarity = poses.match(hand_pose)
     # if highestSimilarity < 0.9:
     #     decodedPose = "unknown"
     return decodedPose, highestSimilarity
\ No newline at end of file
@@ -0,0 +1,73 @@
+import cv2
+import numpy as np
+
+
+class HudLayer:
+    """
+    Text overlay that keeps every line rasterized between frames.
+
+    Lines are keyed by their origin. A line is only formatted and drawn again when its content
+    changes; the pixels of all lines are kept as one index/colour list and copied onto the
+    target image with a single scatter blit.
+    """
+
+    def __init__(self, size: tuple[int, int], font_scale: float = 0.5, thickness: int = 1):
+        self.size = size
+        self.font_scale = font_scale
+        self.thickness = thickness
+        # origin -> (text, colour, (x0, y0, x1, y1), flat pixel indices, pixel colours)
+        self._lines = {}
+        # origin -> (label, rounded values) of lines set through set_values
+        self._values = {}
+        self._pixels = np.zeros(0, dtype=np.intp)
+        self._colours = np.zeros(0, dtype=np.uint8)
+        self._changed = False
+
+    @property
+    def boxes(self) -> list[tuple[int, int, int, int]]:
+        return [line[2] for line in self._lines.values()]
+
+    def set_text(self, origin: tuple[int, int], text: str, colour: tuple[int, int, int]):
+        line = self._lines.get(origin)
+        if line is not None and line[0] == text and line[1] == colour:
+            return
+        (width, height), baseline = cv2.getTextSize(text, cv2.FONT_HERSHEY_SIMPLEX, self.font_scale, self.thickness)
+        x0, y0 = max(origin[0], 0), max(origin[1] - height - 1, 0)
+        x1, y1 = min(origin[0] + width + 1, self.size[1]), min(origin[1] + baseline + 1, self.size[0])
+        strip = np.zeros((max(y1 - y0, 0), max(x1 - x0, 0), 3), np.uint8)
+        cv2.putText(strip, text, (origin[0] - x0, origin[1] - y0), cv2.FONT_HERSHEY_SIMPLEX, self.font_scale,
+                    colour, self.thickness)
+        rows, columns = np.nonzero(strip[:, :, 0] | strip[:, :, 1] | strip[:, :, 2])
+        pixels = (rows + y0) * self.size[1] + (columns + x0)
+        self._lines[origin] = (text, colour, (x0, y0, x1, y1), pixels, strip[rows, columns])
+        self._changed = True
+
+    def set_values(self, origin: tuple[int, int], label: str, values, colour: tuple[int, int, int],
+                   decimals: int = 1):
+        """
+        Show ``label: v1, v2, ...``. Formatting is skipped while the values are unchanged at display precision.
+        """
+        rounded = np.round(np.asarray(values, dtype=np.float64), decimals)
+        cached = self._values.get(origin)
+        if cached is not None and cached[0] == label and np.array_equal(cached[1], rounded):
+            line = self._lines.get(origin)
+            if line is not None and line[1] == colour:
+                return
+        self._values[origin] = (label, rounded)
+        self.set_text(origin, f"{label}: " + ", ".join(f"{value:.{decimals}f}" for value in rounded.ravel()), colour)
+
+    def remove(self, origin: tuple[int, int]):
+        self._values.pop(origin, None)
+        if self._lines.pop(origin, None) is not None:
+            self._changed = True
+
+    def composite(self, target: np.ndarray):
+        if self._changed:
+            lines = list(self._lines.values())
+            pixels = np.concatenate([line[3] for line in lines]) if lines else np.zeros(0, dtype=np.intp)
+            colours = np.concatenate([line[4] for line in lines]) if lines else np.zeros((0, 3), np.uint8)
+            # Index single bytes, scattering whole pixels is about twice as slow
+            self._pixels = (pixels[:, None] * 3 + np.arange(3)).ravel()
+            self._colours = colours.ravel()
+            self._changed = False
+        target.reshape(-1)[self._pixels] = self._colours
@@ -12,11 +12,10 @@ import leap
 from leap import datatypes as ldt
 from enum import Enum
 import math
-from scipy.spatial.transform import Rotation as R
 import numpy as np
 from leap.events import Event
 
-from hand_pose import euler_from_quaternion
+from hand_pose import HandFeatureExtractor, euler_from_quaternion
 
 
 # Function to compute the angle between two vectors
@@ -128,6 +127,9 @@ default_poses = [
         "pose_vector": np.array([7,3,9,11,8,8,12,7,11,13,8,5,9,7])
     }
 ]
+_angle_extractor = HandFeatureExtractor()
+
+
 class HandPose:
     def __init__(self):
         self.pose = Pose.Unknown
@@ -170,48 +172,16 @@ def get_most_similar_pose(pose_vector: np.ndarray[float], poses: list[dict]) ->
 
    
 
-def decode_pose (hand: ldt.Hand, restingRotation = 0, poses: list[dict] = default_poses) -> HandPose:
+def decode_pose (hand: ldt.Hand, restingRotation = 0, poses: list[dict] = default_poses,
+                 extractor: HandFeatureExtractor = None) -> HandPose:
+    if extractor is None:
+        extractor = _angle_extractor
     pinchDistance = hand.pinch_distance
     pinchStrength = hand.pinch_strength
-    thumb = hand.digits[0]
-    thumbBaseAngle = get_angle(thumb.proximal, thumb.intermediate)
-    thumbTipAngle = get_angle(thumb.intermediate, thumb.distal)
-    index = hand.digits[1]
-    indexBaseAngle = get_angle(index.metacarpal, index.proximal)
-    indexMiddleAngle = get_angle(index.proximal, index.intermediate)
-    indexTipAngle = get_angle(index.intermediate, index.distal)
-    middle = hand.digits[2]
-    middleBaseAngle = get_angle(middle.metacarpal, middle.proximal)
-    middleMiddleAngle = get_angle(middle.proximal, middle.intermediate)
-    middleTipAngle = get_angle(middle.intermediate, middle.distal)
-    ring = hand.digits[3]
-    ringBaseAngle = get_angle(ring.metacarpal, ring.proximal)
-    ringMiddleAngle = get_angle(ring.proximal, ring.intermediate)
-    ringTipAngle = get_angle(ring.intermediate, ring.distal)
-    pinky = hand.digits[4]
-    pinkyBaseAngle = get_angle(pinky.metacarpal, pinky.proximal)
-    pinkyMiddleAngle = get_angle(pinky.proximal, pinky.intermediate)
-    pinkyTipAngle = get_angle(pinky.intermediate, pinky.distal)
+    extractor.read_joints(hand)
     handRot = np.rad2deg(euler_from_quaternion(hand.palm.orientation))
     if handRot[2] < 0:
         handRot[2] = handRot[2] + 360
-    pose_vector = np.array([
-        thumbBaseAngle,thumbTipAngle,
-        indexBaseAngle,indexMiddleAngle,indexTipAngle,
-        middleBaseAngle,middleMiddleAngle,middleTipAngle,
-        ringBaseAngle,ringMiddleAngle,ringTipAngle,
-        pinkyBaseAngle,pinkyMiddleAngle,pinkyTipAngle
-    ])
+    # thumb base/tip, then base/middle/tip of index, middle, ring and pinky
+    pose_vector = extractor.legacy_angle_vector()
     return get_most_similar_pose(pose_vector, poses)
-   
-
-
-def get_angle(metacarpal_bone:ldt.Bone, proximal_phalange_bone:ldt.Bone):
-    metacarpal_direction = np.array([metacarpal_bone.next_joint.x, metacarpal_bone.next_joint.y, metacarpal_bone.next_joint.z]) - np.array([metacarpal_bone.prev_joint.x, metacarpal_bone.prev_joint.y, metacarpal_bone.prev_joint.z])
-    prox_phal_direction = np.array([proximal_phalange_bone.next_joint.x, proximal_phalange_bone.next_joint.y, proximal_phalange_bone.next_joint.z]) - np.array([proximal_phalange_bone.prev_joint.x, proximal_phalange_bone.prev_joint.y, proximal_phalange_bone.prev_joint.z])
-    dotProduct = np.vecdot(metacarpal_direction,prox_phal_direction)
-    norm = np.linalg.norm(metacarpal_direction)*np.linalg.norm(prox_phal_direction)
-    CosTheta = np.maximum(np.minimum(dotProduct/norm,1),-1)
-    angle = np.real(np.arccos(CosTheta))
-    return np.degrees(angle)
-
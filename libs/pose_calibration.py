@@ -1,42 +1,42 @@
+from __future__ import annotations
+
 import asyncio
 import json
 import time
 from tkinter import Tk, filedialog
+from typing import TYPE_CHECKING
 import cv2
-import leap
-from leap import datatypes as ldt
 import numpy as np
-import leap
-from leapmotion import euler_from_quaternion
 import argparse
+from pathlib import Path
 
 from canvas import Canvas
 from handAngles import HandAngles
-from hand_pose import HandPose
+from hand_pose import LEFT, RIGHT, HandFeatureExtractor, HandIdentity, HandPose, PoseStatistics, euler_from_quaternion
+from render_loop import FrameClock, SnapshotSlot
+from temporal_gestures import GestureTemplate, gesture_features, save_gesture_templates
+from tracking_capture import ReplayConnection, _ListenerBase
+
+if TYPE_CHECKING:
+    from leap import datatypes as ldt
+
 
+_angle_extractor = HandFeatureExtractor()
 
-def decode_pose(hand: ldt.Hand):
+
+def decode_pose(hand: ldt.Hand, extractor: HandFeatureExtractor = None):
+    if extractor is None:
+        extractor = _angle_extractor
     pinchDistance = hand.pinch_distance
     pinchStrength = hand.pinch_strength
-    thumb = hand.digits[0]
-    thumbBaseAngle = get_angle(thumb.proximal, thumb.intermediate)
-    thumbTipAngle = get_angle(thumb.intermediate, thumb.distal)
-    index = hand.digits[1]
-    indexBaseAngle = get_angle(index.metacarpal, index.proximal)
-    indexMiddleAngle = get_angle(index.proximal, index.intermediate)
-    indexTipAngle = get_angle(index.intermediate, index.distal)
-    middle = hand.digits[2]
-    middleBaseAngle = get_angle(middle.metacarpal, middle.proximal)
-    middleMiddleAngle = get_angle(middle.proximal, middle.intermediate)
-    middleTipAngle = get_angle(middle.intermediate, middle.distal)
-    ring = hand.digits[3]
-    ringBaseAngle = get_angle(ring.metacarpal, ring.proximal)
-    ringMiddleAngle = get_angle(ring.proximal, ring.intermediate)
-    ringTipAngle = get_angle(ring.intermediate, ring.distal)
-    pinky = hand.digits[4]
-    pinkyBaseAngle = get_angle(pinky.metacarpal, pinky.proximal)
-    pinkyMiddleAngle = get_angle(pinky.proximal, pinky.intermediate)
-    pinkyTipAngle = get_angle(pinky.intermediate, pinky.distal)
+    extractor.read_joints(hand)
+    # Rows are digits, columns the angles between consecutive bones
+    angles = extractor.joint_angles()
+    thumbBaseAngle, thumbTipAngle = int(angles[0, 1]), int(angles[0, 2])
+    indexBaseAngle, indexMiddleAngle, indexTipAngle = (int(a) for a in angles[1])
+    middleBaseAngle, middleMiddleAngle, middleTipAngle = (int(a) for a in angles[2])
+    ringBaseAngle, ringMiddleAngle, ringTipAngle = (int(a) for a in angles[3])
+    pinkyBaseAngle, pinkyMiddleAngle, pinkyTipAngle = (int(a) for a in angles[4])
     handRot = np.rad2deg(euler_from_quaternion(hand.palm.orientation))
     if handRot[2] < 0:
         handRot[2] = handRot[2] + 360
@@ -73,96 +73,188 @@ def decode_pose(hand: ldt.Hand):
     )
 
 
-def get_angle(bone1: ldt.Bone, bone2: ldt.Bone):
-    bone_1_direction = np.array(
-        [bone1.next_joint.x, bone1.next_joint.y, bone1.next_joint.z]
-    ) - np.array([bone1.prev_joint.x, bone1.prev_joint.y, bone1.prev_joint.z])
-    bone_2_direction = np.array(
-        [bone2.next_joint.x, bone2.next_joint.y, bone2.next_joint.z]
-    ) - np.array([bone2.prev_joint.x, bone2.prev_joint.y, bone2.prev_joint.z])
-    dotProduct = np.vecdot(bone_1_direction, bone_2_direction)
-    norm = np.linalg.norm(bone_1_direction) * np.linalg.norm(bone_2_direction)
-    CosTheta = np.maximum(np.minimum(dotProduct / norm, 1), -1)
-    angle = np.real(np.arccos(CosTheta))
-    return int(np.degrees(angle))
-
-
-class PoseCalibration(leap.Listener):
-    def __init__(self):
+class PoseCalibration(_ListenerBase):
+    def __init__(self, calibration_hand: str = None):
+        """
+        :param calibration_hand: "left" or "right" to calibrate that hand when both are tracked, None for the first.
+        """
         self.hand_pose = None
+        self.hand_poses = {}
+        self.calibration_hand = calibration_hand
+        self.feature_extractor = HandFeatureExtractor()
         self.client = None
         self.running = False
         self.canvas = Canvas()
         self.framerate = 30
+        self.display_rate = 60
         self.last_frame_time = time.time()
+        self.latest_pose = SnapshotSlot()
+        self._rendered_version = 0
+        # Feature vectors of the dynamic gesture being recorded, None while not recording
+        self.gesture_sequence = None
+        # A pose template is averaged over this many frames, statistics is None while not calibrating
+        self.calibration_frames = 90
+        self.statistics = None
 
     def on_tracking_event(self, event):
         if len(event.hands) != 0:
-            hand = event.hands[0]
-            self.hand_pose = HandPose()
-            self.hand_pose.set_pose_from_hand(hand)
-            self.canvas.render_hands(event)
+            vectors = self.feature_extractor.extract_batch(event.hands)
+            hand_poses = {}
+            for hand, vector in zip(event.hands, vectors):
+                hand_pose = HandPose()
+                hand_pose.set_pose_from_hand(hand, pose_vector=vector)
+                hand_poses[HandIdentity.from_hand(hand)] = hand_pose
+            self.hand_poses = hand_poses
+            hand_pose = self.select_hand_pose(hand_poses)
+            if hand_pose is None:
+                return
+            self.hand_pose = hand_pose
+            if self.gesture_sequence is not None:
+                self.gesture_sequence.append(gesture_features(hand_pose))
+            statistics = self.statistics
+            if statistics is not None and statistics.count < self.calibration_frames:
+                statistics.add(hand_pose.pose_vector)
             timestamp = str(int(1000 * (time.time())))
-            self.canvas.render_timestamp(timestamp)
-            self.canvas.render_hand_canonical_pose(self.hand_pose)
-            self.canvas.render_instructions("x: Exit, s || l: Capture Pose")
+            self.latest_pose.publish((event, hand_pose, timestamp))
 
-    async def mainloop(self):
-        connection = leap.Connection()
+    def render_frame(self):
+        version, snapshot = self.latest_pose.take()
+        if version == self._rendered_version:
+            return
+        self._rendered_version = version
+        event, hand_pose, timestamp = snapshot
+        self.canvas.render_hands(event)
+        self.canvas.render_timestamp(timestamp)
+        self.canvas.render_hand_canonical_pose(hand_pose)
+        if self.statistics is not None:
+            self.canvas.render_instructions(f"Hold the pose: {self.statistics.count}/{self.calibration_frames}", True)
+        else:
+            self.canvas.render_instructions("x: Exit, s || l: Capture Pose, g: Start/Stop Gesture",
+                                            self.gesture_sequence is not None)
+        self.canvas.compose()
+
+    def select_hand_pose(self, hand_poses: dict[HandIdentity, HandPose]) -> HandPose | None:
+        """
+        :return: The pose of the hand that is calibrated, the first hand unless calibration_hand is set.
+        """
+        for hand, hand_pose in hand_poses.items():
+            if self.calibration_hand is None or hand.chirality == self.calibration_hand:
+                return hand_pose
+        return None
+
+    def start_calibration(self):
+        self.statistics = PoseStatistics()
+
+    def calibration_done(self) -> bool:
+        return self.statistics is not None and self.statistics.count >= self.calibration_frames
+
+    def finish_calibration(self) -> HandPose:
+        """
+        :return: The last pose with the mean, precision and sample count of the calibration frames.
+        """
+        pose = HandPose()
+        pose.pinch_distance = self.hand_pose.pinch_distance
+        pose.pinch_strength = self.hand_pose.pinch_strength
+        pose.palm_orientation = self.hand_pose.palm_orientation
+        pose.palm_position = self.hand_pose.palm_position
+        pose.set_statistics(self.statistics)
+        self.statistics = None
+        return pose
+
+    async def mainloop(self, connection=None):
+        device = connection is None
+        if device:
+            import leap
+            connection = leap.Connection()
         connection.add_listener(self)
         with connection.open():
-            connection.set_tracking_mode(leap.TrackingMode.Desktop)
+            if device:
+                connection.set_tracking_mode(leap.TrackingMode.Desktop)
             self.running = True
+            clock = FrameClock(self.display_rate)
             while self.running:
+                self.render_frame()
                 cv2.imshow(self.canvas.name, self.canvas.output_image)
                 key = cv2.waitKey(1)
+                await asyncio.sleep(clock.time_until_next_frame())
+                clock.tick()
                 if key == ord("x"):
                     print("Exiting")
                     self.running = False
-                elif key == ord("s") or key == ord("l"):
-                    print("Save Grasp Position")
-                    pose = self.hand_pose
+                elif (key == ord("s") or key == ord("l")) and self.statistics is None:
+                    print("Calibrating Grasp Position")
+                    self.start_calibration()
+                elif key == ord("g"):
+                    if self.gesture_sequence is None:
+                        print("Recording gesture")
+                        self.gesture_sequence = []
+                    else:
+                        self.save_gesture_sequence()
+                if self.calibration_done():
+                    pose = self.finish_calibration()
                     save_path = filedialog.asksaveasfilename(defaultextension=".json", filetypes=[("JSON files", "*.json")])
                     if save_path:
                         with open(save_path, "w") as f:
                             json.dump(pose.as_dict(), f)
                         print(f"Pose saved to {save_path}")
 
-    async def record_single_pose(self):
-        connection = leap.Connection()
+    def save_gesture_sequence(self):
+        sequence = self.gesture_sequence
+        self.gesture_sequence = None
+        print(f"Recorded gesture with {len(sequence)} frames")
+        save_path = filedialog.asksaveasfilename(defaultextension=".json", filetypes=[("JSON files", "*.json")])
+        if save_path and len(sequence) > 0:
+            template = GestureTemplate(Path(save_path).stem, np.array(sequence))
+            save_gesture_templates(save_path, [template])
+            print(f"Gesture saved to {save_path}")
+
+    async def record_single_pose(self, connection=None):
+        device = connection is None
+        if device:
+            import leap
+            connection = leap.Connection()
         connection.add_listener(self)
         with connection.open():
-            connection.set_tracking_mode(leap.TrackingMode.Desktop)
+            if device:
+                connection.set_tracking_mode(leap.TrackingMode.Desktop)
             self.running = True
+            clock = FrameClock(self.display_rate)
             while self.running:
+                self.render_frame()
                 cv2.imshow(self.canvas.name, self.canvas.output_image)
                 key = cv2.waitKey(1)
+                await asyncio.sleep(clock.time_until_next_frame())
+                clock.tick()
                 if key == ord("x"):
                     print("CANCELLED")
                     self.running = False
-                elif key == ord("s") or key == ord("l"):
-                    pose = self.hand_pose
+                elif (key == ord("s") or key == ord("l")) and self.statistics is None:
+                    self.start_calibration()
+                if self.calibration_done():
                     self.running = False
-                    return pose
+                    return self.finish_calibration()
 
-async def calibrate_pose():
-    fingertracker = PoseCalibration()
-    pose = await fingertracker.record_single_pose()
+async def calibrate_pose(connection=None, hand: str = None):
+    fingertracker = PoseCalibration(hand)
+    pose = await fingertracker.record_single_pose(connection)
     return pose
 
-async def start_window():
-    fingertracker = PoseCalibration()
+async def start_window(connection=None, hand: str = None):
+    fingertracker = PoseCalibration(hand)
     root = Tk()
-    await fingertracker.mainloop()
+    await fingertracker.mainloop(connection)
 
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="Pose Calibration Tool")
     parser.add_argument("--single", action="store_true", help="Record a single pose")
+    parser.add_argument("--replay", type=str, help="Replay a tracking capture instead of using the device")
+    parser.add_argument("--hand", choices=[LEFT, RIGHT], help="Hand to calibrate when both are tracked")
     args = parser.parse_args()
+    connection = ReplayConnection(args.replay, loop=True) if args.replay else None
 
     if args.single:
-        pose = asyncio.run(calibrate_pose())
+        pose = asyncio.run(calibrate_pose(connection, args.hand))
         print(json.dumps(pose.as_dict()))
     else: 
-        asyncio.run(start_window())
+        asyncio.run(start_window(connection, args.hand))
@@ -0,0 +1,203 @@
+"""Change-only pose events for any number of asyncio consumers.
+
+PoseDispatcher sits behind GestureListener and turns the per-frame (pose, similarity) stream into
+events that are only emitted when the label changes or the similarity crosses a confidence level.
+Every subscriber gets its own bounded queue, so a slow logger or network publisher only loses its
+own events and the tracking thread never waits for a consumer.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import threading
+from collections import deque
+
+import numpy as np
+
+from hand_pose import HandIdentity
+
+DROP_NEWEST = "newest"
+DROP_OLDEST = "oldest"
+
+LABEL_CHANGED = "label"
+CONFIDENCE_CHANGED = "confidence"
+
+
+class PoseEvent:
+    def __init__(self, kind: str, pose: str, similarity: float, previous: str, timestamp: int, event=None,
+                 hand: HandIdentity = None):
+        """
+        :param kind: LABEL_CHANGED or CONFIDENCE_CHANGED.
+        :param previous: The label of the same hand before this event.
+        :param timestamp: Timestamp of the tracking frame in microseconds.
+        :param event: The tracking event that triggered this event.
+        :param hand: The hand the label belongs to.
+        """
+        self.kind = kind
+        self.pose = pose
+        self.similarity = similarity
+        self.previous = previous
+        self.timestamp = timestamp
+        self.event = event
+        self.hand = hand
+
+    def __repr__(self):
+        return (f"PoseEvent({self.kind}, {self.pose!r}, {self.similarity:.2f}, previous={self.previous!r}, "
+                f"hand={self.hand})")
+
+
+class _PoseTrack:
+    """
+    Label state of one hand.
+    """
+
+    def __init__(self):
+        self.pose = None
+        self.similarity = 0.0
+        self.level = 0
+        self.pending = None
+        self.pending_since = 0
+
+
+class PoseSubscription:
+    """
+    Bounded queue of one subscriber. Filled from the tracking thread, read with ``await get()``
+    or ``async for`` on the event loop that subscribed.
+    """
+
+    def __init__(self, dispatcher: "PoseDispatcher", loop: asyncio.AbstractEventLoop, max_queue: int,
+                 drop_policy: str):
+        if drop_policy not in (DROP_NEWEST, DROP_OLDEST):
+            raise ValueError(f"Unknown drop policy {drop_policy}")
+        self.dispatcher = dispatcher
+        self.drop_policy = drop_policy
+        self.max_queue = max_queue
+        self.dropped_events = 0
+        self._loop = loop
+        self._lock = threading.Lock()
+        self._queue = deque()
+        self._ready = asyncio.Event()
+        self._closed = False
+
+    def push(self, pose_event: PoseEvent):
+        """
+        Called from the tracking thread, never blocks.
+        """
+        with self._lock:
+            if self._closed:
+                return
+            if len(self._queue) >= self.max_queue:
+                self.dropped_events += 1
+                if self.drop_policy == DROP_NEWEST:
+                    return
+                self._queue.popleft()
+            self._queue.append(pose_event)
+        self._wake()
+
+    def _wake(self):
+        try:
+            self._loop.call_soon_threadsafe(self._ready.set)
+        except RuntimeError:
+            # The event loop is already closed
+            pass
+
+    def __len__(self):
+        return len(self._queue)
+
+    async def get(self) -> PoseEvent | None:
+        """
+        :return: The next event, or None once the subscription is closed and drained.
+        """
+        while True:
+            with self._lock:
+                if self._queue:
+                    return self._queue.popleft()
+                if self._closed:
+                    return None
+                self._ready.clear()
+            await self._ready.wait()
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self) -> PoseEvent:
+        pose_event = await self.get()
+        if pose_event is None:
+            raise StopAsyncIteration
+        return pose_event
+
+    def close(self):
+        with self._lock:
+            self._closed = True
+        self.dispatcher.unsubscribe(self)
+        self._wake()
+
+
+class PoseDispatcher:
+    """
+    :param debounce: Seconds a new label has to persist before it is emitted, 0 emits immediately.
+    :param confidence_levels: Similarity levels, crossing one of them while the label stays the same
+        emits a CONFIDENCE_CHANGED event.
+    """
+
+    def __init__(self, debounce: float = 0.0, confidence_levels: list[float] = ()):
+        self.debounce = debounce
+        self.confidence_levels = np.sort(np.asarray(confidence_levels, dtype=np.float64))
+        self.emitted_events = 0
+        self.tracks: dict[HandIdentity, _PoseTrack] = {}
+        self._subscribers = []
+
+    def subscribe(self, max_queue: int = 64, drop_policy: str = DROP_OLDEST,
+                  loop: asyncio.AbstractEventLoop = None) -> PoseSubscription:
+        """
+        Must be called from the event loop that consumes the events, unless ``loop`` is given.
+        """
+        subscription = PoseSubscription(self, loop if loop is not None else asyncio.get_running_loop(),
+                                        max_queue, drop_policy)
+        # Replace the list instead of appending so the tracking thread can iterate without a lock
+        self._subscribers = self._subscribers + [subscription]
+        return subscription
+
+    def unsubscribe(self, subscription: PoseSubscription):
+        self._subscribers = [s for s in self._subscribers if s is not subscription]
+
+    def on_pose_detected(self, event, pose: str, similarity: float, hand: HandIdentity = None):
+        """
+        Feed the label of one hand, has the signature of GestureListener's poseDetectedCallback.
+        """
+        track = self.tracks.get(hand)
+        if track is None:
+            track = self.tracks[hand] = _PoseTrack()
+        timestamp = event.timestamp
+        level = int(np.searchsorted(self.confidence_levels, similarity, side="right"))
+        if pose == track.pose:
+            track.pending = None
+            track.similarity = similarity
+            if level != track.level:
+                track.level = level
+                self._emit(PoseEvent(CONFIDENCE_CHANGED, pose, similarity, pose, timestamp, event, hand))
+            return
+        if pose != track.pending:
+            track.pending = pose
+            track.pending_since = timestamp
+        if timestamp - track.pending_since < self.debounce * 1e6:
+            return
+        previous = track.pose if track.pose is not None else ""
+        track.pose = pose
+        track.similarity = similarity
+        track.level = level
+        track.pending = None
+        self._emit(PoseEvent(LABEL_CHANGED, pose, similarity, previous, timestamp, event, hand))
+
+    def on_hand_lost(self, event, hand: HandIdentity):
+        """
+        Forget the label of a hand that left the view, emitting a change to "" if it had one.
+        """
+        track = self.tracks.pop(hand, None)
+        if track is not None and track.pose:
+            self._emit(PoseEvent(LABEL_CHANGED, "", 0.0, track.pose, event.timestamp, event, hand))
+
+    def _emit(self, pose_event: PoseEvent):
+        self.emitted_events += 1
+        for subscription in self._subscribers:
+            subscription.push(pose_event)
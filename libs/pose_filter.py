@@ -0,0 +1,131 @@
+"""Temporal filtering between pose extraction and template matching.
+
+OneEuroFilter smooths the pose vector with a cutoff that rises with the speed of the hand,
+so jitter at rest is removed while fast movements pass with little lag. LabelHysteresis
+keeps the reported pose until its similarity clearly drops, so neighbouring poses do not
+flicker. It works on pose names, so any number of templates per pose and the k-NN vote of
+PoseIndex can be used. The filter keeps its state in preallocated arrays, both cost O(1) per frame.
+"""
+
+from __future__ import annotations
+
+import math
+
+import numpy as np
+
+from hand_pose import POSE_VECTOR_SIZE
+
+
+class OneEuroFilter:
+    """
+    :param size: Length of the filtered vectors.
+    :param min_cutoff: Cutoff frequency in Hz while the hand is at rest, lower removes more jitter.
+    :param beta: Increase of the cutoff per unit/s of speed, higher reduces lag on fast movements.
+    :param derivative_cutoff: Cutoff frequency in Hz for the speed estimate.
+    :param max_gap: A gap in seconds after which the filter restarts instead of smoothing across it.
+    """
+
+    def __init__(self, size: int = POSE_VECTOR_SIZE, min_cutoff: float = 1.0, beta: float = 0.5,
+                 derivative_cutoff: float = 1.0, max_gap: float = 0.25):
+        self.min_cutoff = min_cutoff
+        self.beta = beta
+        self.derivative_cutoff = derivative_cutoff
+        self.max_gap = max_gap
+        self.value = np.zeros(size)
+        self._derivative = np.zeros(size)
+        self._scratch = np.zeros(size)
+        self._alpha = np.zeros(size)
+        self._last_time = None
+
+    def reset(self):
+        self._last_time = None
+
+    def copy(self) -> OneEuroFilter:
+        """
+        :return: A filter with the same settings and fresh state, e.g. for another hand.
+        """
+        return OneEuroFilter(len(self.value), self.min_cutoff, self.beta, self.derivative_cutoff, self.max_gap)
+
+    @staticmethod
+    def _alpha_for(cutoff, dt: float):
+        # Smoothing factor of an exponential filter with the given cutoff frequency
+        return 1.0 / (1.0 + 1.0 / (2 * math.pi * cutoff * dt))
+
+    def filter(self, vector: np.ndarray, timestamp: float) -> np.ndarray:
+        """
+        :param timestamp: Time of the sample in seconds.
+        :return: The filtered vector. The array is reused by the next call.
+        """
+        dt = None if self._last_time is None else timestamp - self._last_time
+        self._last_time = timestamp
+        if dt is None or dt <= 0 or dt > self.max_gap:
+            self.value[:] = vector
+            self._derivative[:] = 0
+            return self.value
+
+        # Smoothed speed of every component
+        np.subtract(vector, self.value, out=self._scratch)
+        self._scratch /= dt
+        self._scratch -= self._derivative
+        self._scratch *= self._alpha_for(self.derivative_cutoff, dt)
+        self._derivative += self._scratch
+
+        # Per-component cutoff from the speed, then the same exponential step on the value
+        np.abs(self._derivative, out=self._alpha)
+        self._alpha *= self.beta
+        self._alpha += self.min_cutoff
+        self._alpha *= 2 * math.pi * dt
+        np.reciprocal(self._alpha, out=self._alpha)
+        self._alpha += 1
+        np.reciprocal(self._alpha, out=self._alpha)
+        np.subtract(vector, self.value, out=self._scratch)
+        self._scratch *= self._alpha
+        self.value += self._scratch
+        return self.value
+
+
+class LabelHysteresis:
+    """
+    Turns per-frame pose matches into a stable label.
+
+    A pose becomes the label when it is the best match with a similarity of at least ``enter_threshold``
+    and stays the label until its similarity falls below ``exit_threshold``. Another pose only takes over
+    earlier if it is the best match, passes ``enter_threshold`` and beats the current label by ``switch_margin``.
+    """
+
+    def __init__(self, enter_threshold: float = 0.9, exit_threshold: float = 0.8, switch_margin: float = 0.05):
+        if exit_threshold > enter_threshold:
+            raise ValueError("exit_threshold must not be larger than enter_threshold")
+        self.enter_threshold = enter_threshold
+        self.exit_threshold = exit_threshold
+        self.switch_margin = switch_margin
+        self.current = ""
+
+    def reset(self):
+        self.current = ""
+
+    def copy(self) -> LabelHysteresis:
+        return LabelHysteresis(self.enter_threshold, self.exit_threshold, self.switch_margin)
+
+    def update(self, name_scores: dict[str, float]) -> tuple[str, float]:
+        """
+        :param name_scores: Similarity of the poses that match this frame, best match first, e.g. from
+            ``PoseLibrary.name_scores_batch`` or ``PoseIndex.name_scores_batch``. Poses that are missing
+            do not match.
+        :return: (name, similarity) of the current label, or ("", 0) if there is none.
+        """
+        best, best_score = next(iter(name_scores.items()), ("", 0.0))
+        current = self.current
+        current_score = name_scores.get(current, 0.0) if current else 0.0
+        if current and current_score >= self.exit_threshold:
+            if best != current and best_score >= self.enter_threshold \
+                    and best_score >= current_score + self.switch_margin:
+                current = best
+        elif best and best_score >= self.enter_threshold:
+            current = best
+        else:
+            current = ""
+        self.current = current
+        if not current:
+            return "", 0
+        return current, name_scores[current]
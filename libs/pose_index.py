@@ -0,0 +1,132 @@
+"""Approximate cosine nearest-neighbour search over large pose libraries.
+
+PoseIndex partitions the normalized templates with spherical k-means. The templates of every
+cluster are stored as one contiguous block, so a query scores the cluster centroids and then only
+the blocks of the ``probes`` most similar clusters. The k nearest of those vote for a pose name.
+Calibration samples of one pose lie close together, which is why this works better here than
+hashing: k-means splits a dense group of samples into several clusters, a hash puts it into one
+large bucket.
+"""
+
+import numpy as np
+
+from hand_pose import COSINE, HandPose, PoseLibrary
+
+
+class PoseIndex:
+    """
+    :param library: Compiled templates, usually with several samples per pose name.
+    :param clusters: Number of clusters, defaults to the square root of the library size.
+    :param probes: Clusters scanned per query, more probes raise recall and cost.
+    :param k: Neighbours that vote in ``match``.
+    :param iterations: Maximum k-means iterations while building.
+    """
+
+    def __init__(self, library: PoseLibrary, clusters: int = None, probes: int = 8, k: int = 5,
+                 iterations: int = 15, seed: int = 0):
+        if library.metric != COSINE:
+            raise ValueError("PoseIndex only supports cosine libraries")
+        self.library = library
+        self.k = k
+        size = len(library)
+        if clusters is None:
+            clusters = int(round(np.sqrt(size)))
+        clusters = max(1, min(clusters, size))
+        self.probes = min(probes, clusters)
+        rng = np.random.default_rng(seed)
+        matrix = library.matrix
+        if size == 0:
+            self.centroids = np.zeros((0, matrix.shape[1]))
+            assignment = np.zeros(0, dtype=np.intp)
+        else:
+            self.centroids = matrix[rng.choice(size, clusters, replace=False)]
+            assignment = None
+            for _ in range(iterations):
+                new_assignment = np.argmax(matrix @ self.centroids.T, axis=1)
+                if assignment is not None and np.array_equal(new_assignment, assignment):
+                    break
+                assignment = new_assignment
+                sums = np.stack([np.bincount(assignment, matrix[:, d], clusters) for d in range(matrix.shape[1])],
+                                axis=1)
+                empty = ~sums.any(axis=1)
+                # Reseed empty clusters with random templates
+                sums[empty] = matrix[rng.choice(size, int(empty.sum()))]
+                self.centroids = sums / np.linalg.norm(sums, axis=1, keepdims=True).clip(1e-12)
+            assignment = np.argmax(matrix @ self.centroids.T, axis=1)
+        order = np.argsort(assignment, kind="stable")
+        # Templates of each cluster as one contiguous block, indices map back into the library
+        self._templates = order
+        self._matrix = matrix[order]
+        self._bounds = np.searchsorted(assignment[order], np.arange(len(self.centroids) + 1))
+        self.candidates_scored = 0
+
+    def __len__(self):
+        return len(self.library)
+
+    def _scan(self, vector: np.ndarray, probes: int) -> tuple[np.ndarray, np.ndarray]:
+        """
+        :return: (template indices, similarities) of all templates in the probed clusters.
+        """
+        norm = np.linalg.norm(vector)
+        unit = vector / (norm if norm > 0 else np.inf)
+        centroid_scores = self.centroids @ unit
+        if probes < len(centroid_scores):
+            probed = np.argpartition(-centroid_scores, probes - 1)[:probes]
+        else:
+            probed = np.arange(len(centroid_scores))
+        blocks = [(self._bounds[c], self._bounds[c + 1]) for c in probed]
+        indices = np.concatenate([self._templates[a:b] for a, b in blocks])
+        unit = unit.astype(self._matrix.dtype, copy=False)
+        scores = np.concatenate([self._matrix[a:b] @ unit for a, b in blocks])
+        self.candidates_scored += len(indices)
+        return indices, scores
+
+    def query(self, pose: HandPose | np.ndarray, k: int = None) -> tuple[np.ndarray, np.ndarray]:
+        """
+        Approximate k nearest templates. Falls back to the exact scan if the probed clusters
+        hold fewer than k templates.
+
+        :return: (template indices, similarities), best first.
+        """
+        k = self.k if k is None else k
+        vector = np.asarray(pose.pose_vector if isinstance(pose, HandPose) else pose, dtype=np.float64)
+        if len(self.centroids) == 0:
+            return self.library.knn(vector, k)
+        indices, scores = self._scan(vector, self.probes)
+        if len(indices) < k:
+            self.candidates_scored += len(self.library)
+            return self.library.knn(vector, k)
+        nearest = np.argpartition(-scores, k - 1)[:k]
+        nearest = nearest[np.argsort(-scores[nearest], kind="stable")]
+        return indices[nearest], scores[nearest]
+
+    def score(self, pose: HandPose | np.ndarray) -> np.ndarray:
+        """
+        Similarities in the order of ``library.names`` like PoseLibrary.score, but only the
+        templates in the probed clusters are scored. All other templates get -1.
+        """
+        vector = np.asarray(pose.pose_vector if isinstance(pose, HandPose) else pose, dtype=np.float64)
+        result = np.full(len(self.library), -1.0)
+        if len(self.centroids) > 0:
+            indices, scores = self._scan(vector, self.probes)
+            result[indices] = scores
+        return result
+
+    def score_batch(self, vectors: np.ndarray) -> np.ndarray:
+        return np.stack([self.score(vector) for vector in vectors]) if len(vectors) else np.zeros((0, len(self)))
+
+    def match_batch(self, vectors: np.ndarray) -> list[tuple[str, float]]:
+        return [self.match(vector) for vector in vectors]
+
+    def name_scores_batch(self, vectors: np.ndarray) -> list[dict[str, float]]:
+        """
+        Like PoseLibrary.name_scores_batch, but only over the k nearest templates: the names of the
+        vote in vote order, so the first one is the ``match`` result.
+        """
+        return [self.library.ranked_votes(*self.query(vector)) for vector in vectors]
+
+    def match(self, pose: HandPose | np.ndarray, k: int = None) -> tuple[str, float]:
+        """
+        :return: (name, similarity) from a majority vote of the k nearest templates, or ("", 0).
+        """
+        return self.library.vote(*self.query(pose, k))
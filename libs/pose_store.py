@@ -0,0 +1,205 @@
+"""Binary pose libraries that open memory-mapped.
+
+A pose file starts with a small header and a JSON table of pose names, followed by one 64-byte
+aligned array per field: the pose name code of every template, the raw pose vectors, the
+L2-normalized float32 template matrix with the template norms, and the remaining HandPose fields
+(pinch, palm, sample count and, if any template was calibrated over several frames, precision
+and variance). The arrays are used in place, so a large library opens without parsing and the
+pages are shared by every process that has the file open.
+
+The pose vectors and statistics are kept as float64 next to the float32 matrix so a pose file
+converts back to exactly the JSON it was made from.
+"""
+
+import argparse
+import json
+import struct
+from pathlib import Path
+
+import numpy as np
+
+POSE_FILE_MAGIC = b"AGPL"
+POSE_FILE_VERSION = 1
+POSE_FILE_SUFFIX = ".agposes"
+FILE_HEADER = struct.Struct("<4sHHQ")
+ALIGNMENT = 64
+
+
+def _aligned(offset: int) -> int:
+    return (offset + ALIGNMENT - 1) // ALIGNMENT * ALIGNMENT
+
+
+def is_pose_file(path: str) -> bool:
+    return Path(path).suffix == POSE_FILE_SUFFIX
+
+
+def write_pose_file(path: str, poses: dict):
+    """
+    :param poses: Pose file content as in the JSON format: every name maps to one pose dict
+        (``HandPose.as_dict``) or to a list of them.
+    """
+    names = list(poses.keys())
+    lists = [name for name in names if isinstance(poses[name], list)]
+    codes = []
+    samples = []
+    for code, name in enumerate(names):
+        name_samples = poses[name] if isinstance(poses[name], list) else [poses[name]]
+        codes += [code] * len(name_samples)
+        samples += name_samples
+
+    vectors = np.array([sample["pose_vector"] for sample in samples], dtype=np.float64)
+    vectors = vectors.reshape(len(samples), -1 if len(samples) else 45)
+    norms = np.linalg.norm(vectors, axis=1)
+    arrays = {
+        "codes": np.array(codes, dtype=np.int32),
+        "vectors": vectors,
+        # Zero templates stay zero and therefore never match, like in PoseLibrary
+        "matrix": (vectors / np.where(norms > 0, norms, 1.0)[:, None]).astype(np.float32),
+        "norms": norms,
+        "pinch_distance": np.array([sample["pinch_distance"] for sample in samples], dtype=np.float64),
+        "pinch_strength": np.array([sample["pinch_strength"] for sample in samples], dtype=np.float64),
+        "palm_orientation": np.array([sample["palm_orientation"] for sample in samples],
+                                     dtype=np.float64).reshape(len(samples), 4),
+        "palm_position": np.array([sample["palm_position"] for sample in samples],
+                                  dtype=np.float64).reshape(len(samples), 3),
+        "sample_count": np.array([sample.get("sample_count", 1) for sample in samples], dtype=np.int64),
+        "has_statistics": np.array(["precision" in sample for sample in samples], dtype=bool),
+    }
+    if arrays["has_statistics"].any():
+        size = vectors.shape[1]
+        precision = np.zeros((len(samples), size, size))
+        variance = np.zeros((len(samples), size))
+        for i, sample in enumerate(samples):
+            if "precision" in sample:
+                precision[i] = sample["precision"]
+                variance[i] = sample["variance"]
+        arrays["precision"] = precision
+        arrays["variance"] = variance
+
+    # Offsets are relative to the start of the data section, which follows the aligned metadata
+    layout = {}
+    offset = 0
+    for key, array in arrays.items():
+        layout[key] = {"dtype": array.dtype.str, "shape": list(array.shape), "offset": offset}
+        offset = _aligned(offset + array.nbytes)
+    metadata = json.dumps({"names": names, "lists": lists, "arrays": layout}).encode("utf-8")
+    data_start = _aligned(FILE_HEADER.size + len(metadata))
+    with open(path, "wb") as f:
+        f.write(FILE_HEADER.pack(POSE_FILE_MAGIC, POSE_FILE_VERSION, 0, len(metadata)))
+        f.write(metadata)
+        for key, array in arrays.items():
+            f.seek(data_start + layout[key]["offset"])
+            f.write(np.ascontiguousarray(array).tobytes())
+        f.truncate(data_start + offset)
+
+
+class PoseFile:
+    """
+    Read-only view of a pose file. The arrays are slices of one memory map.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        with open(path, "rb") as f:
+            magic, version, _, metadata_size = FILE_HEADER.unpack(f.read(FILE_HEADER.size))
+            if magic != POSE_FILE_MAGIC or version != POSE_FILE_VERSION:
+                raise ValueError(f"{path} is not a pose file (version {POSE_FILE_VERSION})")
+            metadata = json.loads(f.read(metadata_size))
+        self.names: list[str] = metadata["names"]
+        self.lists = set(metadata["lists"])
+        data_start = _aligned(FILE_HEADER.size + metadata_size)
+        raw = np.memmap(path, dtype=np.uint8, mode="r")
+        self.arrays = {}
+        for key, layout in metadata["arrays"].items():
+            dtype = np.dtype(layout["dtype"])
+            start = data_start + layout["offset"]
+            count = int(np.prod(layout["shape"]))
+            self.arrays[key] = raw[start:start + count * dtype.itemsize].view(dtype).reshape(layout["shape"])
+        self.codes = self.arrays["codes"]
+        self.vectors = self.arrays["vectors"]
+        self.matrix = self.arrays["matrix"]
+        self.norms = self.arrays["norms"]
+
+    def __len__(self):
+        return len(self.codes)
+
+    def template_names(self) -> list[str]:
+        """
+        :return: The pose name of every template.
+        """
+        return [self.names[code] for code in self.codes.tolist()]
+
+    def precisions(self) -> list[np.ndarray | None]:
+        """
+        :return: Precision matrix of every template, None for templates captured from a single frame.
+        """
+        if "precision" not in self.arrays:
+            return [None] * len(self)
+        precision = self.arrays["precision"]
+        return [precision[i] if has else None for i, has in enumerate(self.arrays["has_statistics"])]
+
+    def variances(self) -> list[np.ndarray | None]:
+        if "variance" not in self.arrays:
+            return [None] * len(self)
+        variance = self.arrays["variance"]
+        return [variance[i] if has else None for i, has in enumerate(self.arrays["has_statistics"])]
+
+    def sample(self, i: int) -> dict:
+        """
+        :return: Template i as written by ``HandPose.as_dict``.
+        """
+        arrays = self.arrays
+        data = {
+            "pinch_distance": float(arrays["pinch_distance"][i]),
+            "pinch_strength": float(arrays["pinch_strength"][i]),
+            "palm_orientation": arrays["palm_orientation"][i].tolist(),
+            "palm_position": arrays["palm_position"][i].tolist(),
+            "pose_vector": self.vectors[i].tolist(),
+        }
+        if arrays["has_statistics"][i]:
+            data["sample_count"] = int(arrays["sample_count"][i])
+            data["precision"] = arrays["precision"][i].tolist()
+            data["variance"] = arrays["variance"][i].tolist()
+        elif arrays["sample_count"][i] != 1:
+            data["sample_count"] = int(arrays["sample_count"][i])
+        return data
+
+    def to_json(self) -> dict:
+        """
+        :return: The pose file content in the JSON format, names map to one pose or a list of samples.
+        """
+        poses = {name: [] for name in self.names}
+        for i, code in enumerate(self.codes.tolist()):
+            poses[self.names[code]].append(self.sample(i))
+        return {name: samples if name in self.lists else samples[0] for name, samples in poses.items()}
+
+
+def load_pose_data(path: str) -> dict:
+    """
+    :return: Pose file content in the JSON format, from a JSON or a binary pose file.
+    """
+    if is_pose_file(path):
+        return PoseFile(path).to_json()
+    with open(path, "r") as f:
+        return json.load(f)
+
+
+def save_pose_data(path: str, poses: dict):
+    """
+    Write pose data in the JSON format to a JSON or, for the .agposes suffix, a binary pose file.
+    """
+    if is_pose_file(path):
+        write_pose_file(path, poses)
+        return
+    with open(path, "w") as f:
+        json.dump(poses, f, indent=4)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Convert pose libraries between JSON and the binary format")
+    parser.add_argument("source", type=str, help="Pose file to read (.json or .agposes)")
+    parser.add_argument("target", type=str, help="Pose file to write (.json or .agposes)")
+    args = parser.parse_args()
+    poses = load_pose_data(args.source)
+    save_pose_data(args.target, poses)
+    print(f"Converted {len(poses)} poses to {args.target}")
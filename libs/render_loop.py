@@ -0,0 +1,48 @@
+import threading
+import time
+
+
+class SnapshotSlot:
+    """
+    Latest-value mailbox between the tracking thread and the render loop.
+
+    The tracking thread publishes its newest state and never waits for rendering;
+    the render loop takes whatever is newest when it draws. Older snapshots are overwritten.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._value = None
+        self.version = 0
+
+    def publish(self, value):
+        with self._lock:
+            self._value = value
+            self.version += 1
+
+    def take(self):
+        """
+        :return: (version, value) of the newest snapshot, (0, None) before the first publish.
+        """
+        with self._lock:
+            return self.version, self._value
+
+
+class FrameClock:
+    """
+    Paces a loop at a fixed rate.
+    """
+
+    def __init__(self, rate: float):
+        self.period = 1 / rate
+        self.next_frame = time.perf_counter()
+
+    def time_until_next_frame(self) -> float:
+        return max(0.0, self.next_frame - time.perf_counter())
+
+    def tick(self):
+        now = time.perf_counter()
+        self.next_frame += self.period
+        if self.next_frame < now:
+            # Fell behind, do not try to catch up with a burst of frames
+            self.next_frame = now + self.period
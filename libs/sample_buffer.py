@@ -0,0 +1,112 @@
+import numpy as np
+
+
+class SampleBuffer:
+    """
+    Growable columnar buffer of int64 timestamps and float32 values.
+
+    Storage is preallocated and doubled when full, so appending costs no per-sample Python
+    objects. ``timestamps`` and ``values`` return views of the filled part.
+    """
+
+    def __init__(self, columns: int, capacity: int = 4096, dtype=np.float32):
+        self.columns = columns
+        self.count = 0
+        self._timestamps = np.empty(capacity, dtype=np.int64)
+        self._values = np.empty((capacity, columns), dtype=dtype)
+
+    def __len__(self):
+        return self.count
+
+    @property
+    def capacity(self) -> int:
+        return len(self._timestamps)
+
+    @property
+    def timestamps(self) -> np.ndarray:
+        return self._timestamps[:self.count]
+
+    @property
+    def values(self) -> np.ndarray:
+        return self._values[:self.count]
+
+    @property
+    def bytes_per_sample(self) -> int:
+        return self._timestamps.itemsize + self._values.itemsize * self.columns
+
+    def reserve(self, capacity: int):
+        if capacity <= self.capacity:
+            return
+        new_capacity = max(capacity, 2 * self.capacity)
+        timestamps = np.empty(new_capacity, dtype=self._timestamps.dtype)
+        values = np.empty((new_capacity, self.columns), dtype=self._values.dtype)
+        timestamps[:self.count] = self._timestamps[:self.count]
+        values[:self.count] = self._values[:self.count]
+        self._timestamps = timestamps
+        self._values = values
+
+    def append(self, timestamp: int, values):
+        if self.count == self.capacity:
+            self.reserve(self.count + 1)
+        self._timestamps[self.count] = timestamp
+        self._values[self.count] = values
+        self.count += 1
+
+    def extend(self, timestamps: np.ndarray, values: np.ndarray):
+        n = len(timestamps)
+        self.reserve(self.count + n)
+        self._timestamps[self.count:self.count + n] = timestamps
+        self._values[self.count:self.count + n] = values
+        self.count += n
+
+    def clear(self):
+        self.count = 0
+
+
+class LabelledSampleBuffer(SampleBuffer):
+    """
+    SampleBuffer with an int32 label code per sample. Label strings are interned into
+    ``label_names`` once, appending only stores their code.
+    """
+
+    def __init__(self, columns: int, capacity: int = 4096, dtype=np.float32):
+        super().__init__(columns, capacity, dtype)
+        self._labels = np.empty(capacity, dtype=np.int32)
+        self.label_names = []
+        self._label_codes = {}
+
+    @property
+    def labels(self) -> np.ndarray:
+        return self._labels[:self.count]
+
+    def label_code(self, label: str) -> int:
+        code = self._label_codes.get(label)
+        if code is None:
+            code = self._label_codes[label] = len(self.label_names)
+            self.label_names.append(label)
+        return code
+
+    def reserve(self, capacity: int):
+        if capacity <= self.capacity:
+            return
+        labels = np.empty(max(capacity, 2 * self.capacity), dtype=np.int32)
+        labels[:self.count] = self._labels[:self.count]
+        self._labels = labels
+        super().reserve(capacity)
+
+    def append(self, timestamp: int, label: str, values=()):
+        if self.count == self.capacity:
+            self.reserve(self.count + 1)
+        self._labels[self.count] = self.label_code(label)
+        super().append(timestamp, values)
+
+    def extend(self, timestamps: np.ndarray, labels: list[str], values: np.ndarray = None):
+        n = len(timestamps)
+        self.reserve(self.count + n)
+        self._labels[self.count:self.count + n] = [self.label_code(label) for label in labels]
+        super().extend(timestamps, np.empty((n, self.columns)) if values is None else values)
+
+    def clear(self):
+        super().clear()
+        self.label_names = []
+        self._label_codes = {}
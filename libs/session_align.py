@@ -0,0 +1,212 @@
+"""Align the streams of a recording session onto one fixed-rate timeline for model training.
+
+The watch streams (acc, gyro, ppg) and the label streams (poses, manual_poses, gestures) of a
+session have independent, irregular timestamps. align_session resamples all of them onto a common
+timeline with ``rate`` samples per second over the span covered by every value stream:
+
+- Value streams are linearly interpolated per column. A timeline sample whose bracketing source
+  samples are more than ``max_gap`` seconds apart is NaN instead of a line across the gap.
+- Label streams hold their last label for at most ``max_gap`` seconds, after that the label is ""
+  (code 0 in the output label table).
+
+The timeline is processed in chunks of ``chunk_size`` samples. Every chunk only reads the source
+samples around its time range (found with searchsorted on the memory-mapped timestamps) and is
+written straight into memory-mapped output arrays, so sessions larger than RAM can be aligned.
+
+The output is a session itself: a "sensors" stream with all value columns as one float32
+(samples, columns) array, plus one label stream per input label stream on the same timestamps.
+Its timestamps are in microseconds so rates that do not divide a millisecond stay exact.
+"""
+
+import argparse
+
+import numpy as np
+
+from session_store import TIME_UNIT_SCALE, SessionReader, SessionWriter
+
+SENSORS_STREAM = "sensors"
+OUTPUT_TIME_UNIT = "us"
+
+
+def is_sorted(timestamps: np.ndarray, chunk_size: int = 1 << 20) -> bool:
+    """
+    Check the order chunk by chunk so a memory-mapped stream is never compared as a whole.
+    """
+    for start in range(0, len(timestamps) - 1, chunk_size):
+        chunk = np.asarray(timestamps[start:start + chunk_size + 1])
+        if np.any(chunk[1:] < chunk[:-1]):
+            return False
+    return True
+
+
+class _StreamSource:
+    """
+    Sorted timestamps of one input stream, in the unit and clock of the stream, with access to the matching rows.
+    """
+
+    def __init__(self, reader: SessionReader, name: str):
+        self.name = name
+        timestamps = reader.timestamps(name)
+        self.values = reader.values(name)
+        self.labels = reader.labels(name) if reader.has_labels(name) else None
+        self.order = None
+        if not is_sorted(timestamps):
+            # Out of order notifications: the sorted timestamps and the sort order are copied into memory,
+            # values and labels stay memory-mapped and are gathered through the order one window at a time
+            self.order = np.argsort(timestamps, kind="stable")
+            timestamps = timestamps[self.order]
+        # Stream timestamps to output microseconds: (timestamp + offset) * scale
+        self.scale = TIME_UNIT_SCALE[reader.stream_time_unit(name)]
+        self.offset = reader.clock_offset(name)
+        self.timestamps = timestamps
+
+    def __len__(self):
+        return len(self.timestamps)
+
+    def time(self, index: int) -> int:
+        return (int(self.timestamps[index]) + self.offset) * self.scale
+
+    def times(self, window: slice) -> np.ndarray:
+        return (self.timestamps[window].astype(np.int64) + self.offset) * self.scale
+
+    def window(self, start: int, end: int) -> slice:
+        """
+        :return: Rows covering [start, end] (output units) plus one sample on either side.
+        """
+        low = max(int(np.searchsorted(self.timestamps, start // self.scale - self.offset, side="right")) - 1, 0)
+        high = min(int(np.searchsorted(self.timestamps, -(-end // self.scale) - self.offset, side="left")) + 1,
+                   len(self))
+        return slice(low, high)
+
+    def rows(self, array: np.ndarray, window: slice) -> np.ndarray:
+        if self.order is None:
+            return np.asarray(array[window])
+        return np.asarray(array[self.order[window]])
+
+
+def interpolate_values(times: np.ndarray, timestamps: np.ndarray, values: np.ndarray, max_gap: int,
+                       out: np.ndarray):
+    """
+    Linearly interpolate every column of ``values`` at ``times``.
+
+    :param max_gap: Largest distance between the bracketing samples, larger gaps give NaN.
+    :param out: Array of shape (len(times), columns) receiving the result.
+    """
+    if len(timestamps) == 0:
+        out[:] = np.nan
+        return
+    for column in range(values.shape[1]):
+        out[:, column] = np.interp(times, timestamps, values[:, column])
+    following = np.searchsorted(timestamps, times, side="left")
+    previous = np.searchsorted(timestamps, times, side="right") - 1
+    inside = (previous >= 0) & (following < len(timestamps))
+    gap = np.full(len(times), np.iinfo(np.int64).max)
+    gap[inside] = timestamps[following[inside]] - timestamps[previous[inside]]
+    out[gap > max_gap] = np.nan
+
+
+def output_label_table(label_names: list[str]) -> tuple[list[str], np.ndarray]:
+    """
+    :return: (label table starting with "" for no label, output code of every input code).
+        Recorded "" labels share code 0.
+    """
+    names = [""] + [name for name in label_names if name != ""]
+    codes = np.array([names.index(name) for name in label_names], dtype=np.int32)
+    return names, codes
+
+
+def hold_labels(times: np.ndarray, timestamps: np.ndarray, labels: np.ndarray, max_age: int,
+                out: np.ndarray, codes: np.ndarray):
+    """
+    Last label at or before each time.
+
+    :param max_age: Labels older than this are replaced by 0 (no label).
+    :param codes: Output code of every input label code, from output_label_table.
+    """
+    previous = np.searchsorted(timestamps, times, side="right") - 1
+    valid = previous >= 0
+    valid[valid] = times[valid] - timestamps[previous[valid]] <= max_age
+    out[:] = 0
+    out[valid] = codes[labels[previous[valid]]]
+
+
+def align_session(session_path: str, output_path: str, rate: float = 100.0, value_streams: list[str] = None,
+                  label_streams: list[str] = None, max_gap: float = 0.25, chunk_size: int = 65536) -> int:
+    """
+    :param rate: Samples per second of the output timeline.
+    :param value_streams: Streams that are interpolated, all unlabelled streams with values by default.
+    :param label_streams: Streams whose labels are held, all labelled streams by default.
+    :param max_gap: Seconds across which values are interpolated and labels are held.
+    :param chunk_size: Timeline samples processed at once, bounds the memory use.
+    :return: Number of aligned samples.
+    """
+    reader = SessionReader(session_path)
+    if value_streams is None:
+        value_streams = [name for name in reader.streams
+                         if not reader.has_labels(name) and reader.columns(name)]
+    if label_streams is None:
+        label_streams = [name for name in reader.streams if reader.has_labels(name)]
+    values = [_StreamSource(reader, name) for name in value_streams]
+    labels = [_StreamSource(reader, name) for name in label_streams]
+
+    # Span that every recorded value stream covers, or that any label stream covers if no values were
+    # recorded. Empty value streams, e.g. without a watch, stay NaN.
+    spans = [(source.time(0), source.time(-1)) for source in values if len(source) > 0]
+    if spans:
+        start, end = max(s for s, _ in spans), min(e for _, e in spans)
+    else:
+        spans = [(source.time(0), source.time(-1)) for source in labels if len(source) > 0]
+        start, end = (min(s for s, _ in spans), max(e for _, e in spans)) if spans else (0, -1)
+    step = TIME_UNIT_SCALE["s"] / rate
+    count = int(np.floor((end - start) / step)) + 1 if end >= start else 0
+    max_gap = int(max_gap * TIME_UNIT_SCALE["s"])
+
+    writer = SessionWriter(output_path, time_unit=OUTPUT_TIME_UNIT)
+    writer.manifest["rate"] = rate
+    writer.manifest["source"] = str(session_path)
+    columns = [column for name in value_streams for column in reader.columns(name)]
+    timestamps_out, values_out, _ = writer.create_stream(SENSORS_STREAM, count, columns)
+    label_outputs = []
+    label_codes = []
+    for source in labels:
+        stream = reader.manifest["streams"][source.name]
+        names, codes = output_label_table(reader.label_names(source.name))
+        label_outputs.append(writer.create_stream(source.name, count, [], names, stream.get("label_column", "Pose")))
+        label_codes.append(codes)
+
+    column_offsets = np.cumsum([0] + [len(reader.columns(name)) for name in value_streams])
+    for chunk_start in range(0, count, chunk_size):
+        chunk_end = min(chunk_start + chunk_size, count)
+        times = np.round(start + step * np.arange(chunk_start, chunk_end)).astype(np.int64)
+        timestamps_out[chunk_start:chunk_end] = times
+        for i, source in enumerate(values):
+            window = source.window(int(times[0]), int(times[-1]))
+            interpolate_values(times, source.times(window),
+                               source.rows(source.values, window), max_gap,
+                               values_out[chunk_start:chunk_end, column_offsets[i]:column_offsets[i + 1]])
+        for source, (label_timestamps, _, label_out), codes in zip(labels, label_outputs, label_codes):
+            window = source.window(int(times[0]), int(times[-1]))
+            label_timestamps[chunk_start:chunk_end] = times
+            hold_labels(times, source.times(window), source.rows(source.labels, window), max_gap,
+                        label_out[chunk_start:chunk_end], codes)
+
+    for array in [timestamps_out, values_out] + [a for output in label_outputs for a in output if a is not None]:
+        array.flush()
+    writer.close()
+    return count
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Align the streams of a recording session onto a fixed-rate timeline")
+    parser.add_argument("session", type=str, help="Path to a recording session folder")
+    parser.add_argument("output", type=str, help="Folder of the aligned session")
+    parser.add_argument("--rate", type=float, default=100.0, help="Samples per second")
+    parser.add_argument("--streams", type=str, nargs="+", help="Value streams to interpolate (default: acc, gyro, ppg)")
+    parser.add_argument("--labels", type=str, nargs="+", help="Label streams to hold (default: all labelled streams)")
+    parser.add_argument("--max-gap", type=float, default=0.25,
+                        help="Seconds across which values are interpolated and labels are held")
+    parser.add_argument("--chunk", type=int, default=65536, help="Timeline samples processed at once")
+    args = parser.parse_args()
+    count = align_session(args.session, args.output, args.rate, args.streams, args.labels, args.max_gap, args.chunk)
+    aligned = SessionReader(args.output)
+    print(f"{count} samples at {args.rate:g} Hz, columns {aligned.columns(SENSORS_STREAM)}")
@@ -0,0 +1,427 @@
+"""Append-only stream logs for long recordings.
+
+While recording, every stream of a session is a SpillBuffer: a fixed-size buffer that is handed
+to a background thread as a chunk when it is full or ``flush_interval`` seconds after its last
+chunk, also when nothing is appended anymore. The thread appends the chunk to ``<stream>.log`` in
+the session folder and flushes it to disk, so memory stays bounded however long the recording runs
+and an abnormal exit loses at most the last few seconds. Recording threads never wait for the disk:
+when it falls so far behind that the memory limit is reached, chunks are dropped and counted.
+
+A stream log is a header (magic, version, JSON stream description) followed by records of one
+chunk each: a record header with the sample count, a JSON part with the label names that are new
+in the chunk and the stream info at that time (e.g. the clock offset), then the int64 timestamps,
+the float32 values and, for labelled streams, the int32 label codes. A record cut short by a
+crash is ignored when reading.
+
+finish_session stitches the logs into a regular session (.npy streams and manifest) one chunk at
+a time and removes them. The same call recovers the folder of a recording that never finished::
+
+    python session_log.py recordings/<start timestamp>
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import queue
+import struct
+import threading
+import time
+from pathlib import Path
+from typing import Callable, Iterator
+
+import numpy as np
+
+from sample_buffer import LabelledSampleBuffer, SampleBuffer
+from session_store import MANIFEST_NAME, SessionWriter
+
+STREAM_LOG_MAGIC = b"AGSL"
+STREAM_LOG_VERSION = 1
+STREAM_LOG_SUFFIX = ".log"
+LOG_HEADER = struct.Struct("<4sHHI")
+CHUNK_MAGIC = b"AGCK"
+CHUNK_HEADER = struct.Struct("<4sII")
+
+
+class SpillBuffer(SampleBuffer):
+    """
+    SampleBuffer of at most ``chunk_size`` samples that hands itself to its SessionLog as a chunk when
+    full; the log's writer thread also takes the chunk once it is ``flush_interval`` seconds old.
+    ``timestamps`` and ``values`` only hold the samples since the last chunk.
+
+    Appending never waits for the disk. A chunk that does not fit into the log's memory limit is
+    dropped and counted in ``dropped``. All access goes through ``lock``, since the recording thread
+    appends while the writer thread and ``close`` take chunks; appends after ``close`` are ignored.
+    """
+
+    def __init__(self, log: SessionLog, name: str, columns: int, chunk_size: int, flush_interval: float,
+                 info: Callable[[], dict] = None):
+        super().__init__(columns, chunk_size)
+        self.log = log
+        self.name = name
+        self.flush_interval = flush_interval
+        self.info = info
+        self.spilled = 0
+        self.dropped = 0
+        self.closed = False
+        self.lock = threading.Lock()
+        self._last_spill = time.monotonic()
+
+    @property
+    def total(self) -> int:
+        """
+        Samples recorded so far, written or buffered.
+        """
+        return self.spilled + self.count
+
+    def reserve(self, capacity: int):
+        # Full buffers are spilled instead of grown
+        pass
+
+    def _chunk(self) -> tuple:
+        return self.timestamps.copy(), self.values.copy(), None, []
+
+    def _chunk_written(self):
+        pass
+
+    def _spill(self):
+        # Called with the lock held
+        self._last_spill = time.monotonic()
+        if self.count == 0:
+            return
+        timestamps, values, labels, new_labels = self._chunk()
+        if self.log.write_chunk(self.name, timestamps, values, labels, new_labels, self.info() if self.info else {}):
+            self._chunk_written()
+            self.spilled += self.count
+        else:
+            self.dropped += self.count
+        self.count = 0
+
+    def spill(self):
+        """
+        Hand the buffered samples to the log.
+        """
+        with self.lock:
+            self._spill()
+
+    def spill_due(self, now: float):
+        """
+        Spill if the oldest buffered sample is ``flush_interval`` seconds old, called by the writer thread.
+        """
+        if self.count and now - self._last_spill >= self.flush_interval:
+            self.spill()
+
+    def close(self):
+        """
+        Spill the remaining samples and ignore everything appended afterwards.
+        """
+        with self.lock:
+            try:
+                self._spill()
+            finally:
+                self.closed = True
+
+    def append(self, timestamp: int, values):
+        with self.lock:
+            if self.closed:
+                return
+            if self.count == self.capacity:
+                self._spill()
+            SampleBuffer.append(self, timestamp, values)
+
+    def extend(self, timestamps: np.ndarray, values: np.ndarray):
+        with self.lock:
+            start = 0
+            while start < len(timestamps) and not self.closed:
+                if self.count == self.capacity:
+                    self._spill()
+                n = min(len(timestamps) - start, self.capacity - self.count)
+                SampleBuffer.extend(self, timestamps[start:start + n], values[start:start + n])
+                start += n
+
+    def clear(self):
+        with self.lock:
+            self.count = 0
+
+
+class LabelledSpillBuffer(SpillBuffer, LabelledSampleBuffer):
+    """
+    SpillBuffer with label codes. The label table keeps growing over the whole recording, every
+    chunk carries the names that were added since the last chunk that was written.
+    """
+
+    def __init__(self, log: SessionLog, name: str, columns: int, chunk_size: int, flush_interval: float,
+                 info: Callable[[], dict] = None):
+        super().__init__(log, name, columns, chunk_size, flush_interval, info)
+        self._written_labels = 0
+
+    def _chunk(self) -> tuple:
+        return (self.timestamps.copy(), self.values.copy(), self.labels.copy(),
+                self.label_names[self._written_labels:])
+
+    def _chunk_written(self):
+        self._written_labels = len(self.label_names)
+
+    def append(self, timestamp: int, label: str, values=()):
+        with self.lock:
+            if self.closed:
+                return
+            if self.count == self.capacity:
+                self._spill()
+            LabelledSampleBuffer.append(self, timestamp, label, values)
+
+    def extend(self, timestamps: np.ndarray, labels: list[str], values: np.ndarray = None):
+        with self.lock:
+            start = 0
+            while start < len(timestamps) and not self.closed:
+                if self.count == self.capacity:
+                    self._spill()
+                n = min(len(timestamps) - start, self.capacity - self.count)
+                LabelledSampleBuffer.extend(self, timestamps[start:start + n], labels[start:start + n],
+                                            values[start:start + n] if values is not None else None)
+                start += n
+
+
+class SessionLog:
+    """
+    Writes the stream logs of one recording on a background thread.
+
+    :param chunk_size: Samples per chunk and therefore per stream buffer.
+    :param flush_interval: Seconds after which buffered samples are written even if the buffer is not full.
+    :param max_memory: Bytes for all stream buffers and the chunks waiting to be written. Chunks that
+        would exceed it while the disk falls behind are dropped (see ``dropped_samples``), recording
+        threads never wait.
+    :param fsync: Force every chunk to the disk, not only to the OS.
+    """
+
+    def __init__(self, path: str, chunk_size: int = 4096, flush_interval: float = 5.0,
+                 max_memory: int = 64 * 1024 * 1024, fsync: bool = True):
+        self.path = Path(path)
+        self.path.mkdir(parents=True, exist_ok=True)
+        self.chunk_size = chunk_size
+        self.flush_interval = flush_interval
+        self.max_memory = max_memory
+        self.fsync = fsync
+        self.buffers: dict[str, SpillBuffer] = {}
+        self.written_chunks = 0
+        self._files = {}
+        self._buffered_bytes = 0
+        self._pending_bytes = 0
+        self._error = None
+        self._space = threading.Lock()
+        self._queue = queue.Queue()
+        self._thread = threading.Thread(target=self._write, daemon=True)
+        self._thread.start()
+
+    @property
+    def dropped_samples(self) -> int:
+        return sum(buffer.dropped for buffer in list(self.buffers.values()))
+
+    def stream(self, name: str, columns: list[str], label_column: str = None, time_unit: str = None,
+               info: Callable[[], dict] = None) -> SpillBuffer:
+        """
+        Create the log of a stream.
+
+        :param label_column: Makes it a labelled stream with this CSV column name for the labels.
+        :param time_unit: Unit of the timestamps if it differs from the session's.
+        :param info: Called for every chunk, the returned stream info (e.g. ``clock_offset``) is stored with it.
+        :return: The buffer to record the stream into.
+        """
+        if label_column is None:
+            buffer = SpillBuffer(self, name, len(columns), self.chunk_size, self.flush_interval, info)
+        else:
+            buffer = LabelledSpillBuffer(self, name, len(columns), self.chunk_size, self.flush_interval, info)
+        description = json.dumps({"columns": columns, "label_column": label_column,
+                                  "time_unit": time_unit}).encode("utf-8")
+        file = open(self.path / f"{name}{STREAM_LOG_SUFFIX}", "wb")
+        file.write(LOG_HEADER.pack(STREAM_LOG_MAGIC, STREAM_LOG_VERSION, 0, len(description)))
+        file.write(description)
+        file.flush()
+        self._files[name] = file
+        self.buffers[name] = buffer
+        self._buffered_bytes += self.chunk_size * (buffer.bytes_per_sample + (label_column is not None) * 4)
+        return buffer
+
+    def write_chunk(self, name: str, timestamps: np.ndarray, values: np.ndarray, labels: np.ndarray | None,
+                    new_labels: list[str], info: dict) -> bool:
+        """
+        Queue a chunk for writing without waiting.
+
+        :return: False if the chunk was dropped because the log is at its memory limit.
+        :raise Exception: The error that stopped the writer thread, once writing failed.
+        """
+        if self._error is not None:
+            raise self._error
+        size = timestamps.nbytes + values.nbytes + (labels.nbytes if labels is not None else 0)
+        with self._space:
+            # A single chunk is always taken, so a tight limit only drops data while the disk is behind
+            if self._pending_bytes and self._buffered_bytes + self._pending_bytes + size > self.max_memory:
+                return False
+            self._pending_bytes += size
+        self._queue.put((name, timestamps, values, labels, new_labels, info, size))
+        return True
+
+    def _write(self):
+        while True:
+            try:
+                item = self._queue.get(timeout=self.flush_interval / 4)
+            except queue.Empty:
+                item = ()
+            if item is None:
+                break
+            # Any error stops writing; the queue is still drained and the error raised to the recording
+            # threads and from close
+            try:
+                if item:
+                    name, timestamps, values, labels, new_labels, info, size = item
+                    try:
+                        if self._error is None:
+                            self._write_record(self._files[name], timestamps, values, labels, new_labels, info)
+                            self.written_chunks += 1
+                    finally:
+                        with self._space:
+                            self._pending_bytes -= size
+                # Streams that went quiet are written out as well, so a crash loses at most flush_interval seconds
+                if self._error is None:
+                    now = time.monotonic()
+                    for buffer in list(self.buffers.values()):
+                        buffer.spill_due(now)
+            except Exception as error:
+                if self._error is None:
+                    self._error = error
+
+    def _write_record(self, file, timestamps: np.ndarray, values: np.ndarray, labels: np.ndarray | None,
+                      new_labels: list[str], info: dict):
+        metadata = json.dumps({"labels": new_labels, "info": info}).encode("utf-8")
+        file.write(CHUNK_HEADER.pack(CHUNK_MAGIC, len(timestamps), len(metadata)))
+        file.write(metadata)
+        file.write(np.ascontiguousarray(timestamps, dtype=np.int64).tobytes())
+        file.write(np.ascontiguousarray(values, dtype=np.float32).tobytes())
+        if labels is not None:
+            file.write(np.ascontiguousarray(labels, dtype=np.int32).tobytes())
+        file.flush()
+        if self.fsync:
+            os.fsync(file.fileno())
+
+    def close(self):
+        """
+        Write the buffered samples of every stream and wait until everything is on disk.
+
+        :raise Exception: The first error of writing, also one from the writer thread.
+        """
+        for buffer in list(self.buffers.values()):
+            try:
+                buffer.close()
+            except Exception as error:
+                if self._error is None:
+                    self._error = error
+        self._queue.put(None)
+        self._thread.join()
+        for file in self._files.values():
+            file.close()
+        if self._error is not None:
+            raise self._error
+
+
+class StreamLog:
+    """
+    Reads a stream log chunk by chunk. Only the record headers are read when it is opened.
+    """
+
+    def __init__(self, path: str):
+        self.path = Path(path)
+        self.name = self.path.name[:-len(STREAM_LOG_SUFFIX)]
+        self.label_names = []
+        self.info = {}
+        # (data offset, sample count) of every complete chunk
+        self.chunks = []
+        size = self.path.stat().st_size
+        with open(self.path, "rb") as f:
+            magic, version, _, description_size = LOG_HEADER.unpack(f.read(LOG_HEADER.size))
+            if magic != STREAM_LOG_MAGIC or version != STREAM_LOG_VERSION:
+                raise ValueError(f"{path} is not a stream log (version {STREAM_LOG_VERSION})")
+            description = json.loads(f.read(description_size))
+            self.columns: list[str] = description["columns"]
+            self.label_column: str | None = description["label_column"]
+            self.time_unit: str | None = description["time_unit"]
+            sample_size = 8 + 4 * len(self.columns) + (4 if self.labelled else 0)
+            while True:
+                header = f.read(CHUNK_HEADER.size)
+                if len(header) < CHUNK_HEADER.size:
+                    break
+                magic, count, metadata_size = CHUNK_HEADER.unpack(header)
+                data_offset = f.tell() + metadata_size
+                if magic != CHUNK_MAGIC or data_offset + count * sample_size > size:
+                    break
+                metadata = json.loads(f.read(metadata_size))
+                self.label_names += metadata["labels"]
+                self.info.update(metadata["info"])
+                self.chunks.append((data_offset, count))
+                f.seek(data_offset + count * sample_size)
+
+    @property
+    def labelled(self) -> bool:
+        return self.label_column is not None
+
+    def __len__(self):
+        return sum(count for _, count in self.chunks)
+
+    def read_chunks(self) -> Iterator[tuple[np.ndarray, np.ndarray, np.ndarray | None]]:
+        """
+        :return: (timestamps, values, labels or None) of every chunk in recording order.
+        """
+        with open(self.path, "rb") as f:
+            for offset, count in self.chunks:
+                f.seek(offset)
+                timestamps = np.fromfile(f, dtype=np.int64, count=count)
+                values = np.fromfile(f, dtype=np.float32, count=count * len(self.columns))
+                labels = np.fromfile(f, dtype=np.int32, count=count) if self.labelled else None
+                yield timestamps, values.reshape(count, len(self.columns)), labels
+
+
+def finish_session(path: str, remove_logs: bool = True) -> dict[str, int]:
+    """
+    Stitch the stream logs of a session folder into .npy streams and write the manifest.
+    Streams already in the manifest are kept.
+
+    :return: Number of samples of every stitched stream.
+    """
+    path = Path(path)
+    writer = SessionWriter(path)
+    if (path / MANIFEST_NAME).exists():
+        with open(path / MANIFEST_NAME, "r") as f:
+            writer.manifest = json.load(f)
+    logs = [StreamLog(log_path) for log_path in sorted(path.glob(f"*{STREAM_LOG_SUFFIX}"))]
+    counts = {}
+    for log in logs:
+        count = len(log)
+        timestamps, values, labels = writer.create_stream(
+            log.name, count, log.columns, log.label_names if log.labelled else None, log.label_column or "Pose",
+            log.time_unit, log.info.get("clock_offset", 0))
+        position = 0
+        for chunk_timestamps, chunk_values, chunk_labels in log.read_chunks():
+            end = position + len(chunk_timestamps)
+            timestamps[position:end] = chunk_timestamps
+            values[position:end] = chunk_values
+            if labels is not None:
+                labels[position:end] = chunk_labels
+            position = end
+        for array in (timestamps, values, labels):
+            if array is not None:
+                array.flush()
+        counts[log.name] = count
+    writer.close()
+    if remove_logs:
+        for log in logs:
+            log.path.unlink()
+    return counts
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Finish or recover a recording session from its stream logs")
+    parser.add_argument("session", type=str, help="Path to a recording session folder")
+    parser.add_argument("--keep-logs", action="store_true", help="Keep the stream logs after stitching")
+    args = parser.parse_args()
+    for stream_name, samples in finish_session(args.session, not args.keep_logs).items():
+        print(f"{stream_name}: {samples} samples")
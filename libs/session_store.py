@@ -0,0 +1,193 @@
+"""Columnar storage for recording sessions.
+
+A session folder holds one set of .npy files per stream plus a manifest.json:
+``<stream>.timestamps.npy`` (int64), ``<stream>.values.npy`` (float32, one column per value)
+and, for labelled streams, ``<stream>.labels.npy`` (int32 codes into the label table in the
+manifest). The arrays are opened memory-mapped, so loading a session does not copy or parse
+anything. CSV export is kept as a converter for tools that still expect the old files.
+
+Streams recorded on another clock than the session's (e.g. tracking frames in device microseconds
+next to watch samples in epoch milliseconds) store their own ``time_unit`` and a ``clock_offset``
+in the manifest; ``session_timestamps`` converts them to the session clock.
+"""
+
+import argparse
+import csv
+import json
+from pathlib import Path
+
+import numpy as np
+
+SESSION_FORMAT = "autogesture-session"
+SESSION_VERSION = 1
+MANIFEST_NAME = "manifest.json"
+TIME_UNIT_SCALE = {"s": 1_000_000, "ms": 1_000, "us": 1}
+
+
+def encode_labels(labels: list[str]) -> tuple[np.ndarray, list[str]]:
+    """
+    :return: (int32 codes, label table) for a list of label strings.
+    """
+    if len(labels) == 0:
+        return np.zeros(0, dtype=np.int32), []
+    label_names, codes = np.unique(np.asarray(labels, dtype=str), return_inverse=True)
+    return codes.astype(np.int32), label_names.tolist()
+
+
+class SessionWriter:
+    def __init__(self, path: str, time_unit: str = "ms"):
+        self.path = Path(path)
+        self.path.mkdir(parents=True, exist_ok=True)
+        self.manifest = {"format": SESSION_FORMAT, "version": SESSION_VERSION, "time_unit": time_unit, "streams": {}}
+
+    def write_stream(self, name: str, timestamps, values, columns: list[str],
+                     labels=None, label_names: list[str] = None, label_column: str = "Pose",
+                     time_unit: str = None, clock_offset: int = 0):
+        """
+        :param timestamps: Integer timestamps, one per sample.
+        :param values: Values of shape (N, len(columns)).
+        :param labels: Optional int codes into label_names, one per sample.
+        :param time_unit: Unit of the timestamps if it differs from the session's.
+        :param clock_offset: Added to the timestamps (in their unit) to get the session clock.
+        """
+        timestamps = np.asarray(timestamps, dtype=np.int64)
+        values = np.asarray(values, dtype=np.float32).reshape(len(timestamps), len(columns))
+        np.save(self.path / f"{name}.timestamps.npy", timestamps)
+        np.save(self.path / f"{name}.values.npy", values)
+        stream = self._stream_entry(len(timestamps), columns, time_unit, clock_offset)
+        if labels is not None:
+            np.save(self.path / f"{name}.labels.npy", np.asarray(labels, dtype=np.int32))
+            stream["label_column"] = label_column
+            stream["labels"] = list(label_names)
+        self.manifest["streams"][name] = stream
+
+    def _stream_entry(self, count: int, columns: list[str], time_unit: str = None, clock_offset: int = 0) -> dict:
+        stream = {"count": count, "columns": columns}
+        if (time_unit is not None and time_unit != self.manifest["time_unit"]) or clock_offset != 0:
+            stream["time_unit"] = time_unit or self.manifest["time_unit"]
+            stream["clock_offset"] = int(clock_offset)
+        return stream
+
+    def create_stream(self, name: str, count: int, columns: list[str], label_names: list[str] = None,
+                      label_column: str = "Pose", time_unit: str = None,
+                      clock_offset: int = 0) -> tuple[np.ndarray, np.ndarray, np.ndarray | None]:
+        """
+        Preallocate a stream as writable memory maps, for streams that are filled in chunks.
+
+        :param label_names: Label table, the stream gets a labels array if it is given.
+        :return: (timestamps, values, labels or None) of length count.
+        """
+        open_memmap = np.lib.format.open_memmap
+        timestamps = open_memmap(self.path / f"{name}.timestamps.npy", mode="w+", dtype=np.int64, shape=(count,))
+        values = open_memmap(self.path / f"{name}.values.npy", mode="w+", dtype=np.float32,
+                             shape=(count, len(columns)))
+        stream = self._stream_entry(count, columns, time_unit, clock_offset)
+        labels = None
+        if label_names is not None:
+            labels = open_memmap(self.path / f"{name}.labels.npy", mode="w+", dtype=np.int32, shape=(count,))
+            stream["label_column"] = label_column
+            stream["labels"] = list(label_names)
+        self.manifest["streams"][name] = stream
+        return timestamps, values, labels
+
+    def close(self):
+        with open(self.path / MANIFEST_NAME, "w") as f:
+            json.dump(self.manifest, f, indent=4)
+
+
+class SessionReader:
+    def __init__(self, path: str, mmap: bool = True):
+        self.path = Path(path)
+        self.mmap_mode = "r" if mmap else None
+        with open(self.path / MANIFEST_NAME, "r") as f:
+            self.manifest = json.load(f)
+        if self.manifest.get("format") != SESSION_FORMAT:
+            raise ValueError(f"{path} is not a recording session")
+        self.time_unit = self.manifest["time_unit"]
+
+    @property
+    def streams(self) -> list[str]:
+        return list(self.manifest["streams"].keys())
+
+    def _load(self, name: str, part: str) -> np.ndarray:
+        return np.load(self.path / f"{name}.{part}.npy", mmap_mode=self.mmap_mode)
+
+    def timestamps(self, name: str) -> np.ndarray:
+        return self._load(name, "timestamps")
+
+    def values(self, name: str) -> np.ndarray:
+        return self._load(name, "values")
+
+    def labels(self, name: str) -> np.ndarray:
+        return self._load(name, "labels")
+
+    def columns(self, name: str) -> list[str]:
+        return self.manifest["streams"][name]["columns"]
+
+    def label_names(self, name: str) -> list[str]:
+        return self.manifest["streams"][name].get("labels", [])
+
+    def has_labels(self, name: str) -> bool:
+        return "labels" in self.manifest["streams"][name]
+
+    def stream_time_unit(self, name: str) -> str:
+        return self.manifest["streams"][name].get("time_unit", self.time_unit)
+
+    def clock_offset(self, name: str) -> int:
+        """
+        :return: Offset in the stream's time unit from its timestamps to the session clock.
+        """
+        return self.manifest["streams"][name].get("clock_offset", 0)
+
+    def session_timestamps(self, name: str) -> np.ndarray:
+        """
+        Timestamps of a stream on the session clock and in the session's time unit.
+        Returns the memory-mapped array itself for streams that are already on it.
+        """
+        timestamps = self.timestamps(name)
+        unit = self.stream_time_unit(name)
+        offset = self.clock_offset(name)
+        if unit == self.time_unit and offset == 0:
+            return timestamps
+        return (timestamps + offset) * TIME_UNIT_SCALE[unit] // TIME_UNIT_SCALE[self.time_unit]
+
+
+def export_csv(session_path: str, output_path: str = None):
+    """
+    Write every stream of a session as <stream>.csv (Timestamp, label, values) like the old recorder did.
+    """
+    reader = SessionReader(session_path)
+    output = Path(output_path) if output_path else reader.path
+    output.mkdir(parents=True, exist_ok=True)
+    for name in reader.streams:
+        stream = reader.manifest["streams"][name]
+        timestamps = reader.session_timestamps(name)
+        values = reader.values(name)
+        header = ["Timestamp"]
+        labels = None
+        if reader.has_labels(name):
+            header.append(stream["label_column"])
+            labels = np.asarray(reader.label_names(name), dtype=object)[reader.labels(name)]
+        header += reader.columns(name)
+        with open(output / f"{name}.csv", "w", newline="") as file:
+            writer = csv.writer(file)
+            writer.writerow(header)
+            for i in range(len(timestamps)):
+                row = [int(timestamps[i])]
+                if labels is not None:
+                    row.append(labels[i])
+                row += [f"{value:.7g}" for value in values[i]]
+                writer.writerow(row)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Recording Session Tool")
+    parser.add_argument("session", type=str, help="Path to a recording session folder")
+    parser.add_argument("--csv", type=str, nargs="?", const="", help="Export the session as CSV files (optionally to another folder)")
+    args = parser.parse_args()
+
+    session = SessionReader(args.session)
+    for stream_name in session.streams:
+        print(f"{stream_name}: {len(session.timestamps(stream_name))} samples, columns {session.columns(stream_name)}")
+    if args.csv is not None:
+        export_csv(args.session, args.csv or None)
@@ -0,0 +1,157 @@
+"""Low-overhead latency histograms for the stages of the tracking pipeline.
+
+Every stage has a LatencyHistogram with log-linear buckets: exact below 16 ns, then eight buckets
+per power of two (at most 12.5% wide) up to hours. Recording a duration is a bucket index
+computation and an increment, without a lock: every stage is recorded from one thread (the tracking
+thread or the render loop), readers only ever see a slightly stale count.
+
+StageTimers holds the histograms of all stages and can be switched on and off at runtime. While
+it is off, ``start`` returns 0 and ``stop`` does nothing, so the instrumented code only pays for one
+attribute check per stage. With a device clock, the age of a tracking event (device now minus event
+timestamp) can be recorded as a stage as well.
+"""
+
+from __future__ import annotations
+
+import time
+from typing import Callable
+
+import numpy as np
+
+SUB_BUCKETS = 8
+# Enough buckets for durations up to 2^42 ns (about 73 minutes), longer ones go into the last bucket
+BUCKET_COUNT = (42 - 2) * SUB_BUCKETS
+
+
+def bucket_index(nanoseconds: int) -> int:
+    if nanoseconds < 2 * SUB_BUCKETS:
+        return max(nanoseconds, 0)
+    # Keep the leading four bits: the power of two and the sub-bucket within it
+    shift = nanoseconds.bit_length() - 4
+    return min((shift + 1) * SUB_BUCKETS + ((nanoseconds >> shift) & (SUB_BUCKETS - 1)), BUCKET_COUNT - 1)
+
+
+def bucket_bounds() -> tuple[np.ndarray, np.ndarray]:
+    """
+    :return: (lower, upper) bound in ns of every bucket, upper is exclusive.
+    """
+    index = np.arange(BUCKET_COUNT)
+    shift = np.maximum(index // SUB_BUCKETS - 1, 0)
+    lower = np.where(index < 2 * SUB_BUCKETS, index, (SUB_BUCKETS + index % SUB_BUCKETS) << shift)
+    upper = np.where(index < 2 * SUB_BUCKETS, index + 1, lower + (1 << shift))
+    return lower.astype(np.float64), upper.astype(np.float64)
+
+
+_LOWER, _UPPER = bucket_bounds()
+
+
+class LatencyHistogram:
+    """
+    Histogram of durations in nanoseconds, written by a single thread.
+    """
+
+    def __init__(self):
+        # A list: incrementing a Python int is cheaper than incrementing a NumPy element
+        self.counts = [0] * BUCKET_COUNT
+        self.total = 0
+        self.max = 0
+
+    def record(self, nanoseconds: int):
+        self.counts[bucket_index(nanoseconds)] += 1
+        self.total += nanoseconds
+        if nanoseconds > self.max:
+            self.max = nanoseconds
+
+    def __len__(self):
+        return sum(self.counts)
+
+    def percentile(self, q: float) -> float:
+        """
+        :param q: Percentile between 0 and 100.
+        :return: Duration in microseconds, the middle of the bucket the percentile falls into.
+        """
+        cumulative = np.cumsum(self.counts)
+        if cumulative[-1] == 0:
+            return float("nan")
+        index = int(np.searchsorted(cumulative, q / 100 * cumulative[-1]))
+        return (_LOWER[index] + _UPPER[index]) / 2 / 1e3
+
+    def summary(self) -> dict:
+        count = len(self)
+        return {"count": count, "p50_us": self.percentile(50), "p95_us": self.percentile(95),
+                "p99_us": self.percentile(99), "max_us": self.max / 1e3,
+                "mean_us": self.total / count / 1e3 if count else float("nan")}
+
+    def clear(self):
+        self.counts = [0] * BUCKET_COUNT
+        self.total = 0
+        self.max = 0
+
+
+class StageTimers:
+    """
+    Named latency histograms that are only written while ``enabled``::
+
+        start = timers.start()
+        ...
+        timers.stop("match", start)
+
+    :param clock: Device clock in microseconds (``leap.get_now``), needed for ``record_age``.
+    """
+
+    def __init__(self, enabled: bool = False, clock: Callable[[], int] = None):
+        self.enabled = enabled
+        self.clock = clock
+        self.stages: dict[str, LatencyHistogram] = {}
+
+    def histogram(self, stage: str) -> LatencyHistogram:
+        histogram = self.stages.get(stage)
+        if histogram is None:
+            histogram = self.stages[stage] = LatencyHistogram()
+        return histogram
+
+    def start(self) -> int:
+        """
+        :return: Start time in ns, 0 while disabled.
+        """
+        return time.perf_counter_ns() if self.enabled else 0
+
+    def stop(self, stage: str, start: int):
+        if start:
+            self.histogram(stage).record(time.perf_counter_ns() - start)
+
+    def record_age(self, stage: str, timestamp: int):
+        """
+        Record how old a tracking event with this device timestamp (in microseconds) is now.
+        """
+        if self.enabled and self.clock is not None:
+            self.histogram(stage).record(max(self.clock() - int(timestamp), 0) * 1000)
+
+    def toggle(self) -> bool:
+        """
+        Switch recording on or off. Switching on starts with empty histograms.
+
+        :return: Whether the timers are enabled now.
+        """
+        if not self.enabled:
+            self.clear()
+        self.enabled = not self.enabled
+        return self.enabled
+
+    def clear(self):
+        for histogram in self.stages.values():
+            histogram.clear()
+
+    def summary(self) -> dict[str, dict]:
+        """
+        :return: Stage name -> count, p50/p95/p99, max and mean in microseconds.
+        """
+        return {stage: histogram.summary() for stage, histogram in list(self.stages.items())}
+
+    def report(self) -> str:
+        lines = []
+        for stage, summary in self.summary().items():
+            if summary["count"]:
+                lines.append(f"{stage}: p50 {summary['p50_us']:.0f} us, p95 {summary['p95_us']:.0f} us, "
+                             f"p99 {summary['p99_us']:.0f} us, max {summary['max_us']:.0f} us ({summary['count']})")
+        return "\n".join(lines)
@@ -0,0 +1,104 @@
+"""Parametric synthetic hands for benchmarks and offline runs.
+
+The generated hands are ReplayHand objects, so they expose the same attributes as
+ldt.Hand and can be fed to the whole pipeline without a device.
+"""
+
+import math
+
+import numpy as np
+
+from tracking_capture import HAND_DTYPE, ReplayHand, ReplayTrackingEvent
+
+# Metacarpal, proximal, intermediate, distal length in mm per digit (thumb metacarpal is zero length)
+BONE_LENGTHS = np.array([
+    [0, 45, 32, 25],
+    [65, 40, 25, 18],
+    [63, 45, 28, 19],
+    [58, 42, 27, 19],
+    [53, 33, 19, 17],
+])
+# Knuckle offsets across the palm and the splay angle of each digit in radians
+KNUCKLE_OFFSETS = np.array([-30, -20, 0, 18, 34])
+SPLAY = np.array([-0.8, -0.12, 0, 0.1, 0.22])
+
+
+def make_hand(position=(0, 200, 0), yaw: float = 0.0, curl=0.0, spread: float = 1.0, left: bool = False,
+              hand_id: int = 1, noise: float = 0.0, rng: np.random.Generator = None) -> ReplayHand:
+    """
+    :param position: Wrist position in mm.
+    :param yaw: Rotation of the hand around the vertical axis in radians.
+    :param curl: 0 (flat) to 1 (fist), either one value or one per digit.
+    :param spread: Scales the splay between the digits.
+    :param noise: Standard deviation in mm of the Gaussian jitter added to every joint.
+    """
+    curl = np.broadcast_to(np.asarray(curl, dtype=np.float64), (5,))
+    side = -1 if left else 1
+    # Local frame: x across the palm, y up (palm normal points down), z towards the fingertips (Leap -z)
+    joints = np.zeros((5, 4, 2, 3))
+    for digit in range(5):
+        start = np.array([side * KNUCKLE_OFFSETS[digit] * (0.6 if digit == 0 else 0.3), 0.0, 0.0])
+        heading = side * SPLAY[digit] * spread
+        pitch = 0.0
+        for bone in range(4):
+            if bone > 0:
+                pitch += curl[digit] * (0.5 if digit == 0 else 1.4) if bone == 1 else curl[digit] * 1.1
+            if digit > 0 and bone == 1:
+                start = start + np.array([side * KNUCKLE_OFFSETS[digit] * 0.7, 0, 0])
+            direction = np.array([math.sin(heading) * math.cos(pitch), -math.sin(pitch),
+                                  math.cos(heading) * math.cos(pitch)])
+            end = start + BONE_LENGTHS[digit, bone] * direction
+            joints[digit, bone, 0] = start
+            joints[digit, bone, 1] = end
+            start = end
+
+    cos_yaw, sin_yaw = math.cos(yaw), math.sin(yaw)
+    # Local z (fingers) maps to Leap -z, then the whole hand is rotated by yaw around y
+    rotation = np.array([[cos_yaw, 0, -sin_yaw], [0, 1, 0], [-sin_yaw, 0, -cos_yaw]])
+    wrist = np.asarray(position, dtype=np.float64)
+    world = joints @ rotation.T + wrist
+    if noise > 0:
+        rng = rng if rng is not None else np.random.default_rng()
+        world = world + rng.normal(0, noise, world.shape)
+        # Keep the bones of a digit connected
+        world[:, 1:, 0] = world[:, :-1, 1]
+
+    record = np.zeros((), dtype=HAND_DTYPE)
+    record["id"] = hand_id
+    record["type"] = 0 if left else 1
+    record["confidence"] = 1.0
+    index_tip = world[1, 3, 1]
+    thumb_tip = world[0, 3, 1]
+    record["pinch_distance"] = np.linalg.norm(index_tip - thumb_tip)
+    record["pinch_strength"] = float(np.clip(1 - record["pinch_distance"] / 100, 0, 1))
+    record["grab_strength"] = float(curl[1:].mean())
+    record["palm_position"] = wrist + rotation @ np.array([0, 0, 45])
+    record["palm_direction"] = rotation @ np.array([0, 0, 1])
+    record["palm_normal"] = np.array([0, -1, 0])
+    # Quaternion (x, y, z, w) for the yaw rotation around y
+    record["palm_orientation"] = (0, math.sin(-yaw / 2), 0, math.cos(-yaw / 2))
+    record["palm_width"] = 80
+    record["arm"] = (wrist + rotation @ np.array([0, 0, -250]), wrist)
+    record["joints"] = world
+    return ReplayHand(record)
+
+
+def make_event(hands: list[ReplayHand], timestamp: int = 0, frame_id: int = 0) -> ReplayTrackingEvent:
+    return ReplayTrackingEvent(timestamp, frame_id, hands)
+
+
+def make_session(frames: int, hand_count: int = 1, rate: float = 120, noise: float = 1.0,
+                 seed: int = 0) -> list[ReplayTrackingEvent]:
+    """
+    A sequence of events in which every hand slowly opens and closes.
+    """
+    rng = np.random.default_rng(seed)
+    events = []
+    for frame in range(frames):
+        phase = frame / rate
+        hands = [make_hand(position=(-120 + 240 * i, 220, 0), yaw=0.2 * math.sin(phase + i),
+                           curl=0.5 + 0.5 * math.sin(2 * phase + i), left=(i % 2 == 0), hand_id=i + 1,
+                           noise=noise, rng=rng)
+                 for i in range(hand_count)]
+        events.append(make_event(hands, int(frame * 1e6 / rate), frame))
+    return events
@@ -0,0 +1,154 @@
+"""Real-time recognition of dynamic gestures with incremental subsequence DTW.
+
+Every template keeps one column of the subsequence-DTW cost matrix (SPRING). When a frame
+arrives the columns are advanced by one step, so the cost per frame is
+O(templates x template length) and the history is never scanned again.
+"""
+
+from __future__ import annotations
+
+import json
+
+import numpy as np
+
+from hand_pose import HandPose
+
+
+def gesture_features(hand_pose: HandPose) -> np.ndarray:
+    """
+    Per-frame feature vector for dynamic gestures: the normalized finger pose plus the palm orientation,
+    so that both finger motion (taps) and wrist motion (flicks) are visible.
+    """
+    pose_vector = np.asarray(hand_pose.pose_vector, dtype=np.float64)
+    norm = np.linalg.norm(pose_vector)
+    if norm > 0:
+        pose_vector = pose_vector / norm
+    return np.concatenate([pose_vector, hand_pose.palm_orientation])
+
+
+class GestureTemplate:
+    def __init__(self, name: str, sequence: np.ndarray, threshold: float = 0.25):
+        """
+        :param sequence: Recorded feature vectors of shape (length, features).
+        :param threshold: Maximum DTW cost per template frame for a match.
+        """
+        self.name = name
+        self.sequence = np.asarray(sequence, dtype=np.float64)
+        self.threshold = threshold
+
+    def as_dict(self):
+        return {"name": self.name, "threshold": self.threshold, "sequence": self.sequence.tolist()}
+
+
+class GestureMatch:
+    def __init__(self, name: str, cost: float, start_frame: int, end_frame: int):
+        self.name = name
+        self.cost = cost
+        self.start_frame = start_frame
+        self.end_frame = end_frame
+
+
+class DTWGestureEngine:
+    """
+    :param templates: Gesture templates, several templates may share a name.
+    :param max_duration: Matches may span at most this many frames, which also bounds the state.
+    """
+
+    def __init__(self, templates: list[GestureTemplate], max_duration: int = 240):
+        self.templates = templates
+        self.max_duration = max_duration
+        self.frame = 0
+        lengths = [len(template.sequence) for template in templates]
+        self._offsets = np.concatenate([[0], np.cumsum(lengths)]).astype(int)
+        # All template frames stacked, so one distance computation covers every template
+        self._stacked = np.concatenate([t.sequence for t in templates]) if templates else np.zeros((0, 0))
+        self._limits = np.array([t.threshold * len(t.sequence) for t in templates])
+        self.reset()
+
+    def reset(self):
+        self._costs = [np.full(len(t.sequence), np.inf) for t in self.templates]
+        self._starts = [np.zeros(len(t.sequence), dtype=np.int64) for t in self.templates]
+        # Best pending match per template: (cost, start, end) or None
+        self._candidates = [None] * len(self.templates)
+
+    def copy(self) -> DTWGestureEngine:
+        """
+        :return: An engine with the same templates and fresh state, e.g. for another hand.
+        """
+        engine = DTWGestureEngine.__new__(DTWGestureEngine)
+        engine.__dict__.update(self.__dict__)
+        engine.frame = 0
+        engine.reset()
+        return engine
+
+    def update(self, features: np.ndarray) -> list[GestureMatch]:
+        """
+        Advance all templates by one frame.
+
+        :return: Matches that were confirmed with this frame.
+        """
+        t = self.frame
+        self.frame += 1
+        if not self.templates:
+            return []
+        distances = np.linalg.norm(self._stacked - features, axis=1)
+        matches = []
+        for k, template in enumerate(self.templates):
+            d = distances[self._offsets[k]:self._offsets[k + 1]]
+            old_costs = self._costs[k]
+            old_starts = self._starts[k]
+            limit = self._limits[k]
+            if d[0] > limit and self._candidates[k] is None and np.isinf(old_costs).all():
+                # Early abandon: no open path and a new one could not start below the threshold
+                continue
+            costs, starts = self._step(d, old_costs, old_starts, t)
+            # Paths above the threshold can never end in a match, paths that got too long are dropped
+            costs[(costs > limit) | (t - starts >= self.max_duration)] = np.inf
+            match = self._report(k, costs, starts, t, template)
+            if match is not None:
+                matches.append(match)
+            self._costs[k] = costs
+            self._starts[k] = starts
+        return matches
+
+    @staticmethod
+    def _step(d: np.ndarray, old_costs: np.ndarray, old_starts: np.ndarray, t: int):
+        # Predecessor from the previous frame: same template frame or the one before it.
+        # Template frame 0 may always start a new subsequence at cost 0.
+        diagonal = np.concatenate([[0.0], old_costs[:-1]])
+        diagonal_starts = np.concatenate([[t], old_starts[:-1]])
+        from_old = np.minimum(old_costs, diagonal)
+        from_old[0] = 0.0
+        from_old_starts = np.where(old_costs <= diagonal, old_starts, diagonal_starts)
+        from_old_starts[0] = t
+        # D[i] = d[i] + min(D[i - 1], from_old[i]) unrolls to a running minimum over cumulative sums
+        cumulative = np.cumsum(d)
+        candidates = from_old + d - cumulative
+        running = np.minimum.accumulate(candidates)
+        best = np.maximum.accumulate(np.where(candidates == running, np.arange(len(d)), 0))
+        return cumulative + running, from_old_starts[best]
+
+    def _report(self, k: int, costs: np.ndarray, starts: np.ndarray, t: int, template: GestureTemplate):
+        match = None
+        candidate = self._candidates[k]
+        if candidate is not None:
+            best_cost, best_start, best_end = candidate
+            # Confirmed once no open path can still end cheaper and overlap the candidate
+            if np.all((costs >= best_cost) | (starts > best_end)):
+                match = GestureMatch(template.name, best_cost / len(template.sequence), best_start, best_end)
+                self._candidates[k] = None
+                costs[starts <= best_end] = np.inf
+        end_cost = costs[-1]
+        if np.isfinite(end_cost) and (self._candidates[k] is None or end_cost < self._candidates[k][0]):
+            self._candidates[k] = (end_cost, int(starts[-1]), t)
+        return match
+
+
+def load_gesture_templates(path: str) -> list[GestureTemplate]:
+    with open(path, "r") as f:
+        return [GestureTemplate(data["name"], data["sequence"], data.get("threshold", 0.25)) for data in json.load(f)]
+
+
+def save_gesture_templates(path: str, templates: list[GestureTemplate]):
+    with open(path, "w") as f:
+        json.dump([template.as_dict() for template in templates], f)
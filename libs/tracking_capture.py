@@ -0,0 +1,335 @@
+"""Record raw Leap tracking events to a compact binary capture and replay them offline.
+
+A capture starts with a small file header followed by one record per tracking event:
+a frame header (device timestamp in microseconds, tracking frame id, hand count) and
+one fixed-size hand record per hand. ReplayConnection feeds a capture to any listener
+in place of leap.Connection, either in real time or as fast as possible.
+"""
+
+import argparse
+import contextlib
+import json
+import struct
+import threading
+import time
+from typing import Iterator
+
+import numpy as np
+
+try:
+    import leap
+    _ListenerBase = leap.Listener
+except ImportError:
+    # Replaying does not need the Leap bindings, the listeners of the pipeline derive from this base as well
+    leap = None
+    _ListenerBase = object
+
+CAPTURE_MAGIC = b"AGCP"
+CAPTURE_VERSION = 1
+FILE_HEADER = struct.Struct("<4sHH")
+FRAME_HEADER = struct.Struct("<qIB")
+
+HAND_DTYPE = np.dtype([
+    ("id", "<u4"),
+    ("type", "u1"),
+    ("confidence", "<f4"),
+    ("pinch_distance", "<f4"),
+    ("pinch_strength", "<f4"),
+    ("grab_strength", "<f4"),
+    ("palm_position", "<f4", (3,)),
+    ("palm_direction", "<f4", (3,)),
+    ("palm_normal", "<f4", (3,)),
+    ("palm_orientation", "<f4", (4,)),
+    ("palm_width", "<f4"),
+    ("arm", "<f4", (2, 3)),
+    ("joints", "<f4", (5, 4, 2, 3)),
+])
+
+
+class ReplayVector:
+    __slots__ = ("x", "y", "z")
+
+    def __init__(self, x, y, z):
+        self.x = float(x)
+        self.y = float(y)
+        self.z = float(z)
+
+
+class ReplayQuaternion:
+    __slots__ = ("x", "y", "z", "w")
+
+    def __init__(self, x, y, z, w):
+        self.x = float(x)
+        self.y = float(y)
+        self.z = float(z)
+        self.w = float(w)
+
+
+class ReplayBone:
+    __slots__ = ("prev_joint", "next_joint")
+
+    def __init__(self, prev_joint: ReplayVector, next_joint: ReplayVector):
+        self.prev_joint = prev_joint
+        self.next_joint = next_joint
+
+
+class ReplayDigit:
+    def __init__(self, bones: list[ReplayBone]):
+        self.bones = bones
+        self.metacarpal, self.proximal, self.intermediate, self.distal = bones
+
+
+class ReplayPalm:
+    def __init__(self, position, direction, normal, orientation, width):
+        self.position = ReplayVector(*position)
+        self.direction = ReplayVector(*direction)
+        self.normal = ReplayVector(*normal)
+        self.orientation = ReplayQuaternion(*orientation)
+        self.width = float(width)
+
+
+class ReplayHand:
+    """
+    Mirrors the parts of ldt.Hand that the pipeline reads.
+    ``type`` is the LeapC chirality value (0 = left, 1 = right).
+    """
+
+    def __init__(self, record: np.void):
+        self.id = int(record["id"])
+        self.type = int(record["type"])
+        self.confidence = float(record["confidence"])
+        self.pinch_distance = float(record["pinch_distance"])
+        self.pinch_strength = float(record["pinch_strength"])
+        self.grab_strength = float(record["grab_strength"])
+        self.palm = ReplayPalm(record["palm_position"], record["palm_direction"], record["palm_normal"],
+                               record["palm_orientation"], record["palm_width"])
+        self.arm = ReplayBone(ReplayVector(*record["arm"][0]), ReplayVector(*record["arm"][1]))
+        joints = record["joints"].tolist()
+        self.digits = [
+            ReplayDigit([ReplayBone(ReplayVector(*bone[0]), ReplayVector(*bone[1])) for bone in digit])
+            for digit in joints
+        ]
+        self.thumb, self.index, self.middle, self.ring, self.pinky = self.digits
+
+
+class ReplayTrackingEvent:
+    def __init__(self, timestamp: int, tracking_frame_id: int, hands: list[ReplayHand]):
+        self.timestamp = timestamp
+        self.tracking_frame_id = tracking_frame_id
+        self.hands = hands
+
+
+def hand_to_record(hand, record: np.void):
+    """
+    Copy an ldt.Hand (or ReplayHand) into a HAND_DTYPE record.
+    """
+    palm = hand.palm
+    record["id"] = hand.id
+    record["type"] = getattr(hand.type, "value", hand.type)
+    record["confidence"] = getattr(hand, "confidence", 1.0)
+    record["pinch_distance"] = hand.pinch_distance
+    record["pinch_strength"] = hand.pinch_strength
+    record["grab_strength"] = getattr(hand, "grab_strength", 0.0)
+    record["palm_position"] = (palm.position.x, palm.position.y, palm.position.z)
+    record["palm_direction"] = (palm.direction.x, palm.direction.y, palm.direction.z)
+    record["palm_normal"] = (palm.normal.x, palm.normal.y, palm.normal.z)
+    record["palm_orientation"] = (palm.orientation.x, palm.orientation.y, palm.orientation.z, palm.orientation.w)
+    record["palm_width"] = getattr(palm, "width", 0.0)
+    record["arm"] = ((hand.arm.prev_joint.x, hand.arm.prev_joint.y, hand.arm.prev_joint.z),
+                     (hand.arm.next_joint.x, hand.arm.next_joint.y, hand.arm.next_joint.z))
+    record["joints"] = [
+        [[(bone.prev_joint.x, bone.prev_joint.y, bone.prev_joint.z),
+          (bone.next_joint.x, bone.next_joint.y, bone.next_joint.z)] for bone in digit.bones]
+        for digit in hand.digits
+    ]
+
+
+class CaptureWriter:
+    def __init__(self, path: str):
+        self.path = path
+        self.frame_count = 0
+        self._file = open(path, "wb")
+        self._file.write(FILE_HEADER.pack(CAPTURE_MAGIC, CAPTURE_VERSION, 0))
+        self._hands = np.zeros(2, dtype=HAND_DTYPE)
+
+    def write_event(self, event):
+        hands = event.hands
+        if len(hands) > len(self._hands):
+            self._hands = np.zeros(len(hands), dtype=HAND_DTYPE)
+        for i, hand in enumerate(hands):
+            hand_to_record(hand, self._hands[i])
+        timestamp = getattr(event, "timestamp", None)
+        if timestamp is None:
+            timestamp = time.monotonic_ns() // 1000
+        self._file.write(FRAME_HEADER.pack(timestamp, getattr(event, "tracking_frame_id", self.frame_count), len(hands)))
+        self._file.write(self._hands[:len(hands)].tobytes())
+        self.frame_count += 1
+
+    def close(self):
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+
+def read_capture(path: str) -> Iterator[tuple[int, int, np.ndarray]]:
+    """
+    Iterate over the raw records of a capture.
+
+    :return: (timestamp in microseconds, tracking frame id, HAND_DTYPE array) per event.
+    """
+    with open(path, "rb") as f:
+        data = f.read()
+    magic, version, _ = FILE_HEADER.unpack_from(data, 0)
+    if magic != CAPTURE_MAGIC or version != CAPTURE_VERSION:
+        raise ValueError(f"{path} is not a tracking capture (version {CAPTURE_VERSION})")
+    offset = FILE_HEADER.size
+    while offset + FRAME_HEADER.size <= len(data):
+        timestamp, frame_id, hand_count = FRAME_HEADER.unpack_from(data, offset)
+        offset += FRAME_HEADER.size
+        end = offset + hand_count * HAND_DTYPE.itemsize
+        if end > len(data):
+            # Truncated last frame, e.g. the recorder was killed
+            break
+        yield timestamp, frame_id, np.frombuffer(data, dtype=HAND_DTYPE, count=hand_count, offset=offset)
+        offset = end
+
+
+def load_capture(path: str) -> list[ReplayTrackingEvent]:
+    return [ReplayTrackingEvent(timestamp, frame_id, [ReplayHand(record) for record in hands])
+            for timestamp, frame_id, hands in read_capture(path)]
+
+
+class CaptureRecorder(_ListenerBase):
+    """
+    Listener that writes every tracking event to a capture file.
+    """
+
+    def __init__(self, path: str):
+        self.writer = CaptureWriter(path)
+
+    def on_tracking_event(self, event):
+        self.writer.write_event(event)
+
+    def close(self):
+        self.writer.close()
+
+
+class ReplayConnection:
+    """
+    Stand-in for leap.Connection that plays a capture to its listeners.
+
+    :param path: Capture file.
+    :param realtime: Keep the recorded frame timing, otherwise deliver frames as fast as possible.
+    :param speed: Playback speed factor in realtime mode.
+    :param loop: Restart at the beginning when the capture ends.
+    """
+
+    # Events carry their recorded timestamps, not the device clock's
+    live = False
+
+    def __init__(self, path: str, realtime: bool = True, speed: float = 1.0, loop: bool = False):
+        self.events = load_capture(path)
+        self.realtime = realtime
+        self.speed = speed
+        self.loop = loop
+        self.listeners = []
+        self.frames_delivered = 0
+        self.elapsed = 0.0
+        self.finished = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def add_listener(self, listener):
+        self.listeners.append(listener)
+
+    def remove_listener(self, listener):
+        self.listeners.remove(listener)
+
+    def set_tracking_mode(self, mode):
+        pass
+
+    @contextlib.contextmanager
+    def open(self):
+        self._stop.clear()
+        self.finished.clear()
+        self._thread = threading.Thread(target=self._play, daemon=True)
+        self._thread.start()
+        try:
+            yield self
+        finally:
+            self._stop.set()
+            self._thread.join()
+
+    def _play(self):
+        start = time.perf_counter()
+        while not self._stop.is_set():
+            first_timestamp = self.events[0].timestamp if self.events else 0
+            pass_start = time.perf_counter()
+            for event in self.events:
+                if self._stop.is_set():
+                    break
+                if self.realtime:
+                    due = pass_start + (event.timestamp - first_timestamp) / 1e6 / self.speed
+                    delay = due - time.perf_counter()
+                    if delay > 0:
+                        time.sleep(delay)
+                for listener in self.listeners:
+                    listener.on_tracking_event(event)
+                self.frames_delivered += 1
+            if not self.loop or not self.events:
+                # An empty capture would otherwise loop without ever waiting
+                break
+        self.elapsed = time.perf_counter() - start
+        self.finished.set()
+
+    @property
+    def frames_per_second(self) -> float:
+        return self.frames_delivered / self.elapsed if self.elapsed > 0 else 0.0
+
+
+def record(path: str, duration: float):
+    connection = leap.Connection()
+    recorder = CaptureRecorder(path)
+    connection.add_listener(recorder)
+    with connection.open():
+        connection.set_tracking_mode(leap.TrackingMode.Desktop)
+        time.sleep(duration)
+    recorder.close()
+    print(f"Recorded {recorder.writer.frame_count} frames to {path}")
+
+
+def measure_throughput(path: str, poses_path: str = None):
+    from gesture_listener import GestureListener
+    from hand_pose import PoseLibrary, json_to_pose_samples
+
+    poses = {}
+    if poses_path:
+        with open(poses_path, "r") as f:
+            poses = PoseLibrary.from_samples({name: json_to_pose_samples(data) for name, data in json.load(f).items()})
+    connection = ReplayConnection(path, realtime=False)
+    connection.add_listener(GestureListener(lambda event, pose, similarity, hand: None, customposes=poses))
+    with connection.open():
+        connection.finished.wait()
+    print(f"{connection.frames_delivered} frames in {connection.elapsed:.3f}s "
+          f"({connection.frames_per_second:.1f} frames/s)")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Tracking Capture Tool")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    record_parser = subparsers.add_parser("record", help="Record tracking events from the device")
+    record_parser.add_argument("path", type=str, help="Output capture file")
+    record_parser.add_argument("--duration", type=float, default=10, help="Recording length in seconds")
+    bench_parser = subparsers.add_parser("throughput", help="Replay a capture through GestureListener")
+    bench_parser.add_argument("path", type=str, help="Capture file")
+    bench_parser.add_argument("--poses", type=str, help="Path to poses.json file")
+    args = parser.parse_args()
+
+    if args.command == "record":
+        record(args.path, args.duration)
+    else:
+        measure_throughput(args.path, args.poses)
@@ -0,0 +1,246 @@
+"""Long-lived tracking worker for the AutoGesture window.
+
+Starting pose_calibration.py or finger_tracking.py for every action imports numpy, OpenCV and the
+Leap bindings again and reconnects to the tracking service, which takes seconds. The worker does
+this once and keeps one open connection; calibration and recording runs borrow it through
+SharedConnection. The window talks to the worker with TrackingServiceClient, one JSON object per
+line over stdin/stdout:
+
+    {"command": "calibrate", "hand": "left"}  ->  {"status": "ok", "pose": {...}} or {"status": "cancelled"}
+    {"command": "record", "path": "poses.json", "csv": false, ...}  ->  {"status": "ok"}
+    {"command": "ping"}  ->  {"status": "ok"}
+    {"command": "quit"}  ->  {"status": "ok"}
+
+Failures are answered with {"status": "error", "message": ...} and the worker keeps running.
+Everything the tools and native libraries print goes to stderr so it cannot corrupt the protocol.
+"""
+
+from __future__ import annotations
+
+import argparse
+import contextlib
+import json
+import os
+import subprocess
+import sys
+import threading
+from pathlib import Path
+
+READY = "ready"
+OK = "ok"
+CANCELLED = "cancelled"
+ERROR = "error"
+
+
+class SharedConnection:
+    """
+    Lends an already open connection to a tool that would normally open its own.
+
+    ``open()`` does not reconnect and removes the listeners the tool added when it exits, so the next
+    tool starts without listeners of the previous one.
+    """
+
+    def __init__(self, connection):
+        self.connection = connection
+        self._listeners = []
+
+    def add_listener(self, listener):
+        self.connection.add_listener(listener)
+        self._listeners.append(listener)
+
+    def remove_listener(self, listener):
+        self.connection.remove_listener(listener)
+        self._listeners.remove(listener)
+
+    @property
+    def live(self) -> bool:
+        """
+        Whether events come from the device, False for a replay.
+        """
+        return getattr(self.connection, "live", True)
+
+    def set_tracking_mode(self, mode):
+        self.connection.set_tracking_mode(mode)
+
+    @contextlib.contextmanager
+    def open(self):
+        try:
+            yield self
+        finally:
+            for listener in self._listeners:
+                self.connection.remove_listener(listener)
+            self._listeners = []
+
+
+class TrackingServiceClient:
+    """
+    Starts the worker process and sends it commands. The process is started on the first command,
+    or right away with ``start()`` so imports and connecting overlap with the user's first clicks.
+
+    :param replay: Path of a tracking capture the worker replays instead of using the device.
+    """
+
+    def __init__(self, replay: str = None):
+        self.replay = replay
+        self.process = None
+        self._ready = False
+        self._lock = threading.Lock()
+
+    def start(self):
+        if self.process is not None and self.process.poll() is None:
+            return
+        command = [sys.executable, str(Path(__file__).resolve())]
+        if self.replay:
+            command += ["--replay", self.replay]
+        self.process = subprocess.Popen(command, stdin=subprocess.PIPE, stdout=subprocess.PIPE, text=True,
+                                        bufsize=1)
+        self._ready = False
+
+    def _read(self) -> dict:
+        line = self.process.stdout.readline()
+        if not line:
+            self.process.wait()
+            self.process = None
+            raise RuntimeError("Tracking service exited")
+        try:
+            return json.loads(line)
+        except json.JSONDecodeError as error:
+            raise RuntimeError(f"Invalid reply from the tracking service: {line.strip()!r}") from error
+
+    def request(self, command: str, **arguments) -> dict:
+        """
+        Send one command and wait for its reply. Blocks while a calibration or recording window is open.
+
+        :raise RuntimeError: If the worker exited, sent an invalid reply or answered with an error.
+        """
+        with self._lock:
+            self.start()
+            if not self._ready:
+                # The worker announces itself once the connection is open
+                self._read()
+                self._ready = True
+            self.process.stdin.write(json.dumps({"command": command, **arguments}) + "\n")
+            self.process.stdin.flush()
+            reply = self._read()
+        if reply.get("status") == ERROR:
+            raise RuntimeError(reply.get("message"))
+        return reply
+
+    def calibrate_pose(self, hand: str = None) -> dict | None:
+        """
+        :return: The calibrated pose as written by ``HandPose.as_dict``, or None if it was cancelled.
+        """
+        reply = self.request("calibrate", hand=hand)
+        return reply.get("pose") if reply["status"] == OK else None
+
+    def record(self, path: str = None, **options):
+        """
+        Run the recorder until it is closed.
+
+        :param path: Poses file to match.
+        :param options: Settings of the finger_tracking.py command line, e.g. csv, metric or knn.
+        """
+        self.request("record", path=path, **options)
+
+    def close(self):
+        if self.process is None:
+            return
+        if self.process.poll() is None:
+            try:
+                self.process.stdin.write(json.dumps({"command": "quit"}) + "\n")
+                self.process.stdin.flush()
+                self.process.wait(timeout=5)
+            except (OSError, subprocess.TimeoutExpired):
+                self.process.kill()
+        self.process = None
+
+
+def _send(output, reply: dict):
+    output.write(json.dumps(reply) + "\n")
+    output.flush()
+
+
+def serve(replay: str = None):
+    # The protocol keeps the original stdout, the process' fd 1 becomes stderr so that neither Python
+    # prints nor native libraries writing to fd 1 (OpenCV, the Leap bindings) can corrupt it
+    sys.stdout.flush()
+    protocol = os.fdopen(os.dup(1), "w", buffering=1)
+    os.dup2(2, 1)
+    sys.stdout = sys.stderr
+
+    # Imported here so the client side stays cheap to import from the window
+    import asyncio
+
+    import cv2
+    import leap
+
+    import finger_tracking
+    import pose_calibration
+    from hand_pose import COSINE
+    from tracking_capture import ReplayConnection
+
+    connection = ReplayConnection(replay, loop=True) if replay else leap.Connection()
+    shared = SharedConnection(connection)
+
+    def close_windows():
+        cv2.destroyAllWindows()
+        cv2.waitKey(1)
+
+    def calibrate(hand: str = None) -> dict:
+        try:
+            pose = asyncio.run(pose_calibration.calibrate_pose(shared, hand))
+        finally:
+            close_windows()
+        if pose is None:
+            return {"status": CANCELLED}
+        return {"status": OK, "pose": pose.as_dict()}
+
+    def record(path: str = None, csv: bool = False, gestures: str = None, metric: str = COSINE,
+               knn: int = None, smoothing: bool = True, hysteresis: bool = False, enter_threshold: float = None,
+               exit_threshold: float = None, debounce: float = 0.0) -> dict:
+        poses = finger_tracking.load_pose_matcher(path, metric, knn) if path else None
+        thresholds = finger_tracking.default_thresholds(metric)
+        gesture_templates = finger_tracking.load_gesture_templates(gestures) if gestures else None
+        try:
+            asyncio.run(finger_tracking.start_window(
+                poses, shared, csv, gesture_templates=gesture_templates, smoothing=smoothing,
+                hysteresis=hysteresis,
+                enter_threshold=enter_threshold if enter_threshold is not None else thresholds[0],
+                exit_threshold=exit_threshold if exit_threshold is not None else thresholds[1],
+                debounce=debounce))
+        finally:
+            close_windows()
+        return {"status": OK}
+
+    handlers = {
+        "calibrate": calibrate,
+        "record": record,
+        "ping": lambda: {"status": OK},
+    }
+
+    with connection.open():
+        connection.set_tracking_mode(leap.TrackingMode.Desktop)
+        _send(protocol, {"status": READY})
+        for line in sys.stdin:
+            if not line.strip():
+                continue
+            try:
+                request = json.loads(line)
+                command = request.pop("command")
+                if command == "quit":
+                    _send(protocol, {"status": OK})
+                    break
+                handler = handlers.get(command)
+                if handler is None:
+                    raise ValueError(f"Unknown command {command}")
+                reply = handler(**request)
+            except Exception as e:
+                reply = {"status": ERROR, "message": f"{type(e).__name__}: {e}"}
+            _send(protocol, reply)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Tracking worker of the AutoGesture window")
+    parser.add_argument("--replay", type=str, help="Replay a tracking capture instead of using the device")
+    args = parser.parse_args()
+    serve(args.replay)
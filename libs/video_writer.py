@@ -0,0 +1,78 @@
+import queue
+import threading
+
+import cv2
+import numpy as np
+
+DROP_NEWEST = "newest"
+DROP_OLDEST = "oldest"
+BLOCK = "block"
+
+
+class AsyncVideoWriter:
+    """
+    Encodes frames on a background thread while recording is in progress.
+
+    Frames are handed over through a bounded queue, so memory stays at ``max_queue`` frames.
+    When the encoder falls behind, ``drop_policy`` decides what happens to a new frame:
+    "newest" drops it, "oldest" drops the oldest queued frame instead and "block" waits
+    for the encoder. Dropped frames are counted in ``dropped_frames``.
+    """
+
+    def __init__(self, path: str, fps: float, frame_size: tuple[int, int], fourcc: str = "mp4v",
+                 max_queue: int = 60, drop_policy: str = DROP_NEWEST):
+        if drop_policy not in (DROP_NEWEST, DROP_OLDEST, BLOCK):
+            raise ValueError(f"Unknown drop policy {drop_policy}")
+        self.path = path
+        self.drop_policy = drop_policy
+        self.written_frames = 0
+        self.dropped_frames = 0
+        self._writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*fourcc), fps, frame_size)
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._thread = threading.Thread(target=self._encode, daemon=True)
+        self._thread.start()
+
+    def write(self, frame: np.ndarray) -> bool:
+        """
+        Queue a frame for encoding. The frame must not be modified afterwards.
+
+        :return: False if the frame was dropped.
+        """
+        if self.drop_policy == BLOCK:
+            self._queue.put(frame)
+            return True
+        try:
+            self._queue.put_nowait(frame)
+            return True
+        except queue.Full:
+            pass
+        if self.drop_policy == DROP_NEWEST:
+            self.dropped_frames += 1
+            return False
+        try:
+            self._queue.get_nowait()
+            self.dropped_frames += 1
+        except queue.Empty:
+            pass
+        try:
+            self._queue.put_nowait(frame)
+        except queue.Full:
+            self.dropped_frames += 1
+            return False
+        return True
+
+    def _encode(self):
+        while True:
+            frame = self._queue.get()
+            if frame is None:
+                break
+            self._writer.write(frame)
+            self.written_frames += 1
+
+    def close(self):
+        """
+        Encode the remaining queued frames and finish the file.
+        """
+        self._queue.put(None)
+        self._thread.join()
+        self._writer.release()
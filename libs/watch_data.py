@@ -0,0 +1,59 @@
+import numpy as np
+
+from sample_buffer import SampleBuffer
+
+
+class WatchDataParser:
+    """
+    Decodes watch BLE notifications straight into SampleBuffers.
+
+    A notification looks like ``<stream>_<ts>,<x>,<y>,<z>;<ts>,<x>,<y>,<z>;...`` where the first
+    letter of ``<stream>`` selects the buffer (A = acc, G = gyro, P = ppg). Timestamps are
+    parsed through float64, which is exact for millisecond (and microsecond) epoch values.
+    """
+
+    def __init__(self, acc: SampleBuffer = None, gyro: SampleBuffer = None, ppg: SampleBuffer = None):
+        self.acc = acc if acc is not None else SampleBuffer(3)
+        self.gyro = gyro if gyro is not None else SampleBuffer(3)
+        self.ppg = ppg if ppg is not None else SampleBuffer(3)
+        self.buffers = {ord("A"): self.acc, ord("G"): self.gyro, ord("P"): self.ppg}
+        self.invalid_messages = 0
+
+    def parse(self, data: bytes | bytearray) -> int:
+        """
+        :return: Number of samples stored.
+        """
+        if data.count(b"_") != 1:
+            self.invalid_messages += 1
+            return 0
+        separator = data.index(b"_")
+        buffer = self.buffers.get(data[0]) if separator > 0 else None
+        if buffer is None:
+            return 0
+        sets = bytes(data[separator + 1:]).rstrip(b";").split(b";")
+        if all(sample.count(b",") == 3 for sample in sets):
+            try:
+                block = np.array(b",".join(sets).split(b","), dtype=np.float64).reshape(-1, 4)
+            except ValueError:
+                return self._parse_slow(sets, buffer)
+            buffer.extend(block[:, 0].astype(np.int64), block[:, 1:])
+            return len(block)
+        return self._parse_slow(sets, buffer)
+
+    def _parse_slow(self, sets: list[bytes], buffer: SampleBuffer) -> int:
+        # Skips malformed samples one by one like the original string parser
+        stored = 0
+        for sample in sets:
+            fields = sample.split(b",")
+            if len(fields) != 4:
+                continue
+            try:
+                buffer.append(int(float(fields[0])), [float(value) for value in fields[1:]])
+            except ValueError:
+                continue
+            stored += 1
+        return stored
+
+    def clear(self):
+        for buffer in self.buffers.values():
+            buffer.clear()
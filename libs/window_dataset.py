@@ -0,0 +1,193 @@
+"""Overlapping training windows over an aligned recording session.
+
+WindowDataset exposes the "sensors" stream of a session written by session_align as windows of
+shape (window, columns), one every ``stride`` samples. The windows are a strided view
+(``sliding_window_view``) of the memory-mapped array, so building the dataset copies nothing and
+its memory does not grow with the session; data is only read when a batch is taken.
+
+Each window is labelled with the majority of its labels from a label stream (manual_poses by
+default); unlabelled samples do not vote. With ``pre_padding`` the label of every onset is also
+given to the unlabelled or resting (``rest_label``) samples just before it, so windows that only
+contain the pre-movement of a gesture already count as that gesture. Labels are computed per batch from the label stream, also without
+materializing anything for the whole session.
+"""
+
+from __future__ import annotations
+
+import argparse
+from typing import Iterator
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+from session_align import SENSORS_STREAM
+from session_store import SessionReader
+
+
+def pad_onsets(codes: np.ndarray, pre_padding: int, previous=0, rest: int = None) -> np.ndarray:
+    """
+    Give the ``pre_padding`` unlabelled or resting samples before every onset the label of that onset.
+    Samples of other labels keep their label.
+
+    :param codes: Label codes, 0 means unlabelled. Must extend ``pre_padding`` samples past the part
+        that is used, onsets after the end are not seen. A (rows, samples) array pads every row on its own.
+    :param previous: Label code of the sample before ``codes`` (one per row), to tell whether the first
+        one is an onset.
+    :param rest: Label code of the resting label. Its samples are padded like unlabelled ones and
+        going back to rest is not an onset.
+    :return: The padded codes, a new array.
+    """
+    padded = np.array(codes)
+    if pre_padding <= 0 or padded.size == 0:
+        return padded
+    rows = padded.reshape(-1, padded.shape[-1])
+    before = np.empty_like(rows)
+    before[:, 0] = previous
+    before[:, 1:] = rows[:, :-1]
+    flat = rows.ravel()
+    padding = (rows == 0) if rest is None else (rows == 0) | (rows == rest)
+    onsets = np.flatnonzero((rows != before) & ~padding)
+    positions = np.arange(len(flat))
+    following = np.searchsorted(onsets, positions, side="right")
+    has_onset = following < len(onsets)
+    onset = onsets[np.minimum(following, len(onsets) - 1)] if len(onsets) else positions
+    row_length = rows.shape[1]
+    padded_mask = (has_onset & (onset - positions <= pre_padding) & padding.ravel()
+                   & (onset // row_length == positions // row_length))
+    flat[padded_mask] = flat[onset[padded_mask]]
+    return padded
+
+
+def majority_labels(windows: np.ndarray, label_count: int) -> np.ndarray:
+    """
+    Majority vote over the last axis of a (windows, window) array of label codes, 0 does not vote.
+    Ties go to the lower code.
+
+    :return: One code per window, 0 for windows without any label.
+    """
+    count = len(windows)
+    offsets = windows + label_count * np.arange(count)[:, None]
+    votes = np.bincount(offsets.ravel(), minlength=count * label_count).reshape(count, label_count)
+    votes[:, 0] = 0
+    winners = np.argmax(votes, axis=1)
+    winners[votes[np.arange(count), winners] == 0] = 0
+    return winners.astype(np.int32)
+
+
+class WindowDataset:
+    """
+    :param session_path: Aligned session written by session_align.
+    :param window: Samples per window.
+    :param stride: Samples between the starts of consecutive windows.
+    :param label_stream: Label stream of the session used for the window labels.
+    :param pre_padding: Samples before every label onset that get the label of the onset.
+    :param rest_label: Label between gestures. Recordings label every sample, so padding gives the
+        onset's label to resting samples as well as to unlabelled ones.
+    """
+
+    def __init__(self, session_path: str, window: int, stride: int = 1, label_stream: str = "manual_poses",
+                 pre_padding: int = 0, rest_label: str = "Pose.Resting"):
+        if window < 1 or stride < 1:
+            raise ValueError("window and stride must be positive")
+        self.session = SessionReader(session_path)
+        self.window = window
+        self.stride = stride
+        self.pre_padding = pre_padding
+        self.rate = self.session.manifest.get("rate")
+        self.columns = self.session.columns(SENSORS_STREAM)
+        self.timestamps = self.session.timestamps(SENSORS_STREAM)
+        values = self.session.values(SENSORS_STREAM)
+        if len(values) >= window:
+            # (windows, columns, window) view, reordered to (windows, window, columns) for sequence models
+            self.windows = sliding_window_view(values, window, axis=0)[::stride].transpose(0, 2, 1)
+        else:
+            self.windows = np.zeros((0, window, len(self.columns)), dtype=values.dtype)
+        self.label_stream = label_stream
+        self.codes = self.session.labels(label_stream)
+        self.label_names = self.session.label_names(label_stream)
+        self.rest_label = rest_label
+        self.rest_code = self.label_names.index(rest_label) if rest_label in self.label_names else None
+
+    def __len__(self):
+        return len(self.windows)
+
+    def window_times(self, index: int) -> tuple[int, int]:
+        """
+        :return: Timestamps of the first and last sample of a window.
+        """
+        start = index * self.stride
+        return int(self.timestamps[start]), int(self.timestamps[start + self.window - 1])
+
+    def labels(self, start: int = 0, stop: int = None) -> np.ndarray:
+        """
+        Majority labels of the windows ``start`` to ``stop``, as codes into ``label_names``.
+        """
+        stop = len(self) if stop is None else min(stop, len(self))
+        if stop <= start:
+            return np.zeros(0, dtype=np.int32)
+        first = start * self.stride
+        last = (stop - 1) * self.stride + self.window
+        codes = np.asarray(self.codes[first:last + self.pre_padding])
+        previous = int(self.codes[first - 1]) if first > 0 else 0
+        codes = pad_onsets(codes, self.pre_padding, previous, self.rest_code)[:last - first]
+        windows = sliding_window_view(codes, self.window)[::self.stride]
+        return majority_labels(windows, len(self.label_names))
+
+    def window_labels(self, indices: np.ndarray) -> np.ndarray:
+        """
+        Majority labels of the windows at ``indices``, read sample by sample instead of as one range.
+        """
+        first = np.asarray(indices, dtype=np.int64) * self.stride
+        samples = first[:, None] + np.arange(self.window + self.pre_padding)
+        # Samples past the end are unlabelled
+        codes = np.where(samples < len(self.codes), np.take(self.codes, samples, mode="clip"), 0)
+        previous = np.where(first > 0, np.take(self.codes, first - 1, mode="clip"), 0)
+        codes = pad_onsets(codes, self.pre_padding, previous, self.rest_code)[:, :self.window]
+        return majority_labels(codes, len(self.label_names))
+
+    def __getitem__(self, index: int) -> tuple[np.ndarray, int]:
+        """
+        :return: (window view, label code) of one window.
+        """
+        if index < 0:
+            index += len(self)
+        return self.windows[index], int(self.labels(index, index + 1)[0])
+
+    def batches(self, batch_size: int = 64, shuffle: bool = False,
+                seed: int = None) -> Iterator[tuple[np.ndarray, np.ndarray]]:
+        """
+        Iterate over (windows, labels) batches. The windows of a batch are copied into one array of
+        shape (batch, window, columns); without shuffling, consecutive windows are read as one range.
+        """
+        if not shuffle:
+            for start in range(0, len(self), batch_size):
+                stop = min(start + batch_size, len(self))
+                yield np.array(self.windows[start:stop]), self.labels(start, stop)
+            return
+        order = np.random.default_rng(seed).permutation(len(self))
+        for start in range(0, len(self), batch_size):
+            indices = np.sort(order[start:start + batch_size])
+            yield self.windows[indices], self.window_labels(indices)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Sliding windows over an aligned session")
+    parser.add_argument("session", type=str, help="Aligned session written by session_align.py")
+    parser.add_argument("--window", type=float, default=1.0, help="Window length in seconds")
+    parser.add_argument("--stride", type=float, default=0.1, help="Seconds between window starts")
+    parser.add_argument("--labels", type=str, default="manual_poses", help="Label stream for the window labels")
+    parser.add_argument("--pre-padding", type=float, default=0.0,
+                        help="Seconds before every label onset that already get its label")
+    parser.add_argument("--rest-label", type=str, default="Pose.Resting",
+                        help="Label between gestures that pre-padding may overwrite")
+    args = parser.parse_args()
+
+    rate = SessionReader(args.session).manifest["rate"]
+    dataset = WindowDataset(args.session, max(1, round(args.window * rate)), max(1, round(args.stride * rate)),
+                            args.labels, round(args.pre_padding * rate), args.rest_label)
+    counts = np.zeros(len(dataset.label_names), dtype=np.int64)
+    for start in range(0, len(dataset), 65536):
+        counts += np.bincount(dataset.labels(start, start + 65536), minlength=len(dataset.label_names))
+    print(f"{len(dataset)} windows of shape {dataset.windows.shape[1:]}")
+    for name, count in zip(dataset.label_names, counts):
+        print(f"{name or '(unlabelled)'}: {count}")
@@ -0,0 +1,25 @@
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "libs"))
+
+from frame_scheduler import LATENCY_BUDGET, FrameScheduler
+
+
+def test_latency_budget_after_timestamp_wrap():
+    scheduler = FrameScheduler(LATENCY_BUDGET, latency_budget=0.02)
+    period = 10_000
+    # Three seconds of frames on time, then the device timestamps start over like a looping replay
+    for i in range(300):
+        assert scheduler.should_process(i * period, now=1_000_000 + i * period)
+    for i in range(300, 600):
+        assert scheduler.should_process((i - 300) * period, now=1_000_000 + i * period)
+    assert scheduler.skipped_frames == 0
+
+
+def test_latency_budget_skips_backlog():
+    scheduler = FrameScheduler(LATENCY_BUDGET, latency_budget=0.02)
+    assert scheduler.should_process(0, now=1_000_000)
+    # Frames that queued up behind a slow one arrive together
+    assert not scheduler.should_process(10_000, now=1_100_000)
+    assert scheduler.should_process(100_000, now=1_100_500)
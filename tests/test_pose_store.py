@@ -0,0 +1,42 @@
+import json
+import sys
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "libs"))
+
+from hand_pose import HandPose, PoseStatistics
+from pose_store import PoseFile, load_pose_data, save_pose_data
+
+
+def make_poses() -> dict:
+    rng = np.random.default_rng(0)
+    single = HandPose()
+    single.pose_vector = rng.normal(size=45)
+    samples = []
+    for _ in range(3):
+        statistics = PoseStatistics()
+        for _ in range(20):
+            statistics.add(rng.normal(size=45))
+        pose = HandPose()
+        pose.set_statistics(statistics)
+        pose.pinch_distance = 1.5
+        samples.append(pose.as_dict())
+    return {"Fist": single.as_dict(), "Pinch": samples, "Resting": [HandPose().as_dict()]}
+
+
+def test_json_round_trip(tmp_path):
+    poses = make_poses()
+    save_pose_data(str(tmp_path / "poses.json"), poses)
+    save_pose_data(str(tmp_path / "poses.agposes"), load_pose_data(str(tmp_path / "poses.json")))
+    save_pose_data(str(tmp_path / "back.json"), load_pose_data(str(tmp_path / "poses.agposes")))
+
+    with open(tmp_path / "poses.json") as f, open(tmp_path / "back.json") as g:
+        assert json.load(f) == json.load(g)
+
+
+def test_empty_library(tmp_path):
+    save_pose_data(str(tmp_path / "empty.agposes"), {})
+    assert len(PoseFile(str(tmp_path / "empty.agposes"))) == 0
+    assert load_pose_data(str(tmp_path / "empty.agposes")) == {}
@@ -0,0 +1,44 @@
+import os
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "libs"))
+
+from session_log import SessionLog, StreamLog, finish_session
+from session_store import SessionReader
+
+
+def test_truncated_log_is_recovered(tmp_path):
+    labels = ["Fist", "Open", ""] * 1000
+    log = SessionLog(str(tmp_path), chunk_size=1000, fsync=False)
+    poses = log.stream("poses", ["Similarity"], "Pose", "us", lambda: {"clock_offset": 7})
+    poses.extend(np.arange(3000), labels, np.ones((3000, 1)))
+    log.close()
+    # A crash while the last chunk was written
+    log_path = tmp_path / "poses.log"
+    os.truncate(log_path, log_path.stat().st_size - 100)
+    assert len(StreamLog(str(log_path))) == 2000
+
+    assert finish_session(str(tmp_path)) == {"poses": 2000}
+    assert not log_path.exists()
+    reader = SessionReader(str(tmp_path))
+    names = reader.label_names("poses")
+    assert [names[code] for code in reader.labels("poses")] == labels[:2000]
+    assert (reader.timestamps("poses") == np.arange(2000)).all()
+    assert reader.clock_offset("poses") == 7
+
+
+def test_writer_errors_are_raised(tmp_path):
+    log = SessionLog(str(tmp_path), chunk_size=10, fsync=False)
+    # The stream info cannot be written as JSON, which fails on the writer thread
+    poses = log.stream("poses", ["Similarity"], "Pose", "us", lambda: {"clock_offset": object()})
+    with pytest.raises(TypeError):
+        for i in range(1000):
+            poses.append(i, "Fist", (1,))
+            time.sleep(0.001)
+    with pytest.raises(TypeError):
+        log.close()
@@ -0,0 +1,46 @@
+import subprocess
+import sys
+from pathlib import Path
+
+LIBS = Path(__file__).resolve().parent.parent / "libs"
+sys.path.insert(0, str(LIBS))
+
+from synthetic_hand import make_session
+from tracking_capture import CaptureWriter, ReplayConnection
+
+# Runs in a fresh interpreter where importing leap fails, like on a machine without the SDK
+REPLAY_WITHOUT_LEAP = """
+import sys
+sys.modules["leap"] = None
+sys.path.insert(0, {libs!r})
+from gesture_listener import GestureListener
+from tracking_capture import ReplayConnection
+poses = []
+connection = ReplayConnection({path!r}, realtime=False)
+connection.add_listener(GestureListener(lambda event, pose, similarity, hand: poses.append(pose)))
+with connection.open():
+    connection.finished.wait()
+print(connection.frames_delivered, len(poses))
+"""
+
+
+def write_capture(path: Path, frames: int, hands: int = 2):
+    with CaptureWriter(str(path)) as writer:
+        for event in make_session(frames, hand_count=hands):
+            writer.write_event(event)
+
+
+def test_replay_without_leap(tmp_path):
+    write_capture(tmp_path / "capture.agcap", 20)
+    script = REPLAY_WITHOUT_LEAP.format(libs=str(LIBS), path=str(tmp_path / "capture.agcap"))
+    result = subprocess.run([sys.executable, "-c", script], capture_output=True, text=True, timeout=120)
+    assert result.returncode == 0, result.stderr
+    assert result.stdout.split() == ["20", "40"]
+
+
+def test_empty_capture_stops_looping(tmp_path):
+    write_capture(tmp_path / "empty.agcap", 0)
+    connection = ReplayConnection(str(tmp_path / "empty.agcap"), loop=True)
+    with connection.open():
+        assert connection.finished.wait(timeout=5)
+    assert connection.frames_delivered == 0
@@ -0,0 +1,46 @@
+import sys
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "libs"))
+
+from session_align import align_session
+from session_store import SessionWriter, encode_labels
+from window_dataset import WindowDataset, pad_onsets
+
+REST = "Pose.Resting"
+
+
+def test_pad_onsets_keeps_other_labels():
+    codes = np.array([0, 0, 0, 1, 1, 0, 2, 2])
+    assert pad_onsets(codes, 2).tolist() == [0, 1, 1, 1, 1, 2, 2, 2]
+
+
+def test_pad_onsets_overwrites_rest():
+    # 3 is the resting label, going back to rest is no onset
+    codes = np.array([3, 3, 3, 1, 1, 3, 3, 2, 2, 3])
+    assert pad_onsets(codes, 2, rest=3).tolist() == [3, 1, 1, 1, 1, 2, 2, 2, 2, 3]
+    assert pad_onsets(codes, 2).tolist() == codes.tolist()
+
+
+def test_pre_padding_with_rest_labels(tmp_path):
+    labels = [REST] * 40 + ["Pose.Fist"] * 20 + [REST] * 40 + ["Pose.Pinch"] * 20 + [REST] * 40
+    timestamps = 1_700_000_000_000 + np.arange(len(labels)) * 10
+    writer = SessionWriter(str(tmp_path / "session"))
+    writer.write_stream("acc", timestamps, np.zeros((len(labels), 3)), ["Acc X", "Acc Y", "Acc Z"])
+    codes, names = encode_labels(labels)
+    writer.write_stream("manual_poses", timestamps, np.zeros((len(labels), 0)), [], labels=codes, label_names=names)
+    writer.close()
+    align_session(str(tmp_path / "session"), str(tmp_path / "aligned"), rate=100)
+
+    plain = WindowDataset(str(tmp_path / "aligned"), window=10, stride=10)
+    padded = WindowDataset(str(tmp_path / "aligned"), window=10, stride=10, pre_padding=10)
+    plain_names = [plain.label_names[code] for code in plain.labels()]
+    padded_names = [padded.label_names[code] for code in padded.labels()]
+    assert plain_names[3] == REST and padded_names[3] == "Pose.Fist"
+    assert plain_names[9] == REST and padded_names[9] == "Pose.Pinch"
+    # Only the windows right before an onset change
+    assert sum(a != b for a, b in zip(plain_names, padded_names)) == 2
+    labels, = [batch_labels for _, batch_labels in padded.batches(len(padded), shuffle=True, seed=0)]
+    assert labels.tolist() == padded.labels().tolist()